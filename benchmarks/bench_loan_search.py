@@ -0,0 +1,87 @@
+"""Benchmark cost per filing of find_loan_contracts and find_loan_signature
+
+Usage:
+    python benchmarks/bench_loan_search.py [n_filings]
+
+Synthetic 8-K filings are written to a temporary directory, half of them
+with a credit agreement as EX-10.1, all with a press release as EX-99.1.
+"""
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+
+from edgaranalyzer import cmd_find_loans, cmd_find_loan_signature
+
+REPEAT = 3
+WORDS = ["the", "Company", "shall", "any", "of", "in", "to", "such", "period"]
+
+
+def paragraphs(rnd: random.Random, n: int) -> str:
+    return "".join(
+        f"<p><font>{' '.join(rnd.choices(WORDS, k=40))}</font></p>\n" for _ in range(n)
+    )
+
+
+def credit_agreement(rnd: random.Random) -> str:
+    return (
+        "<p><b>CREDIT AGREEMENT</b></p>\n"
+        + paragraphs(rnd, 2000)
+        + "<p>IN WITNESS WHEREOF, the parties have executed this Agreement.</p>"
+        "<table><tr><td>ACME CORP., as Borrower</td></tr><tr><td>By:</td>"
+        "<td>/s/ Jane Doe</td></tr><tr><td>Name: Jane Doe</td></tr>"
+        "<tr><td>Title: Chief Financial Officer</td></tr>"
+        "<tr><td>FIRST NATIONAL BANK, N.A., as Administrative Agent</td></tr>"
+        "<tr><td>By:</td><td>/s/ John Smith</td></tr><tr><td>Name: John Smith"
+        "</td></tr><tr><td>Title: Vice President</td></tr></table>\n"
+    )
+
+
+def write_filing(path: str, rnd: random.Random, with_loan: bool):
+    docs = [("8-K", "form8k.htm", paragraphs(rnd, 50))]
+    if with_loan:
+        docs.append(("EX-10.1", "ex10.htm", credit_agreement(rnd)))
+    docs.append(("EX-99.1", "ex99.htm", paragraphs(rnd, 500)))
+    with gzip.open(path, "wt") as f:
+        f.write("<SEC-HEADER>\n</SEC-HEADER>\n")
+        for i, (doc_type, name, text) in enumerate(docs, 1):
+            f.write(
+                f"<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{i}\n"
+                f"<FILENAME>{name}\n<TEXT>\n{text}</TEXT>\n</DOCUMENT>\n"
+            )
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rnd = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        filings = {True: [], False: []}
+        for i in range(n):
+            with_loan = i % 2 == 0
+            path = os.path.join(tmp, f"2020-01-01_0000000000-20-{i:06d}.txt.gz")
+            write_filing(path, rnd, with_loan)
+            filings[with_loan].append(path)
+
+        for name, search in [
+            ("find_loan_contracts", cmd_find_loans.regsearch),
+            ("find_loan_signature", cmd_find_loan_signature.regsearch),
+        ]:
+            for with_loan, paths in filings.items():
+                # Best of repeated runs, less affected by other processes
+                elapsed = []
+                for _ in range(REPEAT):
+                    start = time.perf_counter()
+                    hits = sum(search(p, "0", "8-K")[0][4] == "TRUE" for p in paths)
+                    elapsed.append(time.perf_counter() - start)
+                ms = min(elapsed) / len(paths) * 1000
+                label = "with" if with_loan else "without"
+                print(
+                    f"{name}: {ms:7.2f} ms per filing {label} credit agreement, "
+                    f"{hits}/{len(paths)} found"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Benchmark every stage of the pipeline on a synthetic corpus
+
+Usage:
+    python benchmarks/bench_pipeline.py [--filings N] [--ciks N] [-t threads]
+        [--stages stage ...] [--output results.json] [--compare baseline.json]
+
+A corpus is generated by `corpus.py` in a temporary directory, or in
+`--corpus` where it is kept and reused by later runs. Each stage runs as the
+command line tool in a process of its own, with the working tree of the
+repository imported, and is reported with its throughput and the peak RSS of
+its largest process, i.e., the command or one of its workers. The downloaders
+run against a local server serving the corpus as EDGAR does, without a rate
+limit. Results are saved as JSON, and compared to a baseline with `--compare`.
+"""
+import argparse
+import datetime
+import gzip
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import corpus
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_AGENT = "edgar-analyzer benchmark bench@example.com"
+FIND_STAGES = [
+    "find_event_date",
+    "find_reported_items",
+    "find_zipcode",
+    "find_header_fields",
+    "build_header_store",
+    "find_loan_contracts",
+    "find_loan_signature",
+]
+STAGES = ["build_database", *FIND_STAGES, "download_index", "download_filings"]
+
+INDEX_PATH = r"/Archives/edgar/full-index/(\d+)/QTR(\d)/master\.zip"
+FILING_PATH = r"/Archives/edgar/data/(\d+)/([\d-]+)\.txt"
+
+# `download_index` pointed at the local server
+DOWNLOAD_INDEX = """import sys
+from edgaranalyzer import cmd_download_index
+cmd_download_index.INDEX_URL = sys.argv.pop(1)
+from edgaranalyzer.main import main
+main()
+"""
+
+
+class MockEDGAR(http.server.ThreadingHTTPServer):
+    """Local server of the index files and filings of a corpus, at the
+    paths of EDGAR, counting the bytes it serves"""
+
+    daemon_threads = True
+
+    def __init__(self, root: str) -> None:
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.root = root
+        self.bytes_served = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/Archives/"
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written apart on a keep-alive connection,
+        # which Nagle's algorithm would delay by tens of ms per request
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        root, path = self.server.root, self.path
+        if m := re.fullmatch(INDEX_PATH, path):
+            tsv = os.path.join(root, "index", f"{m[1]}-QTR{m[2]}.tsv")
+            if not os.path.exists(tsv):
+                return self.reply(404, b"")
+            return self.reply(200, corpus.master_zip(tsv))
+        if m := re.fullmatch(FILING_PATH, path):
+            cik, accession = m[1], m[2]
+            dirpath = os.path.join(root, "data", cik, corpus.FILE_TYPE)
+            names = os.listdir(dirpath) if os.path.isdir(dirpath) else []
+            name = next((n for n in names if f"_{accession}." in n), None)
+            if name is None:
+                return self.reply(404, b"")
+            with open(os.path.join(dirpath, name), "rb") as f:
+                body = f.read()
+            # Gzipped as EDGAR does, if accepted
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                return self.reply(200, body, {"Content-Encoding": "gzip"})
+            return self.reply(200, gzip.decompress(body))
+        self.reply(404, b"")
+
+    def reply(self, status: int, body: bytes, headers: dict = {}):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_served += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(argv: list) -> dict:
+    """Run a command in a process of its own
+
+    Args:
+        argv (list): arguments after the python interpreter
+
+    Returns:
+        dict: seconds elapsed, peak RSS in MB and return code
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO, env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, *argv],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # Usage of the process and its workers, the largest of them for RSS
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.perf_counter() - start
+    # Kilobytes on Linux, bytes on macOS
+    rss = usage.ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    return {
+        "seconds": round(seconds, 3),
+        "peak_rss_mb": round(rss, 1),
+        "returncode": proc.returncode,
+    }
+
+
+def throughput(result: dict, items: int, unit: str, nbytes: int) -> dict:
+    seconds = max(result["seconds"], 1e-9)
+    return {
+        **result,
+        unit: items,
+        f"{unit}_per_s": round(items / seconds, 1),
+        "mb": round(nbytes / 2**20, 2),
+        "mb_per_s": round(nbytes / 2**20 / seconds, 2),
+    }
+
+
+def bench(args: argparse.Namespace, root: str, summary: dict) -> dict:
+    data, index = os.path.join(root, "data"), os.path.join(root, "index")
+    work = tempfile.mkdtemp(prefix="bench-", dir=root)
+    idx_db = os.path.join(work, "edgar-idx.sqlite3")
+    results = {}
+    try:
+        for stage in args.stages:
+            print(f"{stage} ...", end=" ", flush=True)
+            if stage == "build_database":
+                argv = ["-m", "edgaranalyzer.main", stage, "-i", index, "-db", idx_db]
+                res = throughput(
+                    run(argv), summary["index_rows"], "rows", summary["index_bytes"]
+                )
+            elif stage in FIND_STAGES:
+                db = os.path.join(work, f"{stage}.sqlite3")
+                argv = ["-m", "edgaranalyzer.main", stage, "-d", data, "-db", db]
+                argv += ["--file_type", corpus.FILE_TYPE, "-t", str(args.threads)]
+                res = run(argv)
+                res = throughput(
+                    res, summary["filings"], "filings", summary["filings_bytes"]
+                )
+            else:
+                res = bench_download(args, root, work, stage, summary)
+            results[stage] = res
+            print(f"{res['seconds']:.2f} s, {res['peak_rss_mb']:.0f} MB peak RSS")
+            if res["returncode"] != 0:
+                print(f"{stage} exited with {res['returncode']}")
+    finally:
+        shutil.rmtree(work)
+    return results
+
+
+def bench_download(
+    args: argparse.Namespace, root: str, work: str, stage: str, summary: dict
+) -> dict:
+    server = MockEDGAR(root)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        if stage == "download_index":
+            url = server.base + "edgar/full-index/{year}/QTR{quarter}/master.zip"
+            out = os.path.join(work, "index")
+            argv = ["-c", DOWNLOAD_INDEX, url, stage, "-ua", USER_AGENT, "-o", out]
+            argv += ["-b", str(corpus.YEAR), "--rate", "1000", "-t", str(args.threads)]
+            res = run(argv)
+            return throughput(res, summary["index_rows"], "rows", server.bytes_served)
+        # Filings of the corpus downloaded from the local server
+        db = os.path.join(work, "download.sqlite3")
+        conn = sqlite3.connect(db)
+        conn.execute(
+            """CREATE TABLE edgar_idx (cik TEXT, firm_name TEXT, file_type TEXT,
+            date DATE, url TEXT PRIMARY KEY)"""
+        )
+        rows = []
+        for name in sorted(os.listdir(os.path.join(root, "index"))):
+            with open(os.path.join(root, "index", name), encoding="utf-8") as f:
+                for line in f:
+                    cik, firm, form, date, url, _ = line.rstrip("\n").split("|")
+                    rows.append((cik, firm, form, date, server.base + url))
+        conn.executemany("INSERT INTO edgar_idx VALUES (?,?,?,?,?)", rows)
+        conn.commit()
+        conn.close()
+        out = os.path.join(work, "filings")
+        argv = ["-m", "edgaranalyzer.main", stage, "-ua", USER_AGENT, "-o", out]
+        argv += ["-db", db, "--file_type", corpus.FILE_TYPE, "--rate", "1000"]
+        argv += ["-t", str(args.threads)]
+        res = run(argv)
+        return throughput(res, summary["filings"], "filings", server.bytes_served)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def metadata(args: argparse.Namespace) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "threads": args.threads,
+    }
+
+
+def compare(results: dict, baseline: dict):
+    """Print the change in throughput and peak RSS of each stage"""
+    meta = baseline["meta"]
+    print(f"\ncompared to {meta['commit'][:10]} ({meta['time']})")
+    print(f"{'stage':<22}{'seconds':>18}{'speedup':>10}{'peak RSS MB':>20}")
+    for stage, res in results["stages"].items():
+        if (old := baseline["stages"].get(stage)) is None:
+            continue
+        speedup = old["seconds"] / max(res["seconds"], 1e-9)
+        print(
+            f"{stage:<22}{old['seconds']:>8.2f} -> {res['seconds']:<7.2f}"
+            f"{speedup:>9.2f}x{old['peak_rss_mb']:>9.0f} -> {res['peak_rss_mb']:<7.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filings", type=int, default=2000, help="filings in corpus")
+    parser.add_argument("--ciks", type=int, default=200, help="ciks in corpus")
+    parser.add_argument("--seed", type=int, default=0, help="seed of corpus")
+    parser.add_argument(
+        "-t", "--threads", type=int, default=os.cpu_count(), help="threads per stage"
+    )
+    parser.add_argument(
+        "--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to run"
+    )
+    parser.add_argument("--corpus", help="directory to keep the corpus in and reuse")
+    parser.add_argument("--output", help="JSON file of results")
+    parser.add_argument("--compare", help="JSON file of results to compare to")
+    args = parser.parse_args()
+
+    root = args.corpus or tempfile.mkdtemp(prefix="edgar-corpus-")
+    try:
+        summary_path = os.path.join(root, "corpus.json")
+        params = {"n_filings": args.filings, "n_ciks": args.ciks, "seed": args.seed}
+        summary = None
+        if os.path.exists(summary_path):
+            with open(summary_path) as f:
+                summary = json.load(f)
+            if summary["params"] != params:
+                sys.exit(f"{root} has a corpus generated with {summary['params']}")
+        if summary is None:
+            print(f"generating corpus of {args.filings} filings in {root}")
+            start = time.perf_counter()
+            summary = {"params": params, **corpus.generate(root, **params)}
+            with open(summary_path, "w") as f:
+                json.dump(summary, f, indent=1)
+            print(f"generated in {time.perf_counter() - start:.1f} s")
+
+        results = {
+            "meta": metadata(args),
+            "corpus": summary,
+            "stages": bench(args, root, summary),
+        }
+    finally:
+        if args.corpus is None:
+            shutil.rmtree(root)
+
+    output = args.output or f"bench-pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"results saved to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
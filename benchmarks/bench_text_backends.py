@@ -0,0 +1,59 @@
+"""Benchmark backends converting HTML to text, as used by find_loan_contracts
+
+Usage:
+    python benchmarks/bench_text_backends.py [filing.txt.gz ...]
+
+Without filings, a synthetic exhibit of a credit agreement is used.
+"""
+import random
+import sys
+import time
+
+from edgaranalyzer.cmd_find_loans import NSS_10_words
+from edgaranalyzer.keywords import KeywordMatcher
+from edgaranalyzer.text import TEXT_BACKENDS, html_to_text
+from edgaranalyzer.utils import iter_documents
+
+
+def synthetic_exhibit(paragraphs: int = 20_000, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    words = ["the", "Borrower", "shall", "Lender", "Agreement", "any", "of", "in"]
+    rows = []
+    for i in range(paragraphs):
+        text = " ".join(rnd.choice(words) for _ in range(30))
+        if i % 1000 == 0:
+            text += " <b>REVOLVING CREDIT</b> AGREEMENT"
+        rows.append(
+            f'<p style="margin:0"><font size="2">{text}&nbsp;&#8220;{i}&#8221;'
+            f"</font></p>\n<table><tr><td>{i}</td><td>&amp;</td></tr></table>\n"
+        )
+    return f"<DOCUMENT>\n<TYPE>EX-10.1\n<TEXT>\n<html><body>{''.join(rows)}"\
+        "</body></html>\n</TEXT>\n</DOCUMENT>\n"
+
+
+def main():
+    if len(sys.argv) > 1:
+        docs = [
+            text
+            for path in sys.argv[1:]
+            for _, name, _, text in iter_documents(path)
+            if name.endswith(("htm", "html", "txt"))
+        ]
+    else:
+        docs = [synthetic_exhibit()]
+    matcher = KeywordMatcher(NSS_10_words)
+    size = sum(len(doc) for doc in docs) / 1e6
+    print(f"{len(docs)} documents, {size:.1f} MB")
+
+    for backend in TEXT_BACKENDS:
+        start = time.perf_counter()
+        hits = sum(matcher.search(html_to_text(d, backend)) is not None for d in docs)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{backend:>15}: {elapsed:8.3f}s {size / elapsed:8.2f} MB/s, "
+            f"{hits} documents with loan keywords"
+        )
+
+
+if __name__ == "__main__":
+    main()
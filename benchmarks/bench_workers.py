@@ -0,0 +1,77 @@
+"""Benchmark startup and per-task overhead of the worker pool of find commands
+
+Usage:
+    python benchmarks/bench_workers.py [n_tasks] [--backend backend]
+
+For each start method, reports the seconds until the first task of a new pool
+returns, i.e., starting a worker and loading the text backend, and the cost
+per task of empty chunks of filings, given the search function once by the
+initializer of workers or, as before, pickled with every task.
+"""
+import argparse
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import time
+
+from edgaranalyzer import cmd_find, cmd_find_loans
+from edgaranalyzer.cmd_find_loans import NSS_10_words
+
+
+def run_tasks(submit, n_tasks: int, in_flight: int) -> float:
+    """Seconds per task to run `n_tasks`, at most `in_flight` at a time"""
+    start = time.perf_counter()
+    futures, submitted = set(), 0
+    while submitted < n_tasks or futures:
+        while submitted < n_tasks and len(futures) < in_flight:
+            futures.add(submit())
+            submitted += 1
+        done, futures = concurrent.futures.wait(
+            futures, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for f in done:
+            f.result()
+    return (time.perf_counter() - start) / n_tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("n_tasks", type=int, nargs="?", default=2000)
+    parser.add_argument("--backend", default="fast", help="text backend")
+    parser.add_argument("-t", "--threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    keywords = tuple(NSS_10_words)
+    search = functools.partial(
+        cmd_find_loans.regsearch, backend=args.backend, keywords=keywords
+    )
+    warmup = functools.partial(cmd_find_loans.warm_up, args.backend, keywords)
+    workers, in_flight = args.threads, 4 * args.threads
+    print(f"{'start method':<14}{'startup s':>12}{'task us':>12}{'pickled us':>12}")
+    for method in multiprocessing.get_all_start_methods():
+        start = time.perf_counter()
+        with cmd_find.WorkerPool(workers, search, "8-K", warmup, method) as pool:
+            pool.submit(cmd_find.search_chunk, []).result()
+            startup = time.perf_counter() - start
+            per_task = run_tasks(
+                lambda: pool.submit(cmd_find.search_chunk, []), args.n_tasks, in_flight
+            )
+        # The search function and its arguments sent with every task
+        context = multiprocessing.get_context(method)
+        with concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=context
+        ) as exe:
+            exe.submit(cmd_find.search_filings, search, "8-K", []).result()
+            pickled = run_tasks(
+                lambda: exe.submit(cmd_find.search_filings, search, "8-K", []),
+                args.n_tasks,
+                in_flight,
+            )
+        print(
+            f"{method:<14}{startup:>12.3f}{per_task * 1e6:>12.0f}{pickled * 1e6:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
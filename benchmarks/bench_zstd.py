@@ -0,0 +1,104 @@
+"""Benchmark disk size and decompression of gzipped and recompressed filings
+
+Usage:
+    python benchmarks/bench_zstd.py [data_dir file_type [n_filings]]
+
+Filings of the data directory, or synthetic 8-K filings if none is given,
+are copied to a temporary directory, timed when read as downloaded, then
+recompressed as by `recompress_filings` and timed again. Requires zstandard.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_loan_search import write_filing
+from edgaranalyzer.cmd_recompress_filings import (
+    sample_filings,
+    train_dictionary,
+    recompress_cik,
+)
+from edgaranalyzer.utils import (
+    walk_dirpath,
+    open_filing,
+    read_header,
+    filing_stat,
+    split_packed,
+    open_pack,
+    zstd_dictionary_path,
+)
+
+REPEAT = 3
+LEVEL = 9
+
+
+def read_all(paths: list) -> int:
+    n = 0
+    for p in paths:
+        with open_filing(p) as f:
+            while chunk := f.read(1 << 20):
+                n += len(chunk)
+    return n
+
+
+def read_headers(paths: list) -> int:
+    return sum(len(read_header(p)) for p in paths)
+
+
+def measure(label: str, dir_path: str, ciks: list, file_type: str):
+    paths = [p for cik in ciks for p, *_ in walk_dirpath(dir_path, cik, file_type)]
+    size = sum(filing_stat(p)[0] for p in paths)
+    print(f"{label}: {len(paths)} filings, {size / 2**20:.1f} MB on disk")
+    for name, read in [("whole filing", read_all), ("header only", read_headers)]:
+        # Best of repeated runs, less affected by other processes
+        elapsed = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            read(paths)
+            elapsed.append(time.perf_counter() - start)
+        ms = min(elapsed) / len(paths) * 1000
+        print(f"  {name}: {ms:7.3f} ms per filing")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 2:
+            src, file_type = sys.argv[1], sys.argv[2]
+            n = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+            _, ciks, _ = next(os.walk(src))
+            filings = [
+                (cik, p) for cik in ciks for p, *_ in walk_dirpath(src, cik, file_type)
+            ]
+            for cik, p in random.Random(0).sample(filings, min(n, len(filings))):
+                os.makedirs(os.path.join(tmp, cik, file_type), exist_ok=True)
+                dst = os.path.join(tmp, cik, file_type, os.path.basename(p))
+                # Packed filings are copied as files, as stored
+                archive, filename = split_packed(p)
+                if filename is None:
+                    shutil.copyfile(p, dst)
+                    continue
+                with open(dst, "wb") as out, open_pack(archive).open(filename) as raw:
+                    shutil.copyfileobj(raw, out)
+        else:
+            file_type, rnd = "8-K", random.Random(0)
+            for i in range(200):
+                cik = str(1000 + i % 50)
+                os.makedirs(os.path.join(tmp, cik, file_type), exist_ok=True)
+                name = f"2020-01-01_{int(cik):010d}-20-{i:06d}.txt.gz"
+                write_filing(os.path.join(tmp, cik, file_type, name), rnd, i % 2 == 0)
+        _, ciks, _ = next(os.walk(tmp))
+
+        measure("gzip", tmp, ciks, file_type)
+        start = time.perf_counter()
+        samples = sample_filings(tmp, ciks, file_type, 2000)
+        train_dictionary(zstd_dictionary_path(tmp, file_type), samples, 112_640, LEVEL)
+        for cik in ciks:
+            recompress_cik(tmp, cik, file_type, LEVEL)
+        print(f"recompressed in {time.perf_counter() - start:.1f} s")
+        measure(f"zstd level {LEVEL}", tmp, ciks, file_type)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Check the cold start of the command line tool and of worker processes
+
+Usage:
+    python benchmarks/check_startup.py [--max_ms 60] [--repeat 7] [--top 10]
+
+Runs `edgar-analyzer -h`, and imports each module a worker process of the
+find commands imports, in fresh interpreters with `-X importtime`. Fails if
+the best time of `edgar-analyzer -h`, over that of a bare interpreter, exceeds
+`--max_ms`, or if any of them imports a heavy module, e.g., pandas or the
+`requests_html` backend, which must be imported only by the code that uses
+it. The slowest imports of each are listed, as an audit of import time.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported by a worker process of the find commands, e.g., when
+# started by spawn or forkserver
+WORKER_MODULES = [
+    "edgaranalyzer.cmd_find_items",
+    "edgaranalyzer.cmd_find_event_date",
+    "edgaranalyzer.cmd_find_zipcode",
+    "edgaranalyzer.cmd_find_header",
+    "edgaranalyzer.cmd_build_header_store",
+    "edgaranalyzer.cmd_find_loans",
+    "edgaranalyzer.cmd_find_loan_signature",
+]
+
+# Heavy or optional modules, imported only when used
+HEAVY = [
+    "pandas",
+    "numpy",
+    "requests_html",
+    "lxml",
+    "pyppeteer",
+    "zstandard",
+    "tqdm",
+    "cProfile",
+    "pstats",
+]
+# Also not imported by `edgar-analyzer -h`, only by the downloaders
+HEAVY_CLI = [*HEAVY, "http.client", "ssl"]
+
+
+def run(argv: list) -> tuple:
+    """Run python with `-X importtime`
+
+    Returns:
+        tuple: (seconds elapsed, list of (module, self us, cumulative us))
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO, env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.exit(f"{' '.join(argv)} exited with {proc.returncode}:\n{proc.stderr}")
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return seconds, imports
+
+
+def best_of(argv: list, repeat: int) -> tuple:
+    """Best time of repeated runs, and the imports of the last run"""
+    runs = [run(argv) for _ in range(repeat)]
+    return min(seconds for seconds, _ in runs), runs[-1][1]
+
+
+def audit(label: str, imports: list, heavy: list, top: int) -> list:
+    """Print the slowest imports, and return the heavy modules imported"""
+    print(f"\n{label}: {len(imports)} modules imported")
+    for name, self_us, cumulative_us in sorted(imports, key=lambda i: -i[1])[:top]:
+        print(f"  {self_us / 1000:>7.1f} ms {cumulative_us / 1000:>7.1f} ms  {name}")
+    names = {name for name, _, _ in imports}
+    return [module for module in heavy if module in names]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--max_ms",
+        type=float,
+        default=60,
+        help="maximum ms of `edgar-analyzer -h` over a bare interpreter",
+    )
+    parser.add_argument("--repeat", type=int, default=7, help="runs, best taken")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed")
+    args = parser.parse_args()
+
+    failures = []
+    bare, _ = best_of(["-c", "pass"], args.repeat)
+    cli, imports = best_of(["-m", "edgaranalyzer.main", "-h"], args.repeat)
+    heavy = audit("edgar-analyzer -h", imports, HEAVY_CLI, args.top)
+    if heavy:
+        failures.append(f"edgar-analyzer -h imports {', '.join(heavy)}")
+    for module in WORKER_MODULES:
+        _, imports = run(["-c", f"import {module}"])
+        heavy = audit(f"worker of {module}", imports, HEAVY, args.top)
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+
+    overhead_ms = (cli - bare) * 1000
+    print(
+        f"\nedgar-analyzer -h: {cli * 1000:.0f} ms, bare interpreter: "
+        f"{bare * 1000:.0f} ms, overhead {overhead_ms:.0f} ms (max {args.max_ms:.0f})"
+    )
+    if overhead_ms > args.max_ms:
+        failures.append(f"edgar-analyzer -h takes {overhead_ms:.0f} ms to start")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Deterministic synthetic corpus of EDGAR filings and index files
+
+Usage:
+    python benchmarks/corpus.py output_dir [n_filings [n_ciks]]
+
+The corpus is laid out as downloaded by edgar-analyzer:
+
+    {output_dir}/index/{year}-QTR{quarter}.tsv   index files, as `download_index`
+    {output_dir}/data/{cik}/{file_type}/{date}_{accession}.txt.gz   filings
+
+Filings have SEC headers of the structure of real filings (filer, company
+data, business address, item information), a main document, a press release
+(EX-99.1), a graphic, and for some of them a large HTML credit agreement
+(EX-10.1) with the signature block of a lender. Filings per cik are skewed,
+a few ciks filing most of them, as in EDGAR. The same arguments always give
+the same corpus, byte for byte.
+"""
+import functools
+import gzip
+import io
+import os
+import random
+import sys
+import zipfile
+
+FILE_TYPE = "8-K"
+YEAR = 2020
+WORDS = [
+    "the", "Company", "shall", "any", "of", "in", "to", "such", "period",
+    "Borrower", "Lender", "Agreement", "interest", "payment", "date", "and",
+]  # fmt: skip
+ITEMS = [
+    "Entry into a Material Definitive Agreement",
+    "Results of Operations and Financial Condition",
+    "Regulation FD Disclosure",
+    "Other Events",
+    "Financial Statements and Exhibits",
+]
+STATES = ["DE", "NY", "CA", "TX", "NV", "IL", "MA", "WA"]
+# Rows of other forms in index files, not downloaded
+OTHER_FORMS = ["10-K", "10-Q", "4", "SC 13G", "S-1"]
+
+
+@functools.lru_cache(maxsize=1)
+def paragraph_pool() -> tuple:
+    # Drawn from a pool, much faster than drawing words, and larger than
+    # the window of gzip so that filings do not compress unrealistically well
+    rnd = random.Random(0)
+    return tuple(
+        f"<p style=\"margin:0\"><font size=\"2\">{' '.join(rnd.choices(WORDS, k=40))}"
+        "</font></p>\n"
+        for _ in range(1000)
+    )
+
+
+def paragraphs(rnd: random.Random, n: int) -> str:
+    return "".join(rnd.choices(paragraph_pool(), k=n))
+
+
+def credit_agreement(rnd: random.Random) -> str:
+    # Sizes of exhibits are lognormal, from tens of KB to several MB
+    n = min(int(rnd.lognormvariate(7, 0.8)), 20_000)
+    return (
+        "<p><b>CREDIT AGREEMENT</b></p>\n"
+        "<p>dated as of the date hereof, among the Borrower, the Lenders party "
+        "hereto and FIRST NATIONAL BANK, N.A., as Administrative Agent</p>\n"
+        + paragraphs(rnd, n)
+        + "<p>IN WITNESS WHEREOF, the parties have executed this Agreement.</p>"
+        "<table><tr><td>ACME CORP., as Borrower</td></tr><tr><td>By:</td>"
+        "<td>/s/ Jane Doe</td></tr><tr><td>Name: Jane Doe</td></tr>"
+        "<tr><td>Title: Chief Financial Officer</td></tr>"
+        "<tr><td>FIRST NATIONAL BANK, N.A., as Administrative Agent</td></tr>"
+        "<tr><td>By:</td><td>/s/ John Smith</td></tr><tr><td>Name: John Smith"
+        "</td></tr><tr><td>Title: Vice President</td></tr></table>\n"
+    )
+
+
+def graphic(rnd: random.Random) -> str:
+    # Uuencoded image, which commands skip without decoding
+    lines = (
+        "M" + "".join(rnd.choices("!\"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGH", k=60))
+        for _ in range(200)
+    )
+    return "begin 644 logo.jpg\n" + "\n".join(lines) + "\nend\n"
+
+
+def header(
+    rnd: random.Random, cik: str, name: str, accession: str, date: str, n_docs: int
+) -> str:
+    filed = date.replace("-", "")
+    items = sorted(rnd.sample(ITEMS, rnd.randint(1, 3)), key=ITEMS.index)
+    state = STATES[int(cik) % len(STATES)]
+    lines = [
+        f"<SEC-DOCUMENT>{accession}.txt : {filed}",
+        f"<SEC-HEADER>{accession}.hdr.sgml : {filed}",
+        f"<ACCEPTANCE-DATETIME>{filed}163012",
+        f"ACCESSION NUMBER:\t\t{accession}",
+        f"CONFORMED SUBMISSION TYPE:\t{FILE_TYPE}",
+        f"PUBLIC DOCUMENT COUNT:\t\t{n_docs}",
+        f"CONFORMED PERIOD OF REPORT:\t{filed[:6]}{max(int(filed[6:]) - 1, 1):02d}",
+        *(f"ITEM INFORMATION:\t\t{item}" for item in items),
+        f"FILED AS OF DATE:\t\t{filed}",
+        f"DATE AS OF CHANGE:\t\t{filed}",
+        "",
+        "FILER:",
+        "",
+        "\tCOMPANY DATA:\t",
+        f"\t\tCOMPANY CONFORMED NAME:\t\t\t{name}",
+        f"\t\tCENTRAL INDEX KEY:\t\t\t{int(cik):010d}",
+        "\t\tSTANDARD INDUSTRIAL CLASSIFICATION:\tSERVICES-PREPACKAGED SOFTWARE [7372]",
+        f"\t\tIRS NUMBER:\t\t\t\t{rnd.randint(10**8, 10**9 - 1)}",
+        f"\t\tSTATE OF INCORPORATION:\t\t\t{state}",
+        "\t\tFISCAL YEAR END:\t\t\t1231",
+        "",
+        "\tFILING VALUES:",
+        f"\t\tFORM TYPE:\t\t{FILE_TYPE}",
+        "\t\tSEC ACT:\t\t1934 Act",
+        f"\t\tSEC FILE NUMBER:\t001-{int(cik) % 100000:05d}",
+        f"\t\tFILM NUMBER:\t\t{rnd.randint(10**7, 10**8 - 1)}",
+        "",
+        "\tBUSINESS ADDRESS:\t",
+        f"\t\tSTREET 1:\t\t{rnd.randint(1, 999)} MAIN STREET",
+        "\t\tCITY:\t\t\tSPRINGFIELD",
+        f"\t\tSTATE:\t\t\t{state}",
+        f"\t\tZIP:\t\t\t{rnd.randint(10000, 99999)}",
+        f"\t\tBUSINESS PHONE:\t\t{rnd.randint(10**9, 10**10 - 1)}",
+        "",
+        "\tMAIL ADDRESS:\t",
+        f"\t\tSTREET 1:\t\tPO BOX {rnd.randint(1, 9999)}",
+        "\t\tCITY:\t\t\tSPRINGFIELD",
+        f"\t\tSTATE:\t\t\t{state}",
+        "</SEC-HEADER>",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def filing(
+    rnd: random.Random, cik: str, name: str, accession: str, date: str, loan: bool
+) -> str:
+    docs = [(FILE_TYPE, "form8-k.htm", paragraphs(rnd, rnd.randint(20, 80)))]
+    if loan:
+        docs.append(("EX-10.1", "ex10-1.htm", credit_agreement(rnd)))
+    docs.append(("EX-99.1", "ex99-1.htm", paragraphs(rnd, rnd.randint(50, 500))))
+    docs.append(("GRAPHIC", "logo.jpg", graphic(rnd)))
+    parts = [header(rnd, cik, name, accession, date, len(docs))]
+    for i, (doc_type, filename, text) in enumerate(docs, 1):
+        parts.append(
+            f"<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{i}\n<FILENAME>{filename}\n"
+            f"<DESCRIPTION>{doc_type}\n<TEXT>\n<html><body>\n{text}</body></html>\n"
+            "</TEXT>\n</DOCUMENT>\n"
+        )
+    parts.append("</SEC-DOCUMENT>\n")
+    return "".join(parts)
+
+
+def write_gzip(path: str, text: str):
+    # No timestamp in the gzip header, so that files are reproducible
+    with open(path, "wb") as raw, gzip.GzipFile(
+        fileobj=raw, mode="wb", compresslevel=6, mtime=0
+    ) as f:
+        f.write(text.encode())
+
+
+def generate(
+    root: str,
+    n_filings: int = 1000,
+    n_ciks: int = 100,
+    loan_share: float = 0.3,
+    seed: int = 0,
+) -> dict:
+    """Write a corpus of filings and the index files listing them
+
+    Args:
+        root (str): output directory
+        n_filings (int, optional): number of filings. Defaults to 1000.
+        n_ciks (int, optional): number of ciks. Defaults to 100.
+        loan_share (float, optional): share of filings with a credit
+            agreement. Defaults to 0.3.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        dict: summary of the corpus, with its parameters, number of filings,
+            index rows and bytes
+    """
+    rnd = random.Random(seed)
+    ciks = [str(1000 + 37 * i) for i in range(n_ciks)]
+    # Pareto weights, a few ciks filing most filings
+    weights = [rnd.paretovariate(1.2) for _ in ciks]
+    rows = {q: [] for q in range(1, 5)}
+    data_bytes = raw_bytes = 0
+    serial = n_filings
+    for i, cik in enumerate(sorted(rnd.choices(ciks, weights, k=n_filings), key=int)):
+        quarter, day = rnd.randint(1, 4), rnd.randint(1, 28)
+        date = f"{YEAR}-{3 * quarter - rnd.randint(0, 2):02d}-{day:02d}"
+        accession = f"{int(cik):010d}-{YEAR % 100}-{i:06d}"
+        name = f"COMPANY {cik} INC"
+        text = filing(rnd, cik, name, accession, date, rnd.random() < loan_share)
+        dirpath = os.path.join(root, "data", cik, FILE_TYPE)
+        os.makedirs(dirpath, exist_ok=True)
+        path = os.path.join(dirpath, f"{date}_{accession}.txt.gz")
+        write_gzip(path, text)
+        data_bytes += os.path.getsize(path)
+        raw_bytes += len(text)
+        rows[quarter].append((cik, name, FILE_TYPE, date, accession))
+        # Filings of other forms, in the index only
+        for _ in range(rnd.randint(0, 3)):
+            serial += 1
+            other = f"{int(cik):010d}-{YEAR % 100}-{serial:06d}"
+            rows[quarter].append((cik, name, rnd.choice(OTHER_FORMS), date, other))
+
+    index_rows = index_bytes = 0
+    os.makedirs(os.path.join(root, "index"), exist_ok=True)
+    for quarter, quarter_rows in rows.items():
+        path = os.path.join(root, "index", f"{YEAR}-QTR{quarter}.tsv")
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            for cik, name, form, date, accession in sorted(quarter_rows):
+                url = f"edgar/data/{cik}/{accession}.txt"
+                html = url.replace(".txt", "-index.html")
+                f.write(f"{cik}|{name}|{form}|{date}|{url}|{html}\n")
+        index_rows += len(quarter_rows)
+        index_bytes += os.path.getsize(path)
+    return {
+        "seed": seed,
+        "n_ciks": n_ciks,
+        "loan_share": loan_share,
+        "filings": n_filings,
+        "filings_bytes": data_bytes,
+        "filings_raw_bytes": raw_bytes,
+        "index_rows": index_rows,
+        "index_bytes": index_bytes,
+    }
+
+
+def master_zip(tsv_path: str) -> bytes:
+    """Zipped master index of EDGAR, "master.zip", listing the rows of an
+    index file of the corpus, as served by EDGAR
+
+    Args:
+        tsv_path (str): path to the index file
+
+    Returns:
+        bytes: zip archive with "master.idx"
+    """
+    lines = [
+        "Description:           Master Index of EDGAR Dissemination Feed",
+        "Last Data Received:    December 31, 2020",
+        "Comments:              webmaster@sec.gov",
+        "Anonymous FTP:         ftp://ftp.sec.gov/edgar/",
+        "Cloud HTTP:            https://www.sec.gov/Archives/",
+        "",
+        "",
+        "",
+        "",
+        "CIK|Company Name|Form Type|Date Filed|Filename",
+        "-" * 80,
+    ]
+    with open(tsv_path, encoding="utf-8") as f:
+        lines.extend(line.rstrip("\n").rsplit("|", 1)[0] for line in f)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        info = zipfile.ZipInfo("master.idx", (YEAR + 1, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        z.writestr(info, ("\n".join(lines) + "\n").encode("latin-1"))
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    n_filings = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    n_ciks = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    print(generate(sys.argv[1], n_filings, n_ciks))
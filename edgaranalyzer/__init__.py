@@ -15,9 +15,14 @@ CMD = types.SimpleNamespace()
 CMD.DOWNLOAD_INDEX = "download_index"
 CMD.DOWNLOAD_FILINGS = "download_filings"
 CMD.BUILD_DATABASE = "build_database"
+CMD.MIGRATE_FILINGS = "migrate_filings"
+CMD.PACK_FILINGS = "pack_filings"
+CMD.RECOMPRESS_FILINGS = "recompress_filings"
+CMD.BUILD_HEADER_STORE = "build_header_store"
 CMD.FIND_ITEMS = "find_reported_items"
 CMD.FIND_LOANS = "find_loan_contracts"
 CMD.FIND_ZIPCODE = "find_zipcode"
 CMD.FIND_EVENT_DATE = "find_event_date"
+CMD.FIND_HEADER = "find_header_fields"
 CMD.FIND_LOAN_SIGNATURE = "find_loan_signature"
 CMD.SAMPLE_LOANS = "sample_loan_contracts"
@@ -1,10 +1,43 @@
 import argparse
+import hashlib
 import os
 import pathlib
 import sqlite3
+import types
+from typing import Iterator
 
 EDGAR_BASE = "https://www.sec.gov/Archives/"
 
+sql = types.SimpleNamespace()
+sql.create_table = """CREATE TABLE IF NOT EXISTS edgar_idx
+    (cik TEXT, firm_name TEXT, file_type TEXT, date DATE, url TEXT PRIMARY KEY);"""
+
+sql.create_index = """CREATE INDEX IF NOT EXISTS edgar_idx_file_type
+    ON edgar_idx (file_type, cik, date);"""
+
+sql.insert = """INSERT OR IGNORE INTO edgar_idx
+    (cik, firm_name, file_type, date, url) VALUES (?,?,?,?,?);"""
+
+# Index files ingested, so that only new or changed files are ingested again
+sql.create_files_table = """CREATE TABLE IF NOT EXISTS edgar_idx_files
+    (filename TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT);"""
+
+sql.select_file = """SELECT size, mtime, sha256 FROM edgar_idx_files
+    WHERE filename=?;"""
+
+sql.insert_file = """INSERT OR REPLACE INTO edgar_idx_files
+    (filename, size, mtime, sha256) VALUES (?,?,?,?);"""
+
+# Tables built by earlier versions have no primary key, and possibly
+# duplicated rows, so they are rebuilt keeping one row per url
+sql.migrate = [
+    "ALTER TABLE edgar_idx RENAME TO edgar_idx_old;",
+    sql.create_table,
+    """INSERT OR IGNORE INTO edgar_idx (cik, firm_name, file_type, date, url)
+    SELECT cik, firm_name, file_type, date, url FROM edgar_idx_old;""",
+    "DROP TABLE edgar_idx_old;",
+]
+
 
 def cmd(args: argparse.Namespace):
     inputdir = pathlib.Path(args.inputdir).resolve().as_posix()
@@ -16,35 +49,116 @@ def cmd(args: argparse.Namespace):
         os.makedirs(os.path.dirname(dbpath))
 
     conn = sqlite3.connect(dbpath)
-    c = conn.cursor()
-    c.execute(
-        """CREATE TABLE IF NOT EXISTS edgar_idx 
-        (cik TEXT, firm_name TEXT, file_type TEXT, date DATE, url TEXT);"""
-    )
+    init_database(conn)
 
     for dirpath, _, filenames in os.walk(inputdir):
         for filename in filenames:
+            # Temporary files and the cache of `download_index`
+            if filename.startswith("."):
+                continue
             filepath = os.path.join(dirpath, filename)
-            print(f"Populating database using {filepath}")
-            with open(filepath, "r") as f:
-                lines = f.readlines()
-            data = [parse(line) for line in lines]
-            c.executemany(
-                "INSERT OR IGNORE INTO edgar_idx \
-                    (cik, firm_name, file_type, date, url) VALUES (?,?,?,?,?)",
-                data,
-            )
+            filename = os.path.relpath(filepath, inputdir)
+            if ingest_file(conn, filepath, filename, args.rescan):
+                print(f"Populated database using {filepath}")
 
-    conn.commit()
     conn.close()
 
 
+def init_database(conn: sqlite3.Connection):
+    """Create the index table and its index, in WAL mode
+
+    Args:
+        conn (sqlite3.Connection): database connection
+    """
+    c = conn.cursor()
+    c.execute("PRAGMA journal_mode=WAL;")
+    c.execute(sql.create_table)
+    c.execute("PRAGMA table_info(edgar_idx);")
+    if not any(pk for *_, pk in c.fetchall()):
+        print("Rebuilding table edgar_idx with primary key on url")
+        for stmt in sql.migrate:
+            c.execute(stmt)
+    c.execute(sql.create_index)
+    c.execute(sql.create_files_table)
+    conn.commit()
+
+
+def ingest_file(
+    conn: sqlite3.Connection, filepath: str, filename: str, rescan: bool = False
+) -> bool:
+    """Insert rows of an index file into the database, unless the file is
+    ingested already and not changed since
+
+    Args:
+        conn (sqlite3.Connection): database connection
+        filepath (str): path to the index file
+        filename (str): name of the index file recorded, relative to the
+            input directory
+        rescan (bool, optional): ingest the file even if ingested already.
+            Defaults to False.
+
+    Returns:
+        bool: True if rows of the file are inserted
+    """
+    c = conn.cursor()
+    stat = os.stat(filepath)
+    size, mtime = stat.st_size, stat.st_mtime
+    c.execute(sql.select_file, (filename,))
+    ingested = c.fetchone()
+    if not rescan and ingested and ingested[:2] == (size, mtime):
+        return False
+    sha256 = file_hash(filepath)
+    if not rescan and ingested and ingested[2] == sha256:
+        # Touched but not changed, e.g., downloaded again
+        c.execute(sql.insert_file, (filename, size, mtime, sha256))
+        conn.commit()
+        return False
+    # One transaction per index file, together with its record
+    c.executemany(sql.insert, parse_file(filepath))
+    c.execute(sql.insert_file, (filename, size, mtime, sha256))
+    conn.commit()
+    return True
+
+
+def file_hash(filepath: str) -> str:
+    """SHA-256 of a file
+
+    Args:
+        filepath (str): path to the file
+
+    Returns:
+        str: hex digest
+    """
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_file(filepath: str) -> Iterator[tuple]:
+    """Yield rows of an index file, line by line
+
+    Args:
+        filepath (str): path to the index file
+
+    Yields:
+        tuple: (cik, firm_name, file_type, date, url)
+    """
+    with open(filepath, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if (row := parse(line)) is not None:
+                yield row
+
+
 def parse(line):
     # each line: "cik|firm_name|file_type|date|url_txt|url_html"
     # an example:
     # "99780|TRINITY INDUSTRIES INC|8-K|2020-01-15|edgar/data/99780/0000099780-\
     # 20-000008.txt|edgar/data/99780/0000099780-20-000008-index.html"
-    line = tuple(line.split("|")[:5])
-    l = list(line)
+    l = line.rstrip("\n").split("|")[:5]
+    if len(l) < 5 or not l[0].isdigit():
+        # header lines of the index file, e.g., "CIK|Company Name|..."
+        return None
     l[-1] = EDGAR_BASE + l[-1]
     return tuple(l)
@@ -0,0 +1,202 @@
+import argparse
+import functools
+import itertools
+import logging
+import operator
+import os
+import pathlib
+import sqlite3
+import sys
+import types
+import typing
+
+from edgaranalyzer import CMD
+from .cmd_find import cmd_find, create_result_table, ledger_sql, ResultWriter
+from .utils import (
+    prefix_logger,
+    read_header,
+    parse_filing_name,
+    SECHeader,
+    HEADER_MAX_BYTES,
+)
+
+
+logger = prefix_logger(CMD.BUILD_HEADER_STORE, logging.getLogger(__name__))
+
+# One row per value of a header field, in the order of the header, so that
+# the parsed header of a filing is read back as is by `iter_headers`
+sql = types.SimpleNamespace()
+sql.create_table = """CREATE TABLE IF NOT EXISTS header_fields
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT,
+    seq INTEGER, field TEXT, value TEXT,
+    PRIMARY KEY(cik, file_type, date, accession, seq)) WITHOUT ROWID;"""
+
+sql.insert_result = """INSERT OR REPLACE INTO header_fields
+    (cik, file_type, date, accession, seq, field, value) VALUES (?,?,?,?,?,?,?);"""
+
+sql.delete_result = """DELETE FROM header_fields
+    WHERE cik=? AND file_type=? AND date=? AND accession IN (?, '');"""
+
+# Values of a field across filings, e.g., "FILER/COMPANY DATA/STATE OF
+# INCORPORATION", are read by the index without scanning the table
+sql.create_index = """CREATE INDEX IF NOT EXISTS header_fields_field
+    ON header_fields (file_type, field);"""
+
+sql.select = """SELECT cik, date, accession, field, value FROM header_fields
+    WHERE file_type=? ORDER BY cik, file_type, date, accession, seq;"""
+
+sql.select_processed = """SELECT cik, date, accession, size, mtime
+    FROM files_processed WHERE file_type=? AND extractor=? AND version=?;"""
+
+# Bump when `regsearch` changes, so that filings are processed again
+version = 1
+
+
+def cmd(args: argparse.Namespace):
+    search = functools.partial(regsearch, max_bytes=args.header_bytes)
+    cmd_find(args, logger, sql, search, {CMD.BUILD_HEADER_STORE: version})
+
+    # Created after the bulk insert of the first build, which is faster
+    db = pathlib.Path(args.database).expanduser().resolve().as_posix()
+    logger.info("indexing header fields")
+    conn = sqlite3.connect(db)
+    conn.execute(sql.create_index)
+    conn.commit()
+    conn.close()
+
+
+def regsearch(
+    filepath: str, cik: str, file_type: str, max_bytes: int = HEADER_MAX_BYTES
+) -> list:
+    """Search function on a filing, returning all fields of its header
+
+    Args:
+        filepath (str): path to the filing
+        cik (str): cik of company
+        file_type (str): file type, e.g., "8-K", "10-K"
+        max_bytes (int, optional): maximum bytes to read for the header.
+            Defaults to HEADER_MAX_BYTES.
+
+    Returns:
+        list: list of results, each is a value of a field of the header
+    """
+    date, accession = parse_filing_name(filepath)
+    header = read_header(filepath, max_bytes)
+    values = ((field, v) for field, values in header.items() for v in values)
+    return [
+        (cik, file_type, date, accession, seq, field, value)
+        for seq, (field, value) in enumerate(values)
+    ]
+
+
+def iter_headers(conn: sqlite3.Connection, file_type: str) -> typing.Iterator:
+    """Yield parsed headers of filings in the header store
+
+    Args:
+        conn (sqlite3.Connection): connection to the header store
+        file_type (str): file type, e.g., "8-K", "10-K"
+
+    Yields:
+        tuple: (cik, date, accession, header) of a filing
+    """
+    rows = conn.execute(sql.select, (file_type,))
+    for (cik, date, acc), values in itertools.groupby(
+        rows, key=operator.itemgetter(0, 1, 2)
+    ):
+        header: SECHeader = {}
+        for *_, field, value in values:
+            header.setdefault(field, []).append(value)
+        yield cik, date, acc, header
+
+
+def search_store(
+    args: argparse.Namespace,
+    logger: prefix_logger,
+    result_sql: typing.Mapping[str, types.SimpleNamespace],
+    search: typing.Callable,
+    versions: typing.Mapping[str, int],
+):
+    """Run `search` on headers in the header store, rather than on filings,
+    and store results in database, in place of `cmd_find`
+
+    Filings are recorded in the ledger of processed filings with the size and
+    modification time they had when stored, so that runs on the header store
+    and on filings skip the filings processed by each other.
+
+    Args:
+        args (argparse.Namespace): command line arguments
+        logger (prefix_logger): logger of the command
+        result_sql (Mapping[str, types.SimpleNamespace]): sql statements to
+            create table and insert results of each extractor
+        search (typing.Callable): search function on a parsed header, called
+            as `search(header, cik, file_type, date, accession)`, which returns
+            a mapping of the same keys as `result_sql` to results
+        versions (Mapping[str, int]): version of each extractor run by `search`
+    """
+    store = pathlib.Path(args.header_store).expanduser().resolve().as_posix()
+    db = pathlib.Path(args.database).expanduser().resolve().as_posix()
+    file_type = args.file_type
+
+    logger.info("started")
+    logger.info(f"header store: {store}")
+    if not os.path.exists(store):
+        logger.error("header store does not exist")
+        sys.exit(1)
+    logger.info(f"database: {db}")
+
+    conn = sqlite3.connect(db)
+    c = conn.cursor()
+    c.execute("PRAGMA journal_mode=WAL;")
+    for name, stmt in result_sql.items():
+        create_result_table(c, stmt, [name] if name in versions else versions)
+    c.execute(ledger_sql.create_table)
+    conn.commit()
+
+    store_conn = sqlite3.connect(store)
+    stored = {
+        (cik, date, acc): (size, mtime)
+        for cik, date, acc, size, mtime in store_conn.execute(
+            sql.select_processed,
+            (file_type, CMD.BUILD_HEADER_STORE, version),
+        )
+    }
+    processed = []
+    for extractor, v in versions.items() if not args.rescan else []:
+        c.execute(sql.select_processed, (file_type, extractor, v))
+        processed.append({(cik, d, acc): (s, m) for cik, d, acc, s, m in c})
+    conn.close()
+    todo = {
+        filing: stat
+        for filing, stat in stored.items()
+        if args.rescan or not all(p.get(filing) == stat for p in processed)
+    }
+    logger.info(f"filings in header store: {len(stored)}")
+    logger.info(f"filing type: {file_type}")
+
+    logger.info("start processing")
+    # Imported here, not by workers which import this module
+    import tqdm
+
+    writer = ResultWriter(db, args.batch_size, args.flush_interval)
+    writer.start()
+    ledger = []
+    for cik, date, acc, header in tqdm.tqdm(
+        iter_headers(store_conn, file_type), total=len(stored), unit="filing"
+    ):
+        if (stat := todo.get((cik, date, acc))) is None:
+            continue
+        for stmt in result_sql.values():
+            writer.put(stmt.delete_result, [(cik, file_type, date, acc)])
+        for name, rows in search(header, cik, file_type, date, acc).items():
+            if rows:
+                writer.put(result_sql[name].insert_result, rows)
+        for extractor, v in versions.items():
+            ledger.append((cik, file_type, date, acc, extractor, v, *stat))
+        if len(ledger) >= args.batch_size:
+            writer.put(ledger_sql.insert, ledger)
+            ledger = []
+    writer.put(ledger_sql.insert, ledger)
+    writer.close()
+    store_conn.close()
+    logger.info(f"filings processed: {len(todo)}")
+    logger.info("finished")
@@ -1,37 +1,121 @@
 import argparse
+import http.client
 import pathlib
 import os
 import sqlite3
 import random
+import sys
+import tempfile
 import time
-import urllib.request
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import types
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import tqdm
-import pandas as pd
 
+from .downloader import Downloader
+from .utils import (
+    filing_path,
+    locate_filing,
+    accession_from_url,
+    GZIP_SUFFIX,
+    ZSTD_SUFFIX,
+)
 
-LAST_REQ_TIME = 0
-QUERY_FILINGS = """SELECT CIK, FILE_TYPE, DATE, URL FROM EDGAR_IDX;"""
+# Persistent download jobs, so that an interrupted download resumes
+# where it stopped. State is one of "pending", "in-flight", "done", "failed".
+sql = types.SimpleNamespace()
+sql.create_table = """CREATE TABLE IF NOT EXISTS download_jobs
+    (url TEXT PRIMARY KEY, cik TEXT, file_type TEXT, date DATE,
+    state TEXT, attempts INTEGER, error TEXT);"""
 
+sql.create_index = """CREATE INDEX IF NOT EXISTS download_jobs_state
+    ON download_jobs (file_type, state);"""
 
-def download(job, progress):
-    global LAST_REQ_TIME
-    headers, datadir, cik, file_type, date, url = job
-    if round(time.time() * 1000) - LAST_REQ_TIME < 100:
-        time.sleep(0.1)
+sql.init = """INSERT OR IGNORE INTO download_jobs
+    (url, cik, file_type, date, state, attempts)
+    SELECT url, cik, file_type, date, 'pending', 0 FROM edgar_idx
+    WHERE file_type=?;"""
 
-    filename = os.path.join(datadir, cik, file_type, f"{date}.txt.gz")
+sql.reset = """UPDATE download_jobs SET state='pending'
+    WHERE file_type=? AND (state='in-flight' OR (state='failed' AND ?));"""
+
+sql.select = """SELECT cik, file_type, date, url FROM download_jobs
+    WHERE file_type=? AND state='pending' ORDER BY cik;"""
+
+sql.update = """UPDATE download_jobs SET state=?, attempts=attempts+?, error=?
+    WHERE url=?;"""
+
+# Responses worth retrying, i.e., rate limited or server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def download(downloader: Downloader, job, retries: int) -> tuple:
+    """Download a filing, retrying with exponential backoff
+
+    Args:
+        downloader (Downloader): downloader
+        job (tuple): (datadir, cik, file_type, date, url)
+        retries (int): maximum retries after the first attempt
+
+    Returns:
+        tuple: (url, state, attempts, error)
+    """
+    datadir, cik, file_type, date, url = job
+
+    filename = filing_path(datadir, cik, file_type, date, accession_from_url(url))
     os.makedirs(os.path.dirname(filename), exist_ok=True)
 
-    req = urllib.request.Request(url, headers=headers)
-    res = urllib.request.urlopen(req)
-    LAST_REQ_TIME = round(time.time() * 1000)
-    if res.status != 200:
-        return 1
-    with open(filename, "wb") as f:
-        f.write(res.read())
-        progress.update()
-    return 0
+    for attempt in range(1, retries + 2):
+        retry_after = None
+        try:
+            res = downloader.get_gzipped(url)
+        except (OSError, http.client.HTTPException) as e:
+            error = repr(e)
+        else:
+            if res.status == 200:
+                write_atomic(filename, res.body)
+                return url, "done", attempt, None
+            error = f"HTTP {res.status}"
+            if res.status not in RETRY_STATUS:
+                return url, "failed", attempt, error
+            retry_after = res.headers.get("Retry-After")
+        if attempt <= retries:
+            time.sleep(backoff(attempt, retry_after))
+    return url, "failed", attempt, error
+
+
+def backoff(attempt: int, retry_after: str | None = None) -> float:
+    """Seconds to wait before the next attempt
+
+    Args:
+        attempt (int): number of attempts made
+        retry_after (str | None, optional): Retry-After header of response.
+            Defaults to None.
+
+    Returns:
+        float: seconds to wait
+    """
+    if retry_after is not None and retry_after.isdigit():
+        return float(retry_after)
+    return min(2**attempt, 60) + random.random()
+
+
+def write_atomic(filename: str, data: bytes):
+    """Write to a temporary file and rename it, so that the file
+    is either complete or does not exist
+
+    Args:
+        filename (str): path to the file
+        data (bytes): content
+    """
+    dirname, basename = os.path.split(filename)
+    fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
 
 
 def cmd(args: argparse.Namespace):
@@ -42,31 +126,69 @@ def cmd(args: argparse.Namespace):
     if not os.path.exists(datadir):
         os.makedirs(datadir)
 
-    headers = {
-        "User-Agent": args.user_agent,
-        "Accept-Encoding": "gzip, deflate",
-        "Host": "www.sec.gov",
-    }
-
-    # Find out the missing ones on the disk
+    # Add new filings as download jobs, and resume unfinished jobs
     conn = sqlite3.connect(dbpath)
-    __sql = QUERY_FILINGS.replace(";", f' WHERE file_type=="{args.file_type}";')
-    df = pd.read_sql_query(__sql, conn)
-    conn.close()
+    c = conn.cursor()
+    c.execute(sql.create_table)
+    c.execute(sql.create_index)
+    c.execute(sql.init, (args.file_type,))
+    c.execute(sql.reset, (args.file_type, args.retry_failed))
+    conn.commit()
 
-    jobs = []
-    for _, (cik, file_type, date, url) in df.iterrows():
-        datapath = os.path.join(datadir, cik, file_type, f"{date}.txt.gz")
-        if not os.path.exists(datapath):
-            jobs.append((headers, datadir, cik, file_type, date, url))
+    # Filings downloaded before jobs were recorded need no requests,
+    # including those packed since
+    jobs, done, unmigrated = [], [], []
+    for cik, file_type, date, url in c.execute(sql.select, (args.file_type,)):
+        accession = accession_from_url(url)
+        if locate_filing(datadir, cik, file_type, date, accession) is not None:
+            done.append(("done", 0, None, url))
+        elif any(
+            os.path.exists(filing_path(datadir, cik, file_type, date, "", suffix))
+            for suffix in (ZSTD_SUFFIX, GZIP_SUFFIX)
+        ):
+            # Stored as "{date}.txt.gz" by earlier versions, of an unknown
+            # one of the filings of the day
+            unmigrated.append(filing_path(datadir, cik, file_type, date, ""))
+        else:
+            jobs.append((datadir, cik, file_type, date, url))
+    c.executemany(sql.update, done)
+    conn.commit()
+    if unmigrated:
+        conn.close()
+        sys.exit(
+            f"{len(unmigrated)} filings are stored as {{date}}.txt.gz by earlier "
+            f"versions, e.g., {unmigrated[0]}, and would be downloaded again. "
+            f"Run `migrate_filings -d {datadir} --file_type {args.file_type}` first."
+        )
 
-    # Download only the missing filings on the disk
+    # Download only the missing filings on the disk,
+    # with requests from all threads under one rate limit
+    downloader = Downloader(args.user_agent, rate=float(args.rate))
+    threads = int(args.threads)
     progress = tqdm.tqdm(total=len(jobs))
     random.shuffle(jobs)
-    with ThreadPoolExecutor(max_workers=int(args.threads)) as exe:
-        fs = []
-        for job in jobs:
-            fs.append(exe.submit(download, job, progress))
+    failed = 0
+    with ThreadPoolExecutor(max_workers=threads) as exe:
+        fs = set()
+        while jobs or fs:
+            # Keep a few jobs queued per thread, marked in-flight
+            submitted = []
+            while jobs and len(fs) < 2 * threads:
+                job = jobs.pop()
+                fs.add(exe.submit(download, downloader, job, args.retries))
+                submitted.append(("in-flight", 0, None, job[-1]))
+            c.executemany(sql.update, submitted)
 
-        for _ in as_completed(fs):
-            pass
+            completed, fs = wait(fs, return_when=FIRST_COMPLETED)
+            results = [f.result() for f in completed]
+            c.executemany(
+                sql.update,
+                [(state, n, err, url) for url, state, n, err in results],
+            )
+            conn.commit()
+            failed += sum(state == "failed" for _, state, _, _ in results)
+            progress.update(len(results))
+    downloader.close()
+    conn.close()
+    if failed:
+        print(f"{failed} filings failed to download, see table download_jobs")
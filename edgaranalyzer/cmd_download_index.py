@@ -1,8 +1,31 @@
-import os
 import argparse
+import datetime
+import gzip
+import http.client
+import io
+import json
+import os
 import pathlib
+import sqlite3
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import tqdm
+
+from .cmd_build_database import init_database, ingest_file, EDGAR_BASE
+from .cmd_download_filings import backoff, RETRY_STATUS
+from .downloader import Downloader
+
+INDEX_URL = EDGAR_BASE + "edgar/full-index/{year}/QTR{quarter}/master.zip"
+
+# Validators of index files downloaded, i.e., ETag and Last-Modified of the
+# response, so that requests for quarters not changed since are answered
+# by "304 Not Modified" without a body
+CACHE_FILENAME = ".index-cache.json"
 
-import edgar
+# Earliest year of EDGAR full index
+FIRST_YEAR = 1994
 
 
 def cmd(args: argparse.Namespace):
@@ -11,10 +34,231 @@ def cmd(args: argparse.Namespace):
     if not os.path.exists(path):
         os.makedirs(path)
 
-    if args.since_year < 1994:
-        args.since_year = 1994
+    if args.since_year < FIRST_YEAR:
+        args.since_year = FIRST_YEAR
+
+    cache_path = os.path.join(path, CACHE_FILENAME)
+    cache = load_cache(cache_path)
+
+    conn = None
+    if args.database:
+        dbpath = pathlib.Path(args.database).resolve().as_posix()
+        os.makedirs(os.path.dirname(dbpath), exist_ok=True)
+        conn = sqlite3.connect(dbpath)
+        init_database(conn)
+
+    # All quarters are requested, concurrently under one rate limit, and
+    # quarters not changed since last downloaded cost a request only
+    downloader = Downloader(args.user_agent, rate=float(args.rate))
+    quarters = quarters_since(args.since_year)
+    states = {}
+    with ThreadPoolExecutor(max_workers=int(args.threads)) as exe:
+        futures = [
+            exe.submit(
+                download_quarter,
+                downloader,
+                path,
+                year,
+                quarter,
+                cache.get(index_filename(year, quarter)),
+                args.retries,
+            )
+            for year, quarter in quarters
+        ]
+        for f in tqdm.tqdm(as_completed(futures), total=len(futures)):
+            filename, state, validators, error = f.result()
+            states[state] = states.get(state, 0) + 1
+            if error is not None:
+                print(f"Failed to download {filename}: {error}")
+            if validators is not None:
+                cache[filename] = validators
+                save_cache(cache_path, cache)
+            # Ingested by the main thread while other quarters download
+            filepath = os.path.join(path, filename)
+            if conn is not None and os.path.exists(filepath):
+                ingest_file(conn, filepath, filename)
+    downloader.close()
+    if conn is not None:
+        conn.close()
+    print(", ".join(f"{n} {state}" for state, n in sorted(states.items())))
+
+
+def quarters_since(since_year: int) -> list:
+    """Quarters from the first quarter of a year to the current quarter,
+    the latest first
+
+    Args:
+        since_year (int): first year
+
+    Returns:
+        list: list of (year, quarter)
+    """
+    today = datetime.date.today()
+    current = (today.year, (today.month - 1) // 3 + 1)
+    quarters = [
+        (year, quarter)
+        for year in range(since_year, today.year + 1)
+        for quarter in range(1, 5)
+        if (year, quarter) <= current
+    ]
+    return quarters[::-1]
+
+
+def index_filename(year: int, quarter: int) -> str:
+    """Name of the index file of a quarter, as named by `python-edgar`
+
+    Args:
+        year (int): year
+        quarter (int): quarter, from 1 to 4
+
+    Returns:
+        str: file name, e.g., "2022-QTR1.tsv"
+    """
+    return f"{year}-QTR{quarter}.tsv"
+
+
+def load_cache(cache_path: str) -> dict:
+    """Validators of index files downloaded
+
+    Args:
+        cache_path (str): path to the cache
+
+    Returns:
+        dict: mapping of file name to its validators
+    """
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cache(cache_path: str, cache: dict):
+    """Save validators of index files downloaded, atomically
+
+    Args:
+        cache_path (str): path to the cache
+        cache (dict): mapping of file name to its validators
+    """
+    dirname, basename = os.path.split(cache_path)
+    fd, tmp = tempfile.mkstemp(prefix=f"{basename}.", suffix=".part", dir=dirname)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, cache_path)
+
+
+def download_quarter(
+    downloader: Downloader,
+    path: str,
+    year: int,
+    quarter: int,
+    validators: dict | None,
+    retries: int,
+) -> tuple:
+    """Download the index file of a quarter, if changed since last downloaded,
+    retrying with exponential backoff
+
+    Args:
+        downloader (Downloader): downloader
+        path (str): output directory
+        year (int): year
+        quarter (int): quarter, from 1 to 4
+        validators (dict | None): validators of the index file when last
+            downloaded, or None
+        retries (int): maximum retries after the first attempt
+
+    Returns:
+        tuple: (file name, state, validators or None if not downloaded, error)
+    """
+    filename = index_filename(year, quarter)
+    filepath = os.path.join(path, filename)
+    headers = {}
+    # Requested unconditionally if the file is missing or changed locally
+    if validators is not None and validators.get("stat") == file_stat(filepath):
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    url = INDEX_URL.format(year=year, quarter=quarter)
+    for attempt in range(1, retries + 2):
+        retry_after = None
+        try:
+            res = downloader.get(url, headers)
+        except (OSError, http.client.HTTPException) as e:
+            error = repr(e)
+        else:
+            if res.status == 304:
+                return filename, "not modified", None, None
+            if res.status == 200:
+                body = res.body
+                if res.headers.get("Content-Encoding", "").lower() == "gzip":
+                    body = gzip.decompress(body)
+                try:
+                    write_index(filepath, body)
+                except (zipfile.BadZipFile, KeyError) as e:
+                    return filename, "failed", None, repr(e)
+                validators = {
+                    "etag": res.headers.get("ETag"),
+                    "last_modified": res.headers.get("Last-Modified"),
+                    "stat": file_stat(filepath),
+                }
+                return filename, "downloaded", validators, None
+            error = f"HTTP {res.status}"
+            if res.status == 404:
+                # e.g., the current quarter before its first filing
+                return filename, "not found", None, None
+            if res.status not in RETRY_STATUS:
+                return filename, "failed", None, error
+            retry_after = res.headers.get("Retry-After")
+        if attempt <= retries:
+            time.sleep(backoff(attempt, retry_after))
+    return filename, "failed", None, error
+
+
+def file_stat(filepath: str) -> list | None:
+    """Size and modification time of a file, in nanoseconds
+
+    Args:
+        filepath (str): path to the file
+
+    Returns:
+        list | None: [size, mtime], or None if the file does not exist
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_index(filepath: str, data: bytes):
+    """Write the index file of a quarter from the zipped master index, in the
+    format of `python-edgar`, to a temporary file renamed when complete
+
+    Each line is "cik|firm_name|file_type|date|url_txt|url_html", where the
+    url of the html index is appended to the line of the master index.
 
-    # download index files using `python-edgar`
-    edgar.download_index(
-        path, args.since_year, args.user_agent, skip_all_present_except_last=True
-    )
+    Args:
+        filepath (str): path to the index file
+        data (bytes): zipped master index, "master.zip"
+    """
+    dirname, basename = os.path.split(filepath)
+    fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f, zipfile.ZipFile(
+            io.BytesIO(data)
+        ) as z, z.open("master.idx") as raw:
+            lines = io.TextIOWrapper(raw, encoding="latin-1", newline=None)
+            # Description of the index, ended by a line of dashes
+            for line in lines:
+                if line.startswith("---"):
+                    break
+            for line in lines:
+                line = line.rstrip("\n")
+                url = line.rsplit("|", 1)[-1]
+                f.write(f"{line}|{url.replace('.txt', '-index.html')}\n")
+        os.replace(tmp, filepath)
+    except BaseException:
+        os.remove(tmp)
+        raise
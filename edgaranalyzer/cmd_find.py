@@ -6,18 +6,67 @@ import types
 import sqlite3
 import random
 import concurrent.futures
-import tqdm
+import functools
+import itertools
+import multiprocessing
+import queue
+import re
+import threading
+import time
 
-from .utils import prefix_logger
+from .metrics import RunMetrics, measure_filings
+from .utils import prefix_logger, walk_dirpath, filing_stat
+
+# Ledger of processed filings, so that later runs only process
+# new or changed filings, or all filings again if the extractor changed
+ledger_sql = types.SimpleNamespace()
+ledger_sql.create_table = """CREATE TABLE IF NOT EXISTS files_processed
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT,
+    extractor TEXT, version INTEGER, size INTEGER, mtime REAL,
+    PRIMARY KEY(cik, file_type, date, accession, extractor, version));"""
+
+ledger_sql.select = """SELECT date, accession, size, mtime FROM files_processed
+    WHERE cik=? AND file_type=? AND extractor=? AND version=?;"""
+
+ledger_sql.insert = """INSERT OR REPLACE INTO files_processed
+    (cik, file_type, date, accession, extractor, version, size, mtime)
+    VALUES (?,?,?,?,?,?,?,?);"""
+
+# Filings processed by an extractor, including its variants, e.g.,
+# "find_loan_contracts/fast-2", all to be processed again
+ledger_sql.reset = """DELETE FROM files_processed
+    WHERE extractor=? OR extractor LIKE ? || '/%';"""
+
+# State of a worker process, set once by `init_worker` when the worker
+# starts, rather than sent with every task
+_worker = types.SimpleNamespace(regsearch=None, file_type=None, init_seconds=None)
 
 
 def cmd_find(
     args: argparse.Namespace,
     logger: prefix_logger,
-    sql: types.SimpleNamespace,
+    sql: types.SimpleNamespace | typing.Mapping[str, types.SimpleNamespace],
     regsearch: typing.Callable,
-    skip_ciks: list = [],
+    versions: typing.Mapping[str, int],
+    warmup: typing.Callable | None = None,
 ):
+    """Run `regsearch` on new or changed filings of every cik
+    and store results in database
+
+    Args:
+        args (argparse.Namespace): command line arguments
+        logger (prefix_logger): logger of the command
+        sql (types.SimpleNamespace | Mapping[str, types.SimpleNamespace]): sql
+            statements to create table and insert results. If a mapping is
+            given, `regsearch` returns a mapping of the same keys to results,
+            so that one search can fill several tables.
+        regsearch (typing.Callable): search function on a filing
+        versions (Mapping[str, int]): version of each extractor run by
+            `regsearch`, recorded in the ledger of processed filings
+        warmup (typing.Callable | None, optional): function called once in
+            each worker when it starts, e.g., to load the text backend.
+            Defaults to None.
+    """
     path = pathlib.Path(args.data_dir).expanduser().resolve().as_posix()
     db = pathlib.Path(args.database).expanduser().resolve().as_posix()
 
@@ -35,8 +84,13 @@ def cmd_find(
     logger.debug("connecting database")
     conn = sqlite3.connect(db)
     c = conn.cursor()
+    c.execute("PRAGMA journal_mode=WAL;")
     logger.debug("create table in database, if not exists")
-    c.execute(sql.create_table)
+    tables = dict(sql) if isinstance(sql, typing.Mapping) else {None: sql}
+    for name, stmt in tables.items():
+        # Of a table keyed by its extractor, only that extractor is reset
+        create_result_table(c, stmt, [name] if name in versions else versions)
+    c.execute(ledger_sql.create_table)
     conn.commit()
 
     _, ciks, _ = next(os.walk(path))
@@ -46,21 +100,427 @@ def cmd_find(
     logger.info(f"total ciks: {len(ciks)}")
     logger.info(f"filing type: {file_type}")
     logger.info(f"workers: {workers}")
+    start_method = args.start_method
+    if start_method not in (None, *multiprocessing.get_all_start_methods()):
+        logger.error(f"start method {start_method} is not available")
+        sys.exit(1)
+    logger.info(f"start method: {start_method or multiprocessing.get_start_method()}")
+    if args.max_tasks_per_child is not None:
+        logger.info(f"tasks per worker: {args.max_tasks_per_child}")
+    if args.rescan:
+        logger.info("rescan all filings, including those processed before")
+
+    metrics = RunMetrics(
+        args.command, args.metrics, args.metrics_interval, args.profile
+    )
+    timers, profile = args.metrics is not None, args.profile is not None
+    if timers:
+        logger.info(f"metrics: {args.metrics}")
+    if profile:
+        logger.info(f"profile: {args.profile}")
+
+    def walk(cik: str) -> list:
+        with metrics.timer("walk"):
+            return new_filings(c, path, cik, file_type, versions, args.rescan)
 
     logger.info("start processing")
-    ciks = [cik for cik in ciks if cik not in skip_ciks]
-    progress = tqdm.tqdm(total=len(ciks))
     random.shuffle(ciks)
-    with concurrent.futures.ProcessPoolExecutor(workers) as exe:
-        futures = [exe.submit(regsearch, path, cik, file_type) for cik in ciks]
-        for f in concurrent.futures.as_completed(futures):
-            res = f.result()
-            if res:
-                c.executemany(sql.insert_result, res)
-                conn.commit()
-            progress.update()
+    # Imported here, not by workers which import this module
+    import tqdm
+
+    # Total grows as filings to process are found
+    progress = tqdm.tqdm(total=0, unit="filing")
+    chunks = chunk_filings(
+        ((cik, filing) for cik in ciks for filing in walk(cik)), args.chunk_size
+    )
+    writer = ResultWriter(db, args.batch_size, args.flush_interval, metrics)
+    writer.start()
+    with WorkerPool(
+        workers,
+        regsearch,
+        file_type,
+        warmup,
+        start_method,
+        args.max_tasks_per_child,
+    ) as exe:
+        futures, n_filings = {}, 0
+        while True:
+            # Keep a bounded number of chunks in flight
+            for chunk in itertools.islice(chunks, 4 * workers - len(futures)):
+                n_filings += len(chunk)
+                progress.total += len(chunk)
+                progress.refresh()
+                tasks = [(cik, filepath) for cik, (filepath, *_) in chunk]
+                futures[exe.submit(search_chunk, tasks, timers, profile)] = chunk
+            if not futures:
+                break
+            metrics.sample_queue("tasks", len(futures))
+            metrics.sample_queue("writer", writer.queue.qsize())
+            with metrics.timer("wait_workers"):
+                done, _ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+            for f in done:
+                chunk = futures.pop(f)
+                results = f.result()
+                if timers or profile:
+                    results, stats = results
+                    bytes_read = sum(size for _, (*_, size, _) in chunk)
+                    metrics.add_worker_stats(stats, bytes_read)
+                # Blocked if the writer lags behind
+                with metrics.timer("db_wait"):
+                    # Results of filings processed before are replaced,
+                    # including results no longer found, e.g., an item
+                    # removed from the header
+                    filings = [
+                        (cik, file_type, date, acc)
+                        for cik, (_, date, acc, *_) in chunk
+                    ]
+                    for stmt in tables.values():
+                        writer.put(stmt.delete_result, filings)
+                    for res in results:
+                        if res and isinstance(sql, typing.Mapping):
+                            for name, rows in res.items():
+                                writer.put(sql[name].insert_result, rows)
+                        elif res:
+                            writer.put(sql.insert_result, res)
+                    writer.put(
+                        ledger_sql.insert,
+                        [
+                            (cik, file_type, date, acc, extractor, version, size, mtime)
+                            for cik, (_, date, acc, size, mtime) in chunk
+                            for extractor, version in versions.items()
+                        ],
+                    )
+                progress.update(len(chunk))
+            metrics.tick()
+    writer.close()
+    metrics.close()
+    if timers:
+        stages = metrics.snapshot()["stages"]
+        logger.info(
+            "seconds per stage: "
+            + ", ".join(f"{name} {seconds:.2f}" for name, seconds in stages.items())
+        )
+    logger.info(f"filings processed: {n_filings}")
     logger.info("finishe processing")
 
     conn.close()
     logger.debug("database closed")
     logger.info("finished")
+
+
+def create_result_table(
+    c: sqlite3.Cursor, stmt: types.SimpleNamespace, extractors: typing.Iterable[str]
+) -> bool:
+    """Create a table of results, if not exists, and rebuild a table created
+    by earlier versions, keyed by (cik, file_type, date) without accession
+
+    Results of filings on the same day were dropped by the old key, and the
+    filings recorded as processed, so all filings of the extractors are
+    processed again. Rows of the old table are kept with an empty accession
+    until their filing is processed again.
+
+    Args:
+        c (sqlite3.Cursor): cursor of the results database
+        stmt (types.SimpleNamespace): sql statements of the table
+        extractors (typing.Iterable[str]): extractors writing to the table
+
+    Returns:
+        bool: True if the table is rebuilt
+    """
+    c.execute(stmt.create_table)
+    table = re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", stmt.create_table)[1]
+    # Rows of (cid, name, type, notnull, default, pk)
+    old = {name: pk for _, name, *_, pk in c.execute(f"PRAGMA table_info({table});")}
+    if old.get("accession"):
+        return False
+    c.execute(f"ALTER TABLE {table} RENAME TO {table}_old;")
+    c.execute(stmt.create_table)
+    new = [name for _, name, *_ in c.execute(f"PRAGMA table_info({table});")]
+    columns = [col for col in new if col in old]
+    values = [f"COALESCE({col}, '')" if col == "accession" else col for col in columns]
+    if "accession" not in old:
+        columns.append("accession")
+        values.append("''")
+    c.execute(
+        f"""INSERT OR IGNORE INTO {table} ({', '.join(columns)})
+        SELECT {', '.join(values)} FROM {table}_old;"""
+    )
+    c.execute(f"DROP TABLE {table}_old;")
+    c.execute(ledger_sql.create_table)
+    c.executemany(ledger_sql.reset, [(e, e) for e in extractors])
+    return True
+
+
+def new_filings(
+    c: sqlite3.Cursor,
+    path: str,
+    cik: str,
+    file_type: str,
+    versions: typing.Mapping[str, int],
+    rescan: bool = False,
+) -> list:
+    """Find filings of a cik not yet processed by all extractors,
+    or changed since processed
+
+    Args:
+        c (sqlite3.Cursor): database cursor
+        path (str): data directory
+        cik (str): cik of company
+        file_type (str): file type, e.g., "8-K", "10-K"
+        versions (Mapping[str, int]): version of each extractor
+        rescan (bool, optional): if True, return all filings. Defaults to False.
+
+    Returns:
+        list: list of (filepath, date, accession, size, mtime)
+            of filings to process
+    """
+    processed = []
+    for extractor, version in versions.items() if not rescan else []:
+        c.execute(ledger_sql.select, (cik, file_type, extractor, version))
+        processed.append({(d, acc): (size, mtime) for d, acc, size, mtime in c})
+
+    filings = []
+    for filepath, date, acc in walk_dirpath(path, cik, file_type):
+        size, mtime = filing_stat(filepath)
+        if rescan or not all(p.get((date, acc)) == (size, mtime) for p in processed):
+            filings.append((filepath, date, acc, size, mtime))
+    return filings
+
+
+def chunk_filings(filings: typing.Iterable, chunk_size: int) -> typing.Iterator:
+    """Group filings into chunks of equal size, so that filings of
+    large ciks are split and filings of small ciks are batched together
+
+    Args:
+        filings (typing.Iterable): (cik, filing) of filings to process
+        chunk_size (int): filings per chunk
+
+    Yields:
+        list: chunk of (cik, filing)
+    """
+    filings = iter(filings)
+    while chunk := list(itertools.islice(filings, chunk_size)):
+        yield chunk
+
+
+class WorkerPool:
+    """Pool of worker processes, each given the search function once when it
+    starts, so that tasks carry only the filings to search
+
+    With `max_tasks_per_child`, the pool is replaced by a new one once it
+    has been given `workers * max_tasks_per_child` tasks, i.e., that many
+    tasks per worker on average, as tasks go to whichever worker is idle,
+    so that memory leaked by parsing is given back. The old pool finishes
+    its tasks before the new pool starts, so that no more than `workers`
+    processes run at once. Unlike `max_tasks_per_child` of
+    `ProcessPoolExecutor`, it works with any start method, and does not hang
+    when tasks in flight outnumber the tasks per worker (Python 3.11).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        regsearch: typing.Callable,
+        file_type: str,
+        warmup: typing.Callable | None = None,
+        start_method: str | None = None,
+        max_tasks_per_child: int | None = None,
+    ) -> None:
+        """Start a pool of worker processes
+
+        Args:
+            workers (int): number of worker processes
+            regsearch (typing.Callable): search function on a filing
+            file_type (str): file type, e.g., "8-K", "10-K"
+            warmup (typing.Callable | None, optional): function called once in
+                each worker when it starts. Defaults to None.
+            start_method (str | None, optional): start method of workers, one
+                of "fork", "forkserver" or "spawn". Defaults to None, the
+                default of the platform.
+            max_tasks_per_child (int | None, optional): tasks per worker, on
+                average, before the pool is replaced by a new one. Defaults
+                to None, never replaced.
+        """
+        self.workers = workers
+        self.initargs = (regsearch, file_type, warmup)
+        self.context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            # Workers forked from a server which has imported the module of
+            # the search function, rather than importing it each
+            func = regsearch
+            while isinstance(func, functools.partial):
+                func = func.func
+            self.context.set_forkserver_preload([__name__, func.__module__])
+        self.max_tasks = None
+        if max_tasks_per_child is not None:
+            self.max_tasks = workers * max_tasks_per_child
+        self.submitted = 0
+        self.exe = self.new_executor()
+
+    def new_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(
+            self.workers,
+            mp_context=self.context,
+            initializer=init_worker,
+            initargs=self.initargs,
+        )
+
+    def submit(self, fn: typing.Callable, *args) -> concurrent.futures.Future:
+        """Submit a task to the current pool, replacing it first if its
+        workers have run their tasks"""
+        if self.max_tasks is not None and self.submitted >= self.max_tasks:
+            # Tasks in flight are done, and their workers exit, first
+            self.exe.shutdown(wait=True)
+            self.exe, self.submitted = self.new_executor(), 0
+        self.submitted += 1
+        return self.exe.submit(fn, *args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.exe.shutdown(wait=True)
+
+
+def init_worker(
+    regsearch: typing.Callable,
+    file_type: str,
+    warmup: typing.Callable | None = None,
+):
+    """Set the state of a worker process when it starts
+
+    Args:
+        regsearch (typing.Callable): search function on a filing
+        file_type (str): file type, e.g., "8-K", "10-K"
+        warmup (typing.Callable | None, optional): function to call once.
+            Defaults to None.
+    """
+    start = time.perf_counter()
+    _worker.regsearch = regsearch
+    _worker.file_type = file_type
+    if warmup is not None:
+        warmup()
+    _worker.init_seconds = time.perf_counter() - start
+
+
+def search_chunk(filings: list, timers: bool = False, profile: bool = False):
+    """Run the search function of the worker on the given filings, in a
+    worker process started by `worker_pool`
+
+    Args:
+        filings (list): (cik, filepath) of filings
+        timers (bool, optional): if True, time the stages of each filing.
+            Defaults to False.
+        profile (bool, optional): if True, profile the search with cProfile.
+            Defaults to False.
+
+    Returns:
+        list | tuple: results of `regsearch` of each filing, or if timed or
+            profiled, the results and stats, see `metrics.measure_filings`
+    """
+    regsearch, file_type = _worker.regsearch, _worker.file_type
+    if not (timers or profile):
+        return search_filings(regsearch, file_type, filings)
+    results, stats = measure_filings(regsearch, file_type, filings, timers, profile)
+    # Reported by the first task of the worker only
+    stats["init_seconds"], _worker.init_seconds = _worker.init_seconds, None
+    return results, stats
+
+
+def search_filings(regsearch: typing.Callable, file_type: str, filings: list) -> list:
+    """Run `regsearch` on the given filings, in a worker process
+
+    Args:
+        regsearch (typing.Callable): search function on a filing
+        file_type (str): file type, e.g., "8-K", "10-K"
+        filings (list): (cik, filepath) of filings
+
+    Returns:
+        list: results of `regsearch` of each filing
+    """
+    return [regsearch(filepath, cik, file_type) for cik, filepath in filings]
+
+
+class ResultWriter(threading.Thread):
+    """Write results to database in a dedicated thread, committing
+    in batches rather than once per result"""
+
+    def __init__(
+        self,
+        db: str,
+        batch_size: int,
+        flush_interval: float,
+        metrics: RunMetrics | None = None,
+    ) -> None:
+        """Create a writer, which starts writing with `start()`
+
+        Args:
+            db (str): path to the database
+            batch_size (int): rows to write before commit
+            flush_interval (float): maximum seconds between commits
+            metrics (RunMetrics | None, optional): metrics of the run, where
+                time writing is charged to "db_write". Defaults to None.
+        """
+        super().__init__(daemon=True)
+        self.db = db
+        self.metrics = metrics or RunMetrics("")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Bounded, so that the writer holds back the producer if it lags
+        self.queue = queue.Queue(maxsize=1000)
+        self.error = None
+
+    def put(self, stmt: str, rows: list):
+        """Queue rows to write
+
+        Args:
+            stmt (str): sql statement to insert a row
+            rows (list): rows to insert
+        """
+        if self.error is not None:
+            raise self.error
+        self.queue.put((stmt, rows))
+
+    def close(self):
+        """Write all queued rows and stop the writer"""
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        conn = sqlite3.connect(self.db)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        pending, last_commit = 0, time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    stmt, rows = item
+                    with self.metrics.timer("db_write"):
+                        conn.executemany(stmt, rows)
+                    pending += len(rows)
+                now = time.monotonic()
+                if pending >= self.batch_size or (
+                    pending and now - last_commit >= self.flush_interval
+                ):
+                    with self.metrics.timer("db_write"):
+                        conn.commit()
+                    pending, last_commit = 0, now
+            with self.metrics.timer("db_write"):
+                conn.commit()
+        except Exception as e:
+            self.error = e
+            # Keep draining, so that the producer is not blocked
+            while self.queue.get() is not None:
+                pass
+        finally:
+            conn.close()
@@ -1,61 +1,74 @@
 import argparse
+import functools
 import logging
-import os
-import gzip
 import types
 from datetime import datetime
 
 from edgaranalyzer import CMD
 from .cmd_find import cmd_find
-from .utils import prefix_logger, walk_dirpath
+from .utils import (
+    prefix_logger,
+    read_header,
+    parse_filing_name,
+    SECHeader,
+    HEADER_MAX_BYTES,
+)
 
 
 logger = prefix_logger(CMD.FIND_EVENT_DATE, logging.getLogger(__name__))
 
 sql = types.SimpleNamespace()
 sql.create_table = """CREATE TABLE IF NOT EXISTS files_event_date
-    (cik TEXT, file_type TEXT, date DATE, event_date DATE,
-    PRIMARY KEY(cik, file_type, date));"""
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT, event_date DATE,
+    PRIMARY KEY(cik, file_type, date, accession));"""
 
-sql.insert_result = """INSERT OR IGNORE INTO files_event_date
-    (cik, file_type, date, event_date) VALUES (?,?,?,?);"""
+sql.insert_result = """INSERT OR REPLACE INTO files_event_date
+    (cik, file_type, date, accession, event_date) VALUES (?,?,?,?,?);"""
+
+sql.delete_result = """DELETE FROM files_event_date
+    WHERE cik=? AND file_type=? AND date=? AND accession IN (?, '');"""
+
+# Bump when `extract` changes, so that filings are processed again
+version = 1
 
 
 def cmd(args: argparse.Namespace):
-    cmd_find(args, logger, sql, regsearch)
+    search = functools.partial(regsearch, max_bytes=args.header_bytes)
+    cmd_find(args, logger, sql, search, {CMD.FIND_EVENT_DATE: version})
 
 
-def regsearch(path: str, cik: str, file_type: str) -> list:
+def regsearch(
+    filepath: str, cik: str, file_type: str, max_bytes: int = HEADER_MAX_BYTES
+) -> list:
     """Search function on a filing
 
     Args:
-        path (str): data directory
+        filepath (str): path to the filing
         cik (str): cik of company
         file_type (str): file type, e.g., "8-K", "10-K"
+        max_bytes (int, optional): maximum bytes to read for the header.
+            Defaults to HEADER_MAX_BYTES.
 
     Returns:
         list: list of results
     """
-    matches = []
-    for filepath in walk_dirpath(path, cik, file_type):
-        date = os.path.split(filepath)[-1].strip(".txt.gz")
-        with gzip.open(filepath, "rt") as f:
-            while (
-                not (line := f.readline())
-                .strip()
-                .startswith("CONFORMED PERIOD OF REPORT")
-            ):
-                if not line:
-                    break
-
-            event_date = line.split(":")[-1].strip()
-
-            event_date = event_date.strip() if isinstance(event_date, str) else ""
-            if len(event_date):
-                event_date = datetime.strptime(event_date, "%Y%m%d").strftime(
-                    "%Y-%m-%d"
-                )
-
-            matches.append((cik, file_type, date, event_date))
-
-    return matches
+    date, accession = parse_filing_name(filepath)
+    header = read_header(filepath, max_bytes)
+    return [(cik, file_type, date, accession, *res) for res in extract(header)]
+
+
+def extract(header: SECHeader) -> list:
+    """Extract event date from the header of a filing
+
+    Args:
+        header (SECHeader): parsed SEC header
+
+    Returns:
+        list: list of one result, a tuple of (event_date,)
+    """
+    event_date = next(iter(header.get("CONFORMED PERIOD OF REPORT", [])), "")
+
+    if len(event_date):
+        event_date = datetime.strptime(event_date, "%Y%m%d").strftime("%Y-%m-%d")
+
+    return [(event_date,)]
@@ -0,0 +1,101 @@
+import argparse
+import functools
+import logging
+import types
+
+from edgaranalyzer import CMD
+from . import cmd_find_items, cmd_find_event_date, cmd_find_zipcode
+from .cmd_find import cmd_find
+from .cmd_build_header_store import search_store
+from .utils import (
+    prefix_logger,
+    read_header,
+    parse_filing_name,
+    SECHeader,
+    HEADER_MAX_BYTES,
+)
+
+
+logger = prefix_logger(CMD.FIND_HEADER, logging.getLogger(__name__))
+
+# Registry of header extractors. Each extractor module provides
+# `sql` to create and fill its own table, `extract(header)`
+# which returns results from the parsed header of one filing,
+# and the `version` of `extract`.
+EXTRACTORS: dict[str, types.ModuleType] = {
+    CMD.FIND_ITEMS: cmd_find_items,
+    CMD.FIND_EVENT_DATE: cmd_find_event_date,
+    CMD.FIND_ZIPCODE: cmd_find_zipcode,
+}
+
+
+def cmd(args: argparse.Namespace):
+    extractors = tuple(args.extractors or EXTRACTORS)
+    logger.info(f"extractors: {', '.join(extractors)}")
+    sql = {name: EXTRACTORS[name].sql for name in extractors}
+    versions = {name: EXTRACTORS[name].version for name in extractors}
+    if args.header_store is not None:
+        # Headers stored by `build_header_store`, without reading filings
+        search = functools.partial(extract, extractors=extractors)
+        search_store(args, logger, sql, search, versions)
+        return
+    search = functools.partial(
+        regsearch, extractors=extractors, max_bytes=args.header_bytes
+    )
+    cmd_find(args, logger, sql, search, versions)
+
+
+def regsearch(
+    filepath: str,
+    cik: str,
+    file_type: str,
+    extractors: tuple = tuple(EXTRACTORS),
+    max_bytes: int = HEADER_MAX_BYTES,
+) -> dict:
+    """Search function on a filing, running all extractors
+    on its header, which is decompressed only once
+
+    Args:
+        filepath (str): path to the filing
+        cik (str): cik of company
+        file_type (str): file type, e.g., "8-K", "10-K"
+        extractors (tuple, optional): names of extractors to run.
+            Defaults to all registered extractors.
+        max_bytes (int, optional): maximum bytes to read for the header.
+            Defaults to HEADER_MAX_BYTES.
+
+    Returns:
+        dict: list of results of each extractor
+    """
+    date, acc = parse_filing_name(filepath)
+    header = read_header(filepath, max_bytes)
+    return extract(header, cik, file_type, date, acc, extractors)
+
+
+def extract(
+    header: SECHeader,
+    cik: str,
+    file_type: str,
+    date: str,
+    acc: str,
+    extractors: tuple = tuple(EXTRACTORS),
+) -> dict:
+    """Run extractors on the parsed header of a filing
+
+    Args:
+        header (SECHeader): parsed SEC header
+        cik (str): cik of company
+        file_type (str): file type, e.g., "8-K", "10-K"
+        date (str): filing date
+        acc (str): accession number
+        extractors (tuple, optional): names of extractors to run.
+            Defaults to all registered extractors.
+
+    Returns:
+        dict: list of results of each extractor
+    """
+    matches = {}
+    for name in extractors:
+        results = EXTRACTORS[name].extract(header)
+        matches[name] = [(cik, file_type, date, acc, *res) for res in results]
+    return matches
@@ -1,50 +1,69 @@
 import argparse
+import functools
 import logging
-import os
-import gzip
 import types
 
 from edgaranalyzer import CMD
 from .cmd_find import cmd_find
-from .utils import prefix_logger, walk_dirpath
+from .utils import (
+    prefix_logger,
+    read_header,
+    parse_filing_name,
+    SECHeader,
+    HEADER_MAX_BYTES,
+)
 
 
 logger = prefix_logger(CMD.FIND_ITEMS, logging.getLogger(__name__))
 
 sql = types.SimpleNamespace()
 sql.create_table = """CREATE TABLE IF NOT EXISTS files_all_items
-    (cik TEXT, file_type TEXT, date DATE, item TEXT,
-    PRIMARY KEY(cik, file_type, date, item));"""
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT, item TEXT,
+    PRIMARY KEY(cik, file_type, date, accession, item));"""
 
-sql.insert_result = """INSERT OR IGNORE INTO files_all_items 
-    (cik, file_type, date, item) VALUES (?,?,?,?);"""
+sql.insert_result = """INSERT OR REPLACE INTO files_all_items
+    (cik, file_type, date, accession, item) VALUES (?,?,?,?,?);"""
+
+sql.delete_result = """DELETE FROM files_all_items
+    WHERE cik=? AND file_type=? AND date=? AND accession IN (?, '');"""
+
+# Bump when `extract` changes, so that filings are processed again
+version = 1
 
 
 def cmd(args: argparse.Namespace):
-    cmd_find(args, logger, sql, regsearch)
+    search = functools.partial(regsearch, max_bytes=args.header_bytes)
+    cmd_find(args, logger, sql, search, {CMD.FIND_ITEMS: version})
 
 
-def regsearch(path: str, cik: str, file_type: str) -> list:
+def regsearch(
+    filepath: str, cik: str, file_type: str, max_bytes: int = HEADER_MAX_BYTES
+) -> list:
     """Search function on a filing
 
     Args:
-        path (str): data directory
+        filepath (str): path to the filing
         cik (str): cik of company
         file_type (str): file type, e.g., "8-K", "10-K"
+        max_bytes (int, optional): maximum bytes to read for the header.
+            Defaults to HEADER_MAX_BYTES.
 
     Returns:
         list: list of results
     """
-    matches = []
-    for filepath in walk_dirpath(path, cik, file_type):
-        date = os.path.split(filepath)[-1].strip(".txt.gz")
-        with gzip.open(filepath, "rb") as f:
-            while not (line := f.readline()).startswith(b"ITEM INFORMATION"):
-                if not line:
-                    break
-            while line.startswith(b"ITEM INFORMATION"):
-                item = line.decode().split(":")[-1].strip()
-                if len(item):
-                    matches.append((cik, file_type, date, item.upper()))
-                line = f.readline()
-    return matches
+    date, accession = parse_filing_name(filepath)
+    header = read_header(filepath, max_bytes)
+    return [(cik, file_type, date, accession, *res) for res in extract(header)]
+
+
+def extract(header: SECHeader) -> list:
+    """Extract reported items from the header of a filing
+
+    Args:
+        header (SECHeader): parsed SEC header
+
+    Returns:
+        list: list of results, each is a tuple of (item,)
+    """
+    items = [item.strip().upper() for item in header.get("ITEM INFORMATION", [])]
+    return [(item,) for item in items if len(item)]
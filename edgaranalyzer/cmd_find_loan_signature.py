@@ -0,0 +1,219 @@
+import argparse
+import functools
+import logging
+import re
+import types
+from typing import Iterable
+
+from edgaranalyzer import CMD
+from . import metrics
+from .cmd_find import cmd_find
+from .cmd_find_loans import iter_text_documents, document_text, text_cache, doc_types
+from .text import backend_id, html_to_text
+from .textcache import TextCache
+from .utils import (
+    prefix_logger,
+    parse_filing_name,
+    select_documents,
+    DOC_CHUNK_BYTES,
+)
+
+logger = prefix_logger(CMD.FIND_LOAN_SIGNATURE, logging.getLogger(__name__))
+
+sql = types.SimpleNamespace()
+sql.create_table = """CREATE TABLE IF NOT EXISTS files_with_loan_signature
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT, has_signature TEXT,
+    ith_doc INTEGER, doc_offset INTEGER, lender TEXT,
+    PRIMARY KEY(cik, file_type, date, accession));"""
+
+sql.insert_result = """INSERT OR REPLACE INTO files_with_loan_signature
+    (cik, file_type, date, accession, has_signature, ith_doc, doc_offset, lender)
+    VALUES (?,?,?,?,?,?,?,?);"""
+
+sql.delete_result = """DELETE FROM files_with_loan_signature
+    WHERE cik=? AND file_type=? AND date=? AND accession IN (?, '');"""
+
+# Bump when `regsearch` changes, so that filings are processed again
+version = 3
+
+# A signature block of a lender in the text of a credit agreement, e.g.,
+#   JPMORGAN CHASE BANK, N.A.,
+#   as Administrative Agent and a Lender
+#   By: /s/ John Smith
+#   Name: John Smith
+#   Title: Vice President
+# No \b in the pattern, which slows down the search, checked in `signature_at`
+_BY = re.compile(r"(?:By|BY|by):")
+_NAME = re.compile(r"\bname:", re.I)
+_TITLE = re.compile(r"\btitle:", re.I)
+_FIELD = re.compile(r"\b(?:by|name|title|its):", re.I)
+# The name of the party signing, in the lines right above "By:", is a bank,
+# or designated as an agent or lender, e.g., "as Administrative Agent"
+_BANK = re.compile(
+    r"\b(?:bank|banc|bancorp|banque|n\.\s?a\.|national association"
+    r"|trust company|savings|credit union)\b",
+    re.I,
+)
+_DESIGNATION = re.compile(
+    r"\bas\b.*\b(?:agent|lenders?|arrangers?|issuing bank|l/c issuer)\b", re.I
+)
+# Signature blocks of other parties, even if named with "Bank"
+_NOT_LENDER = re.compile(
+    r"\bas\s+(?:the\s+|a\s+)?(?:parent\s+)?(?:borrowers?|guarantors?|holdings"
+    r"|grantors?|pledgors?|issuer)\b",
+    re.I,
+)
+# Lines searched above "By:" for the name, and below for "Name:", "Title:"
+LINES_ABOVE, LINES_BELOW = 4, 6
+# Words of a line of text rather than of a name, e.g., "IN WITNESS WHEREOF..."
+NAME_MAX_WORDS = 16
+# Abbreviations ending a name, not a sentence, e.g., "ACME Co."
+_ABBREVIATION = re.compile(r"\b(?:inc|corp|co|ltd|llc|l\.p|plc|s\.a|n\.a)\.$", re.I)
+# Characters of text searched above and below "By:"
+LOOKBEHIND, LOOKAHEAD = 1024, 1024
+
+
+def cmd(args: argparse.Namespace):
+    logger.info(f"text backend: {args.text_backend}")
+    # Filings are processed again if the text backend changes
+    extractor = f"{CMD.FIND_LOAN_SIGNATURE}/{backend_id(args.text_backend)}"
+    searched_types = tuple(args.doc_types or doc_types)
+    logger.info(f"document types: main document, {', '.join(searched_types)}")
+    if searched_types != doc_types:
+        extractor += f"/{','.join(searched_types)}"
+    search = functools.partial(
+        regsearch,
+        backend=args.text_backend,
+        doc_types=searched_types,
+        chunk_bytes=args.read_bytes,
+    )
+    warmup = functools.partial(html_to_text, "<p></p>", args.text_backend)
+    with text_cache(args) as cache:
+        search = functools.partial(search, cache=cache)
+        cmd_find(args, logger, sql, search, {extractor: version}, warmup=warmup)
+
+
+def regsearch(
+    filepath: str,
+    cik: str,
+    file_type: str,
+    backend: str = "fast",
+    doc_types: tuple = doc_types,
+    chunk_bytes: int = DOC_CHUNK_BYTES,
+    cache: TextCache | None = None,
+) -> list:
+    """Search function on a filing, for the first signature block of a lender
+
+    Args:
+        filepath (str): path to the filing
+        cik (str): cik of company
+        file_type (str): file type, e.g., "8-K", "10-K"
+        backend (str, optional): backend to convert HTML to text.
+            Defaults to "fast".
+        doc_types (tuple, optional): patterns of types of documents searched
+            besides the main document. Defaults to doc_types.
+        chunk_bytes (int, optional): bytes of a document read at a time.
+            Defaults to DOC_CHUNK_BYTES.
+        cache (TextCache | None, optional): cache of text of documents.
+            Defaults to None, no cache.
+
+    Returns:
+        list: list of results
+    """
+    date, accession = parse_filing_name(filepath)
+    select = select_documents((file_type, *doc_types))
+    documents = iter_text_documents(filepath, select, chunk_bytes=chunk_bytes)
+    for ith_doc, _, _, chunks in documents:
+        text = document_text(chunks, backend, cache, cik, file_type, filepath, ith_doc)
+        with metrics.stage("regex"):
+            found = find_signature(text)
+        if found is not None:
+            offset, lender = found
+            return [(cik, file_type, date, accession, "TRUE", ith_doc, offset, lender)]
+    return [(cik, file_type, date, accession, "FALSE", None, None, None)]
+
+
+def find_signature(text: Iterable[str]) -> tuple[int, str] | None:
+    """Find the first signature block of a lender in text given in chunks,
+    holding only a chunk and the text around its ends in memory
+
+    Args:
+        text (Iterable[str]): chunks of plain text
+
+    Returns:
+        tuple[int, str] | None: (offset of "By:", lender), or None if not found
+    """
+    chunks = iter(text)
+    carry, base, start = "", 0, 0
+    while True:
+        chunk = next(chunks, None)
+        window = carry + (chunk or "")
+        # "By:" near the end of window is searched again with the next chunk
+        end = len(window) if chunk is None else max(len(window) - LOOKAHEAD, 0)
+        for m in _BY.finditer(window, start):
+            if m.start() >= end:
+                break
+            if (lender := signature_at(window, m.start())) is not None:
+                return base + m.start(), lender
+        if chunk is None:
+            return None
+        cut = max(end - LOOKBEHIND, 0)
+        carry, base, start = window[cut:], base + cut, end - cut
+
+
+def signature_at(text: str, pos: int) -> str | None:
+    """Lender of the signature block with "By:" at `pos` of text
+
+    Args:
+        text (str): plain text
+        pos (int): offset of "By:" in text
+
+    Returns:
+        str | None: lines naming the lender right above "By:", or None if
+            it is not a signature block of a lender
+    """
+    if pos > 0 and text[pos - 1].isalnum():
+        return None  # e.g., "Nearby:"
+    below = text[pos : pos + LOOKAHEAD].split("\n", LINES_BELOW + 1)
+    below = "\n".join(below[: LINES_BELOW + 1])
+    name = _NAME.search(below)
+    if name is None or _TITLE.search(below, name.end()) is None:
+        return None
+    above = text[max(pos - LOOKBEHIND, 0) : pos].split("\n")[-LINES_ABOVE - 1 :]
+    lender = " ".join(" ".join(name_lines(above)).split())
+    if not lender or _NOT_LENDER.search(lender):
+        return None
+    if _BANK.search(lender) or _DESIGNATION.search(lender):
+        return lender
+    return None
+
+
+def name_lines(above: list) -> list:
+    """Lines naming the party of a signature block, i.e., the lines right
+    above "By:", up to a blank line, another signature block or a sentence
+
+    Args:
+        above (list): lines above "By:", the last one ending at "By:"
+
+    Returns:
+        list: lines of the name and designation, e.g., ["JPMORGAN CHASE BANK,
+            N.A.,", "as Administrative Agent"]
+    """
+    *above, current = [line.strip() for line in above]
+    # Text before "By:" on its line, if any, is the closest line of the name
+    lines = [current] if current else []
+    for line in reversed(above):
+        if not line:
+            break
+        lines.append(line)
+    names = []
+    for line in lines:
+        if _FIELD.search(line) or line.endswith(":"):
+            break  # e.g., "Title: Vice President", or a heading "LENDERS:"
+        if len(line.split()) > NAME_MAX_WORDS:
+            break
+        sentence = line[-1] in ".;" and line[-2:-1].islower()
+        if sentence and not _ABBREVIATION.search(line):
+            break  # e.g., "... as of the date first above written."
+        names.append(line)
+    return names[::-1]
@@ -1,45 +1,123 @@
 import argparse
+import contextlib
+import functools
 import logging
 import os
-import re
 import pathlib
 import sqlite3
 import types
-import tqdm
-import requests_html
-import sys
+from typing import Callable, Iterator
 
 from edgaranalyzer import CMD
-from .cmd_find import cmd_find
-from .utils import prefix_logger, walk_dirpath, extract_files
-
-# Increase recursion limit for parsing large HTML
-sys.setrecursionlimit(1_000_000_000)
+from . import metrics
+from .cmd_find import cmd_find, create_result_table
+from .utils import (
+    prefix_logger,
+    walk_dirpath,
+    iter_document_chunks,
+    parse_filing_name,
+    select_documents,
+    DOC_CHUNK_BYTES,
+)
+from .text import html_to_text, iter_text, backend_id
+from .textcache import TextCache
+from .keywords import KeywordMatcher, load_dictionary, dictionary_id
 
 logger = prefix_logger(CMD.FIND_LOANS, logging.getLogger(__name__))
 
 sql = types.SimpleNamespace()
 sql.create_table = """CREATE TABLE IF NOT EXISTS files_with_loan_contracts
-    (cik TEXT, file_type TEXT, date DATE, has_loan INTEGER,
-    PRIMARY KEY(cik, file_type, date));"""
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT, has_loan INTEGER,
+    PRIMARY KEY(cik, file_type, date, accession));"""
 
 sql.init = """INSERT OR IGNORE INTO files_with_loan_contracts
-    (cik, file_type, date, has_loan) VALUES (?,?,?,?);"""
+    (cik, file_type, date, accession, has_loan) VALUES (?,?,?,?,?);"""
 
 sql.insert_result = """INSERT OR REPLACE INTO files_with_loan_contracts
-    (cik, file_type, date, has_loan) VALUES (?,?,?,?);"""
+    (cik, file_type, date, accession, has_loan) VALUES (?,?,?,?,?);"""
+
+sql.delete_result = """DELETE FROM files_with_loan_contracts
+    WHERE cik=? AND file_type=? AND date=? AND accession IN (?, '');"""
+
+# Hits of each keyword in a filing, if `--term_counts` is set.
+# `first_doc` and `first_offset` locate the first hit in the text of documents.
+term_sql = types.SimpleNamespace()
+term_sql.create_table = """CREATE TABLE IF NOT EXISTS loan_term_counts
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT, term TEXT,
+    hits INTEGER, first_doc INTEGER, first_offset INTEGER,
+    PRIMARY KEY(cik, file_type, date, accession, term));"""
+
+term_sql.insert_result = """INSERT OR REPLACE INTO loan_term_counts
+    (cik, file_type, date, accession, term, hits, first_doc, first_offset)
+    VALUES (?,?,?,?,?,?,?,?);"""
+
+term_sql.delete_result = sql.delete_result.replace(
+    "files_with_loan_contracts", "loan_term_counts"
+)
+
+# Bump when `regsearch` changes, so that filings are processed again
+version = 3
 
-temp_dir = os.path.join(os.path.dirname(__file__), "__temp")
+# Types of documents searched, besides the main document of filings, as
+# loan contracts are filed as material contracts, i.e., exhibits EX-10.x
+doc_types = ("EX-10*",)
 
 
 def cmd(args: argparse.Namespace):
     if not args.skip_init_table:
         create_table_in_db(args)
-    os.makedirs(temp_dir, exist_ok=True)
-    skip_ciks = checked_ciks(args)
-    cmd_find(args, logger, sql, regsearch, skip_ciks)
-    if os.path.exists(temp_dir):
-        os.removedirs(temp_dir)
+    logger.info(f"text backend: {args.text_backend}")
+    # Filings are processed again if the text backend or keywords change
+    extractor = f"{CMD.FIND_LOANS}/{backend_id(args.text_backend)}"
+    keywords = tuple(NSS_10_words)
+    if args.dictionary:
+        keywords = tuple(load_dictionary(args.dictionary))
+        logger.info(f"dictionary: {args.dictionary}, {len(keywords)} keywords")
+        extractor += f"/{dictionary_id(keywords)}"
+    searched_types = tuple(args.doc_types or doc_types)
+    logger.info(f"document types: main document, {', '.join(searched_types)}")
+    if searched_types != doc_types:
+        extractor += f"/{','.join(searched_types)}"
+    search = functools.partial(
+        regsearch,
+        backend=args.text_backend,
+        keywords=keywords,
+        term_counts=args.term_counts,
+        doc_types=searched_types,
+        ex10_first=args.ex10_first,
+        chunk_bytes=args.read_bytes,
+    )
+    # Loaded once per worker, rather than by its first filing
+    warmup = functools.partial(warm_up, args.text_backend, keywords)
+    with text_cache(args) as cache:
+        search = functools.partial(search, cache=cache)
+        if args.term_counts:
+            sqls = {CMD.FIND_LOANS: sql, "term_counts": term_sql}
+            versions = {f"{extractor}/terms": version}
+            cmd_find(args, logger, sqls, search, versions, warmup=warmup)
+        else:
+            cmd_find(args, logger, sql, search, {extractor: version}, warmup=warmup)
+
+
+@contextlib.contextmanager
+def text_cache(args: argparse.Namespace) -> Iterator[TextCache | None]:
+    """Text cache given by `--text_cache`, evicting documents while in
+    the context
+
+    Args:
+        args (argparse.Namespace): command line arguments
+
+    Yields:
+        TextCache | None: the cache, or None if not given
+    """
+    if args.text_cache is None:
+        yield None
+        return
+    cache_dir = pathlib.Path(args.text_cache).expanduser().resolve().as_posix()
+    logger.info(f"text cache: {cache_dir}, up to {args.text_cache_gb} GB")
+    cache = TextCache(cache_dir, int(args.text_cache_gb * 2**30))
+    with cache.evicting():
+        yield cache
 
 
 def create_table_in_db(args: argparse.Namespace):
@@ -48,15 +126,16 @@ def create_table_in_db(args: argparse.Namespace):
     conn = sqlite3.connect(db)
     c = conn.cursor()
     logger.debug("create table in database, if not exists")
-    c.execute(sql.create_table)
+    create_result_table(c, sql, [CMD.FIND_LOANS])
     _, ciks, _ = next(os.walk(path))
     logger.debug("init table in database")
+    import tqdm
+
     progress = tqdm.tqdm(total=len(ciks))
     for cik in ciks:
         values = []
-        for filepath in walk_dirpath(path, cik, args.file_type):
-            date = os.path.split(filepath)[-1].strip(".txt.gz")
-            values.append((cik, args.file_type, date, None))
+        for _, date, accession in walk_dirpath(path, cik, args.file_type):
+            values.append((cik, args.file_type, date, accession, None))
         c.executemany(sql.init, values)
         conn.commit()
         progress.update()
@@ -64,47 +143,164 @@ def create_table_in_db(args: argparse.Namespace):
     logger.debug("init table done")
 
 
-def checked_ciks(args: argparse.Namespace):
-    db = pathlib.Path(args.database).expanduser().resolve().as_posix()
-    conn = sqlite3.connect(db)
-    c = conn.cursor()
-    c.execute(
-        f"""SELECT DISTINCT cik FROM files_with_loan_contracts 
-    WHERE has_loan IS NOT NULL AND file_type="{args.file_type}";"""
-    )
-    skip_ciks = [cik for (cik,) in c.fetchall()]
-    conn.close()
-    return skip_ciks
-
+def regsearch(
+    filepath: str,
+    cik: str,
+    file_type: str,
+    backend: str = "fast",
+    keywords: tuple = (),
+    term_counts: bool = False,
+    doc_types: tuple = doc_types,
+    ex10_first: bool = False,
+    chunk_bytes: int = DOC_CHUNK_BYTES,
+    cache: TextCache | None = None,
+) -> list | dict:
+    """Search function on a filing
 
-def regsearch(path: str, cik: str, file_type: str) -> list:
-    """Search function on filings of a cik
+    Documents are read and searched in chunks, so that memory is bounded
+    regardless of the size of documents, and reading stops at the first hit
+    unless `term_counts` is True.
 
     Args:
-        path (str): data directory
+        filepath (str): path to the filing
         cik (str): cik of company
         file_type (str): file type, e.g., "8-K", "10-K"
+        backend (str, optional): backend to convert HTML to text.
+            Defaults to "fast".
+        keywords (tuple, optional): keywords of loan contracts.
+            Defaults to NSS_10_words.
+        term_counts (bool, optional): if True, count hits of every keyword
+            in all documents, rather than stop at the first hit.
+            Defaults to False.
+        doc_types (tuple, optional): patterns of types of documents searched
+            besides the main document, other documents are skipped without
+            decoding. Defaults to doc_types.
+        ex10_first (bool, optional): if True, search EX-10 exhibits, i.e.,
+            material contracts, before other documents. Defaults to False.
+        chunk_bytes (int, optional): bytes of a document read at a time.
+            Defaults to DOC_CHUNK_BYTES.
+        cache (TextCache | None, optional): cache of text of documents.
+            Defaults to None, no cache.
 
     Returns:
-        list: list of results
+        list | dict: list of results, or if `term_counts` is True, results
+            and hits of keywords keyed by table
     """
-    matches = []
-    for filepath in walk_dirpath(path, cik, file_type):
-        date = os.path.split(filepath)[-1].strip(".txt.gz")
-        files = extract_files(filepath, temp_dir)
-        has_loan_in_one_or_more_docs = False
-        for file in files:
-            if has_loan(file):
+    date, accession = parse_filing_name(filepath)
+    matcher = keyword_matcher(keywords or tuple(NSS_10_words))
+    has_loan_in_one_or_more_docs, counts = False, {}
+    # The main document has the type of the filing, e.g., "8-K"
+    select = select_documents((file_type, *doc_types))
+    for ith_doc, _, _, chunks in iter_text_documents(
+        filepath, select, ex10_first and not term_counts, chunk_bytes
+    ):
+        text = document_text(chunks, backend, cache, cik, file_type, filepath, ith_doc)
+        if term_counts:
+            # (hits, first_doc, first_offset) of each keyword
+            with metrics.stage("regex"):
+                doc_counts = matcher.count(text)
+            for term, (hits, offset) in doc_counts.items():
+                total, *first = counts.get(term, (0, ith_doc, offset))
+                counts[term] = (total + hits, *first)
+            has_loan_in_one_or_more_docs = bool(counts)
+        else:
+            with metrics.stage("regex"):
+                hit = matcher.search(text)
+            if hit is not None:
                 has_loan_in_one_or_more_docs = True
                 break
-        if has_loan_in_one_or_more_docs:
-            matches.append((cik, file_type, date, "TRUE"))
-        else:
-            matches.append((cik, file_type, date, "FALSE"))
-        for file in files:
-            os.remove(file)
+    found = "TRUE" if has_loan_in_one_or_more_docs else "FALSE"
+    result = [(cik, file_type, date, accession, found)]
+    if not term_counts:
+        return result
+    return {
+        CMD.FIND_LOANS: result,
+        "term_counts": [
+            (cik, file_type, date, accession, term, *count)
+            for term, count in counts.items()
+        ],
+    }
+
 
-    return matches
+def iter_text_documents(
+    filepath: str,
+    select: Callable[[str, str], bool],
+    ex10_first: bool = False,
+    chunk_bytes: int = DOC_CHUNK_BYTES,
+) -> Iterator[tuple]:
+    """Documents of a filing selected, each as chunks of HTML
+
+    Args:
+        filepath (str): path to the filing
+        select (Callable[[str, str], bool]): function of (lowercased
+            filename, type) that returns True for documents selected
+        ex10_first (bool, optional): if True, yield EX-10 exhibits first,
+            reading the filing twice. Defaults to False.
+        chunk_bytes (int, optional): bytes of a document read at a time.
+            Defaults to DOC_CHUNK_BYTES.
+
+    Yields:
+        tuple: (index starting from 1, lowercased filename, type, chunks)
+    """
+    if not ex10_first:
+        yield from iter_document_chunks(filepath, select, chunk_bytes)
+        return
+    ex10 = select_documents(("EX-10*",))
+    yield from iter_document_chunks(
+        filepath, lambda *doc: select(*doc) and ex10(*doc), chunk_bytes
+    )
+    yield from iter_document_chunks(
+        filepath, lambda *doc: select(*doc) and not ex10(*doc), chunk_bytes
+    )
+
+
+def document_text(
+    chunks: Iterator[str],
+    backend: str,
+    cache: TextCache | None,
+    cik: str,
+    file_type: str,
+    filepath: str,
+    ith_doc: int,
+) -> Iterator[str]:
+    """Plain text of a document, from the cache if given
+
+    Args:
+        chunks (Iterator[str]): chunks of HTML document
+        backend (str): backend to convert HTML to text
+        cache (TextCache | None): cache of text of documents, or None
+        cik (str): cik of company
+        file_type (str): file type, e.g., "8-K", "10-K"
+        filepath (str): path to the filing
+        ith_doc (int): index of the document in the filing, from 1
+
+    Returns:
+        Iterator[str]: chunks of plain text
+    """
+    if cache is None:
+        return metrics.timed("parse", iter_text(chunks, backend))
+    date, accession = parse_filing_name(filepath)
+    text = cache.text(chunks, backend, cik, file_type, date, accession, ith_doc)
+    return metrics.timed("parse", text)
+
+
+@functools.lru_cache(maxsize=8)
+def keyword_matcher(keywords: tuple) -> KeywordMatcher:
+    """Matcher of keywords, compiled once per process"""
+    return KeywordMatcher(keywords)
+
+
+def warm_up(backend: str, keywords: tuple = ()):
+    """Load the text backend, e.g., import `requests_html`, and compile the
+    matcher of keywords, in a worker before its first filing
+
+    Args:
+        backend (str): backend to convert HTML to text
+        keywords (tuple, optional): keywords of loan contracts.
+            Defaults to NSS_10_words.
+    """
+    html_to_text("<p></p>", backend)
+    keyword_matcher(keywords or tuple(NSS_10_words))
 
 
 # Regex pattern used to find the appearance of any of the 10 search words used
@@ -124,13 +320,3 @@ NSS_10_words = [
     "financing and security agreement",
     "financing & security agreement",
 ]
-NSS_10_words_str = "|".join([word.upper() for word in NSS_10_words])
-pat_10_words = re.compile(NSS_10_words_str)
-
-
-def has_loan(path: str) -> bool:
-    with open(path, "r") as f:
-        text = f.read()
-    html = requests_html.HTML(html=text)
-    match = pat_10_words.search(html.text)
-    return True if match else False
@@ -1,62 +1,75 @@
 import argparse
+import functools
 import logging
-import os
-import gzip
 import types
 
 from edgaranalyzer import CMD
 from .cmd_find import cmd_find
-from .utils import prefix_logger, walk_dirpath
+from .utils import (
+    prefix_logger,
+    read_header,
+    parse_filing_name,
+    SECHeader,
+    HEADER_MAX_BYTES,
+)
 
 
 logger = prefix_logger(CMD.FIND_ZIPCODE, logging.getLogger(__name__))
 
 sql = types.SimpleNamespace()
 sql.create_table = """CREATE TABLE IF NOT EXISTS files_zipcode
-    (cik TEXT, file_type TEXT, date DATE, state TEXT, zipcode TEXT,
-    PRIMARY KEY(cik, file_type, date));"""
+    (cik TEXT, file_type TEXT, date DATE, accession TEXT,
+    state TEXT, zipcode TEXT,
+    PRIMARY KEY(cik, file_type, date, accession));"""
 
-sql.insert_result = """INSERT OR IGNORE INTO files_zipcode
-    (cik, file_type, date, state, zipcode) VALUES (?,?,?,?,?);"""
+sql.insert_result = """INSERT OR REPLACE INTO files_zipcode
+    (cik, file_type, date, accession, state, zipcode) VALUES (?,?,?,?,?,?);"""
+
+sql.delete_result = """DELETE FROM files_zipcode
+    WHERE cik=? AND file_type=? AND date=? AND accession IN (?, '');"""
+
+# Bump when `extract` changes, so that filings are processed again
+version = 1
 
 
 def cmd(args: argparse.Namespace):
-    cmd_find(args, logger, sql, regsearch)
+    search = functools.partial(regsearch, max_bytes=args.header_bytes)
+    cmd_find(args, logger, sql, search, {CMD.FIND_ZIPCODE: version})
 
 
-def regsearch(path: str, cik: str, file_type: str) -> list:
+def regsearch(
+    filepath: str, cik: str, file_type: str, max_bytes: int = HEADER_MAX_BYTES
+) -> list:
     """Search function on a filing
 
     Args:
-        path (str): data directory
+        filepath (str): path to the filing
         cik (str): cik of company
         file_type (str): file type, e.g., "8-K", "10-K"
+        max_bytes (int, optional): maximum bytes to read for the header.
+            Defaults to HEADER_MAX_BYTES.
 
     Returns:
         list: list of results
     """
-    matches = []
-    for filepath in walk_dirpath(path, cik, file_type):
-        date = os.path.split(filepath)[-1].strip(".txt.gz")
-        with gzip.open(filepath, "rt") as f:
-            while not (line := f.readline()).strip().startswith("BUSINESS ADDRESS"):
-                if not line:
-                    break
-
-            while not line.strip().startswith("STATE"):
-                line = f.readline()
-                if not line:
-                    break
-            state = line.split(":")[-1]
-            state = state.strip() if isinstance(state, str) else ""
-
-            while not line.strip().startswith("ZIP"):
-                line = f.readline()
-                if not line:
-                    break
-            zip = line.split(":")[-1].strip()
-            zip = zip.strip() if isinstance(zip, str) else ""
-
-            matches.append((cik, file_type, date, state.upper(), zip.upper()))
-
-    return matches
+    date, accession = parse_filing_name(filepath)
+    header = read_header(filepath, max_bytes)
+    return [(cik, file_type, date, accession, *res) for res in extract(header)]
+
+
+def extract(header: SECHeader) -> list:
+    """Extract business state and zipcode from the header of a filing
+
+    Args:
+        header (SECHeader): parsed SEC header
+
+    Returns:
+        list: list of one result, a tuple of (state, zipcode)
+    """
+    # The first business address, e.g., of the filer or subject company
+    section = next((k for k in header if "BUSINESS ADDRESS/" in k), "")
+    section = section.rpartition("BUSINESS ADDRESS/")[0] + "BUSINESS ADDRESS/"
+    state = next(iter(header.get(section + "STATE", [])), "")
+    zip = next(iter(header.get(section + "ZIP", [])), "")
+
+    return [(state.upper(), zip.upper())]
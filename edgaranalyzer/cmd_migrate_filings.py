@@ -0,0 +1,53 @@
+import argparse
+import logging
+import os
+import pathlib
+import sys
+import tqdm
+
+from edgaranalyzer import CMD
+from .utils import (
+    prefix_logger,
+    walk_dirpath,
+    filing_path,
+    read_header,
+    split_packed,
+    GZIP_SUFFIX,
+    ZSTD_SUFFIX,
+)
+
+
+logger = prefix_logger(CMD.MIGRATE_FILINGS, logging.getLogger(__name__))
+
+
+def cmd(args: argparse.Namespace):
+    """Rename filings stored as "{date}.txt.gz" by earlier versions
+    to "{date}_{accession}.txt.gz", reading the accession number
+    from the header of each filing"""
+    path = pathlib.Path(args.data_dir).expanduser().resolve().as_posix()
+    if not os.path.exists(path):
+        logger.error("data directory does not exist")
+        sys.exit(1)
+
+    _, ciks, _ = next(os.walk(path))
+    logger.info(f"total ciks: {len(ciks)}")
+    renamed, failed = 0, 0
+    for cik in tqdm.tqdm(ciks):
+        for filepath, date, accession in walk_dirpath(path, cik, args.file_type):
+            if accession or split_packed(filepath)[1] is not None:
+                continue  # named with accession number, or packed
+            header = read_header(filepath)
+            accession = next(iter(header.get("ACCESSION NUMBER", [])), "")
+            if not accession:
+                logger.warning(f"no accession number in {filepath}")
+                failed += 1
+                continue
+            suffix = ZSTD_SUFFIX if filepath.endswith(ZSTD_SUFFIX) else GZIP_SUFFIX
+            newpath = filing_path(path, cik, args.file_type, date, accession, suffix)
+            if os.path.exists(newpath):
+                # Downloaded again under the new name
+                os.remove(filepath)
+            else:
+                os.rename(filepath, newpath)
+            renamed += 1
+    logger.info(f"filings renamed: {renamed}, without accession number: {failed}")
@@ -0,0 +1,153 @@
+import argparse
+import logging
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+import tqdm
+
+from edgaranalyzer import CMD
+from .utils import prefix_logger, walk_dirpath, pack_path, split_packed
+
+
+logger = prefix_logger(CMD.PACK_FILINGS, logging.getLogger(__name__))
+
+
+def cmd(args: argparse.Namespace):
+    """Pack filings stored as files into an archive per cik and file type,
+    "{cik}/{file_type}.zip", and remove the files packed"""
+    path = pathlib.Path(args.data_dir).expanduser().resolve().as_posix()
+    if not os.path.exists(path):
+        logger.error("data directory does not exist")
+        sys.exit(1)
+
+    _, ciks, _ = next(os.walk(path))
+    logger.info(f"total ciks: {len(ciks)}")
+    packed = 0
+    for cik in tqdm.tqdm(ciks):
+        files = [
+            filepath
+            for filepath, _, _ in walk_dirpath(path, cik, args.file_type)
+            if split_packed(filepath)[1] is None
+        ]
+        if not files:
+            continue
+        packed += pack(pack_path(path, cik, args.file_type), files)
+        if args.keep_files:
+            continue
+        for filepath in files:
+            os.remove(filepath)
+        # Directory of the file type, if empty
+        type_dir = os.path.join(path, cik, args.file_type)
+        for dirpath, _, _ in os.walk(type_dir, topdown=False):
+            if not os.listdir(dirpath):
+                os.rmdir(dirpath)
+    logger.info(f"filings packed: {packed}")
+
+
+def pack(archive: str, files: list) -> int:
+    """Add gzipped filings to an archive, stored as is
+
+    Filings are appended to an existing archive in place, over its central
+    directory, which is rewritten at the end. The old central directory is
+    saved aside first, so that an interrupted run, even if killed, is rolled
+    back to the archive as it was, see `restore_pack`. A new archive is
+    written to a temporary file renamed when complete.
+
+    Args:
+        archive (str): archive path
+        files (list): paths to the filings
+
+    Returns:
+        int: number of filings added, those in the archive already are skipped
+    """
+    restore_pack(archive)
+    if not os.path.exists(archive):
+        dirname, basename = os.path.split(archive)
+        fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf:
+                added = add_files(zf, files)
+            os.replace(tmp, archive)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return added
+
+    with zipfile.ZipFile(archive) as zf:
+        # Offset of the central directory, where appended filings start
+        start = zf.start_dir
+    with open(archive, "rb") as f:
+        f.seek(start)
+        tail = f.read()
+    backup = restore_path(archive)
+    with open(f"{backup}.part", "wb") as f:
+        f.write(f"{start}\n".encode() + tail)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{backup}.part", backup)
+    try:
+        with zipfile.ZipFile(archive, "a", zipfile.ZIP_STORED) as zf:
+            added = add_files(zf, files)
+    except BaseException:
+        restore_pack(archive)
+        raise
+    os.remove(backup)
+    return added
+
+
+def add_files(zf: zipfile.ZipFile, files: list) -> int:
+    """Add gzipped filings to an open archive, skipping those in it already
+
+    Args:
+        zf (zipfile.ZipFile): archive opened for writing or appending
+        files (list): paths to the filings
+
+    Returns:
+        int: number of filings added
+    """
+    names = set(zf.namelist())
+    added = 0
+    for filepath in files:
+        filename = os.path.basename(filepath)
+        if filename in names:
+            continue
+        stat = os.stat(filepath)
+        info = zipfile.ZipInfo(filename, time.localtime(stat.st_mtime)[:6])
+        info.file_size = stat.st_size
+        # Exact modification time, see `utils.filing_stat`
+        info.comment = repr(stat.st_mtime).encode()
+        with open(filepath, "rb") as src, zf.open(info, "w") as dst:
+            shutil.copyfileobj(src, dst)
+        names.add(filename)
+        added += 1
+    return added
+
+
+def restore_path(archive: str) -> str:
+    dirname, basename = os.path.split(archive)
+    return os.path.join(dirname, f".{basename}.restore")
+
+
+def restore_pack(archive: str):
+    """Roll back an archive to before an interrupted append, if any, by
+    writing back its central directory and truncating the filings appended
+
+    Args:
+        archive (str): archive path
+    """
+    backup = restore_path(archive)
+    if not os.path.exists(backup):
+        return
+    with open(backup, "rb") as f:
+        start = int(f.readline())
+        tail = f.read()
+    with open(archive, "r+b") as f:
+        f.seek(start)
+        f.write(tail)
+        f.truncate()
+    os.remove(backup)
@@ -0,0 +1,305 @@
+import argparse
+import concurrent.futures
+import functools
+import gzip
+import logging
+import os
+import pathlib
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import zipfile
+from typing import IO
+import tqdm
+
+from edgaranalyzer import CMD
+from .utils import (
+    prefix_logger,
+    walk_dirpath,
+    pack_path,
+    split_packed,
+    open_filing,
+    filing_stat,
+    parse_filing_name,
+    import_zstandard,
+    zstd_dictionary_path,
+    GZIP_SUFFIX,
+    ZSTD_SUFFIX,
+    HEADER_MAX_BYTES,
+)
+
+
+logger = prefix_logger(CMD.RECOMPRESS_FILINGS, logging.getLogger(__name__))
+
+# Filings recompressed keep their modification time, so that the ledger of
+# processed filings only needs the new size for them not to be processed again
+ledger_sql_update = """UPDATE files_processed SET size=?
+    WHERE cik=? AND file_type=? AND date=? AND accession=? AND size=? AND mtime=?;"""
+
+# Bytes of the beginning of a filing taken as a sample to train the
+# dictionary, i.e., the header and the tags and boilerplate that follow
+SAMPLE_BYTES = HEADER_MAX_BYTES
+
+
+def cmd(args: argparse.Namespace):
+    """Recompress gzipped filings with zstd and a dictionary trained on
+    filings of the file type, stored as files or in packed archives"""
+    path = pathlib.Path(args.data_dir).expanduser().resolve().as_posix()
+    if not os.path.exists(path):
+        logger.error("data directory does not exist")
+        sys.exit(1)
+    try:
+        zstandard = import_zstandard()
+    except ImportError as e:
+        logger.error(e)
+        sys.exit(1)
+
+    _, ciks, _ = next(os.walk(path))
+    logger.info(f"total ciks: {len(ciks)}")
+    dict_path = zstd_dictionary_path(path, args.file_type)
+    # Never trained again, as filings recompressed before need it
+    if not os.path.exists(dict_path):
+        logger.info(f"training dictionary on {args.samples} filings")
+        samples = sample_filings(path, ciks, args.file_type, args.samples)
+        try:
+            train_dictionary(dict_path, samples, args.dict_size, args.level)
+        except zstandard.ZstdError as e:
+            logger.error(f"{e}, with {len(samples)} filings sampled")
+            sys.exit(1)
+    logger.info(f"dictionary: {dict_path}")
+
+    dbs = [
+        sqlite3.connect(pathlib.Path(db).expanduser().resolve().as_posix())
+        for db in args.database or []
+    ]
+    workers = min(os.cpu_count(), int(args.threads))
+    before, after, failed = 0, 0, 0
+    with concurrent.futures.ProcessPoolExecutor(workers) as exe:
+        futures = {
+            exe.submit(recompress_cik, path, cik, args.file_type, args.level): cik
+            for cik in ciks
+        }
+        for f in tqdm.tqdm(
+            concurrent.futures.as_completed(futures), total=len(futures)
+        ):
+            cik = futures[f]
+            recompressed, failures = f.result()
+            for filepath in failures:
+                logger.warning(f"failed to recompress {filepath}")
+            failed += len(failures)
+            before += sum(old_size for _, _, old_size, _, _ in recompressed)
+            after += sum(new_size for *_, new_size in recompressed)
+            rows = [
+                (new_size, cik, args.file_type, date, acc, old_size, mtime)
+                for date, acc, old_size, mtime, new_size in recompressed
+            ]
+            for conn in dbs:
+                conn.executemany(ledger_sql_update, rows)
+                conn.commit()
+    for conn in dbs:
+        conn.close()
+    logger.info(f"bytes before: {before}, after: {after}, filings failed: {failed}")
+
+
+def sample_filings(dir_path: str, ciks: list, file_type: str, n: int) -> list:
+    """Beginning of randomly chosen filings, from as many ciks as possible
+
+    Args:
+        dir_path (str): data directory of all filings
+        ciks (list): ciks of companies
+        file_type (str): filing type, e.g., "8-K", "10-K"
+        n (int): number of filings
+
+    Returns:
+        list: decompressed first SAMPLE_BYTES of each filing
+    """
+    ciks = random.sample(ciks, len(ciks))
+    per_cik = max(n // max(len(ciks), 1), 1)
+    samples = []
+    for cik in ciks:
+        filings = [filepath for filepath, *_ in walk_dirpath(dir_path, cik, file_type)]
+        for filepath in random.sample(filings, min(per_cik, len(filings))):
+            with open_filing(filepath) as f:
+                samples.append(f.read(SAMPLE_BYTES))
+        if len(samples) >= n:
+            break
+    return samples[:n]
+
+
+def train_dictionary(dict_path: str, samples: list, dict_size: int, level: int):
+    """Train a zstd dictionary and save it
+
+    Args:
+        dict_path (str): dictionary path
+        samples (list): samples of filings
+        dict_size (int): maximum bytes of the dictionary
+        level (int): compression level the dictionary is tuned for
+    """
+    zstandard = import_zstandard()
+    dict_data = zstandard.train_dictionary(dict_size, samples, level=level, threads=-1)
+    dirname, basename = os.path.split(dict_path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+    with os.fdopen(fd, "wb") as f:
+        f.write(dict_data.as_bytes())
+    os.replace(tmp, dict_path)
+
+
+@functools.lru_cache(maxsize=8)
+def zstd_compressor(dict_path: str, level: int):
+    """Compressor with the dictionary, cached per process
+
+    Args:
+        dict_path (str): dictionary path
+        level (int): compression level
+
+    Returns:
+        zstandard.ZstdCompressor: compressor
+    """
+    zstandard = import_zstandard()
+    with open(dict_path, "rb") as f:
+        dict_data = zstandard.ZstdCompressionDict(f.read())
+    return zstandard.ZstdCompressor(level, dict_data=dict_data, write_checksum=True)
+
+
+def compress_filing(src: IO[bytes], dst: IO[bytes], cctx):
+    """Compress a filing with its header in a block of its own, so that
+    reading the header decompresses only that block, see `utils.ZstdReader`
+
+    Args:
+        src (IO[bytes]): decompressed filing
+        dst (IO[bytes]): file to write the compressed filing
+        cctx (zstandard.ZstdCompressor): compressor
+    """
+    zstandard = import_zstandard()
+    with cctx.stream_writer(dst, closefd=False) as writer:
+        max_bytes = HEADER_MAX_BYTES
+        while max_bytes > 0 and (line := src.readline(max_bytes)):
+            writer.write(line)
+            max_bytes -= len(line)
+            if line.startswith((b"</SEC-HEADER>", b"<DOCUMENT>")):
+                break
+        writer.flush(zstandard.FLUSH_BLOCK)
+        shutil.copyfileobj(src, writer, 1 << 20)
+
+
+def recompress_cik(dir_path: str, cik: str, file_type: str, level: int) -> tuple:
+    """Recompress gzipped filings of a cik, in a worker process
+
+    Args:
+        dir_path (str): data directory of all filings
+        cik (str): cik of company
+        file_type (str): filing type, e.g., "8-K", "10-K"
+        level (int): compression level
+
+    Returns:
+        tuple: (list of (date, accession, old size, mtime, new size) of
+            filings recompressed, list of paths of filings failed)
+    """
+    cctx = zstd_compressor(zstd_dictionary_path(dir_path, file_type), level)
+    recompressed, failed, packed = [], [], False
+    for filepath, date, acc in walk_dirpath(dir_path, cik, file_type):
+        if not filepath.endswith(GZIP_SUFFIX):
+            continue
+        if split_packed(filepath)[1] is not None:
+            packed = True
+            continue
+        size, mtime = filing_stat(filepath)
+        try:
+            new_size = recompress_file(filepath, cctx)
+        except (OSError, EOFError):
+            failed.append(filepath)
+            continue
+        recompressed.append((date, acc, size, mtime, new_size))
+    if packed:
+        archive = pack_path(dir_path, cik, file_type)
+        results, failures = recompress_pack(archive, cctx)
+        recompressed.extend(results)
+        failed.extend(failures)
+    return recompressed, failed
+
+
+def recompress_file(filepath: str, cctx) -> int:
+    """Recompress a gzipped filing stored as a file, which is replaced
+    by "{date}_{accession}.txt.zst" of the same modification time
+
+    Args:
+        filepath (str): path to the gzipped filing
+        cctx (zstandard.ZstdCompressor): compressor
+
+    Returns:
+        int: size of the recompressed filing
+    """
+    stat = os.stat(filepath)
+    newpath = filepath.removesuffix(GZIP_SUFFIX) + ZSTD_SUFFIX
+    dirname, basename = os.path.split(newpath)
+    fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+    try:
+        with os.fdopen(fd, "wb") as dst, gzip.open(filepath, "rb") as src:
+            compress_filing(src, dst, cctx)
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp, newpath)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.remove(filepath)
+    return os.stat(newpath).st_size
+
+
+def recompress_pack(archive: str, cctx) -> tuple:
+    """Recompress gzipped filings in a packed archive, which is replaced
+    by a copy with the filings recompressed, of the same modification time
+    in the archive
+
+    Args:
+        archive (str): archive path
+        cctx (zstandard.ZstdCompressor): compressor
+
+    Returns:
+        tuple: (list of (date, accession, old size, mtime, new size) of
+            filings recompressed, list of paths of filings failed)
+    """
+    dirname, basename = os.path.split(archive)
+    fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+    os.close(fd)
+    recompressed, failed = [], []
+    try:
+        with zipfile.ZipFile(archive) as src, zipfile.ZipFile(
+            tmp, "w", zipfile.ZIP_STORED
+        ) as dst:
+            names = set(src.namelist())
+            for info in src.infolist():
+                filename = info.filename
+                newname = filename.removesuffix(GZIP_SUFFIX) + ZSTD_SUFFIX
+                with tempfile.TemporaryFile() as buffer:
+                    if filename.endswith(GZIP_SUFFIX) and newname not in names:
+                        try:
+                            with src.open(info) as raw, gzip.open(raw) as f:
+                                compress_filing(f, buffer, cctx)
+                        except (OSError, EOFError):
+                            failed.append(os.path.join(archive, filename))
+                            newname = filename
+                    else:
+                        newname = filename
+                    if newname == filename:
+                        # Stored as is, e.g., recompressed already
+                        buffer.seek(0)
+                        buffer.truncate()
+                        with src.open(info) as f:
+                            shutil.copyfileobj(f, buffer)
+                    new = zipfile.ZipInfo(newname, info.date_time)
+                    new.comment = info.comment
+                    new.file_size = buffer.tell()
+                    buffer.seek(0)
+                    with dst.open(new, "w") as f:
+                        shutil.copyfileobj(buffer, f)
+                if newname != filename:
+                    size, mtime = filing_stat(os.path.join(archive, filename))
+                    date, acc = parse_filing_name(filename)
+                    recompressed.append((date, acc, size, mtime, new.file_size))
+        os.replace(tmp, archive)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return recompressed, failed
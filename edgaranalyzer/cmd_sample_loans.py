@@ -1,11 +1,10 @@
 import argparse
 import logging
-import os
 import pathlib
 import sqlite3
 
 from edgaranalyzer import CMD
-from .utils import prefix_logger, extract_files
+from .utils import prefix_logger, extract_files, locate_filing
 
 
 logger = prefix_logger(CMD.FIND_LOANS, logging.getLogger(__name__))
@@ -18,16 +17,15 @@ def cmd(args: argparse.Namespace):
     conn = sqlite3.connect(db)
     c = conn.cursor()
     c.execute(
-        f"""SELECT * FROM files_with_loan_contracts 
+        f"""SELECT cik, file_type, date, accession
+        FROM files_with_loan_contracts
         WHERE file_type="{args.file_type}" AND has_loan="TRUE"
         ORDER BY RANDOM() LIMIT {args.n};"""
     )
     result = c.fetchall()
     conn.close()
 
-    paths = [
-        os.path.join(path, cik, file_type, f"{date}.txt.gz")
-        for cik, file_type, date, _ in result
-    ]
+    paths = [locate_filing(path, *filing) for filing in result]
     for p in paths:
-        extract_files(p, out)
+        if p is not None:
+            extract_files(p, out)
@@ -0,0 +1,138 @@
+import gzip
+import threading
+import time
+import types
+import urllib.parse
+from typing import Mapping
+
+# SEC's fair access policy allows at most 10 requests per second
+SEC_RATE_LIMIT = 10
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter"""
+
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        """Create a token bucket
+
+        Args:
+            rate (float): tokens added per second, i.e., requests per second
+            capacity (float, optional): maximum tokens, i.e., burst size.
+                Defaults to 1.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token, blocking until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens += (now - self._last) * self.rate
+            self._tokens = min(self._tokens, self.capacity)
+            self._last = now
+            # Reserve a token, waiting for it outside the lock if in debt
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Downloader:
+    """HTTP client shared by threads, with a global rate limit
+    and a persistent keep-alive connection per thread and host"""
+
+    def __init__(
+        self,
+        user_agent: str,
+        rate: float = SEC_RATE_LIMIT,
+        timeout: float = 30,
+    ) -> None:
+        """Create a downloader
+
+        Args:
+            user_agent (str): User-Agent in request's headers
+            rate (float, optional): maximum requests per second across all
+                threads. Defaults to SEC_RATE_LIMIT.
+            timeout (float, optional): timeout in seconds. Defaults to 30.
+        """
+        self.headers = {
+            "User-Agent": user_agent,
+            "Accept-Encoding": "gzip",
+        }
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate)
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme: str, netloc: str) -> "http.client.HTTPConnection":
+        # Imported on first use, as with ssl it is a large part of startup
+        import http.client
+
+        conns = self._local.__dict__.setdefault("conns", {})
+        if (scheme, netloc) not in conns:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            conns[(scheme, netloc)] = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conns[(scheme, netloc)]
+
+    def get(self, url: str, headers: Mapping[str, str] = {}) -> types.SimpleNamespace:
+        """GET an url, waiting for the rate limit
+
+        Args:
+            url (str): url
+            headers (Mapping[str, str], optional): extra request headers.
+                Defaults to {}.
+
+        Returns:
+            types.SimpleNamespace: response with `status`, `headers` and `body`
+        """
+        import http.client
+
+        u = urllib.parse.urlsplit(url)
+        target = u.path + (f"?{u.query}" if u.query else "")
+        for retry in (True, False):
+            conn = self._connection(u.scheme, u.netloc)
+            self.limiter.acquire()
+            try:
+                conn.request("GET", target, headers={**self.headers, **headers})
+                res = conn.getresponse()
+                body = res.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server may close an idle keep-alive connection
+                conn.close()
+                if not retry:
+                    raise
+        if res.will_close:
+            conn.close()
+        return types.SimpleNamespace(
+            status=res.status, headers=res.headers, body=body
+        )
+
+    def get_gzipped(self, url: str) -> types.SimpleNamespace:
+        """GET an url, with the response body gzipped
+
+        Args:
+            url (str): url
+
+        Returns:
+            types.SimpleNamespace: response with `status`, `headers` and `body`
+        """
+        res = self.get(url)
+        if res.headers.get("Content-Encoding", "").lower() != "gzip":
+            res.body = gzip.compress(res.body)
+        return res
+
+    def close(self) -> None:
+        """Close the connections of all threads"""
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
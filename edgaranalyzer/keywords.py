@@ -0,0 +1,182 @@
+import hashlib
+import re
+from typing import Iterable, Iterator
+
+# Key of the keyword ending at a node of the trie
+_END = ""
+
+
+class KeywordMatcher:
+    """Case-insensitive matcher of many keywords in one pass over text
+
+    Keywords are stored in a trie. A regex built from the trie finds where
+    keywords start, sharing common prefixes of keywords, so that its cost
+    per character hardly grows with the number of keywords. The trie is then
+    walked from each start to report every keyword found there, including
+    keywords which are prefixes of others. Whitespace in a keyword matches
+    any run of whitespace in text.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        """Compile keywords
+
+        Args:
+            keywords (Iterable[str]): keywords, duplicates ignored
+        """
+        keywords = (normalize(kw) for kw in keywords)
+        self.keywords = list(dict.fromkeys(kw for kw in keywords if kw))
+        self._trie = {}
+        for kw in self.keywords:
+            node = self._trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[_END] = kw
+        self._starts = re.compile(f"(?=(?:{_trie_regex(self._trie)}))", re.I)
+
+    def finditer(self, text: str) -> Iterator[tuple[str, int]]:
+        """Find all keywords in text, overlapping ones included
+
+        Args:
+            text (str): text to search
+
+        Yields:
+            tuple[str, int]: (keyword, offset) in order of offset
+        """
+        return self._finditer(text, len(text))
+
+    def finditer_chunks(self, chunks: Iterable[str]) -> Iterator[tuple[str, int]]:
+        """Find all keywords in text given in chunks, including keywords
+        across chunks, holding only a chunk and a short overlap in memory.
+        Whitespace in text is assumed collapsed, as by `html_to_text`.
+
+        Args:
+            chunks (Iterable[str]): chunks of text
+
+        Yields:
+            tuple[str, int]: (keyword, offset in the whole text)
+        """
+        # Keywords starting in the last `overlap` characters may continue
+        # in the next chunk, so they are searched with the next chunk
+        overlap = max(map(len, self.keywords), default=1) - 1
+        carry, base = "", 0
+        for chunk in chunks:
+            window = carry + chunk
+            end = max(len(window) - overlap, 0)
+            for kw, offset in self._finditer(window, end):
+                yield kw, base + offset
+            carry, base = window[end:], base + end
+        for kw, offset in self._finditer(carry, len(carry)):
+            yield kw, base + offset
+
+    def search(self, text: str | Iterable[str]) -> tuple[str, int] | None:
+        """Find the first keyword in text, reading no further chunks of text
+        after it is found
+
+        Args:
+            text (str | Iterable[str]): text, or chunks of text
+
+        Returns:
+            tuple[str, int] | None: (keyword, offset), or None if not found
+        """
+        return next(self._matches(text), None)
+
+    def count(self, text: str | Iterable[str]) -> dict[str, tuple[int, int]]:
+        """Count hits of keywords in text
+
+        Args:
+            text (str | Iterable[str]): text, or chunks of text
+
+        Returns:
+            dict[str, tuple[int, int]]: (hits, first offset) of each keyword
+                found
+        """
+        counts = {}
+        for kw, offset in self._matches(text):
+            hits, first = counts.get(kw, (0, offset))
+            counts[kw] = (hits + 1, first)
+        return counts
+
+    def _matches(self, text: str | Iterable[str]) -> Iterator[tuple[str, int]]:
+        if isinstance(text, str):
+            return self.finditer(text)
+        return self.finditer_chunks(text)
+
+    def _finditer(self, text: str, end: int) -> Iterator[tuple[str, int]]:
+        """Keywords in text starting before `end`"""
+        if not self.keywords:
+            return
+        for m in self._starts.finditer(text):
+            start = m.start()
+            if start >= end:
+                return
+            for kw in self._walk(text, start):
+                yield kw, start
+
+    def _walk(self, text: str, i: int) -> Iterator[str]:
+        node, n = self._trie, len(text)
+        while True:
+            if _END in node:
+                yield node[_END]
+            if i >= n:
+                return
+            if text[i].isspace():
+                node = node.get(" ")
+                while i < n and text[i].isspace():
+                    i += 1
+            else:
+                node = node.get(text[i].lower())
+                i += 1
+            if node is None:
+                return
+
+
+def _trie_regex(node: dict) -> str:
+    """Regex matching any keyword in the trie, up to the shortest one,
+    which is enough to tell where a keyword starts"""
+    if _END in node:
+        return ""
+    alts = [
+        (r"\s+" if ch == " " else re.escape(ch)) + _trie_regex(child)
+        for ch, child in node.items()
+    ]
+    return alts[0] if len(alts) == 1 else f"(?:{'|'.join(alts)})"
+
+
+def normalize(keyword: str) -> str:
+    """Lowercase a keyword, with whitespace collapsed to single spaces
+
+    Args:
+        keyword (str): keyword
+
+    Returns:
+        str: normalized keyword
+    """
+    return " ".join(keyword.lower().split())
+
+
+def load_dictionary(path: str) -> list[str]:
+    """Load keywords from a file, one per line.
+    Empty lines and lines starting with "#" are ignored.
+
+    Args:
+        path (str): path to the file
+
+    Returns:
+        list[str]: keywords
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def dictionary_id(keywords: Iterable[str]) -> str:
+    """Short identifier of a set of keywords, regardless of order and case
+
+    Args:
+        keywords (Iterable[str]): keywords
+
+    Returns:
+        str: identifier, e.g., "3f2a9c1b"
+    """
+    keywords = sorted({normalize(kw) for kw in keywords} - {""})
+    return hashlib.sha1("\n".join(keywords).encode()).hexdigest()[:8]
@@ -4,6 +4,9 @@ import sys
 import os
 import logging
 from edgaranalyzer import __description__, __version__, CMD
+from edgaranalyzer.utils import HEADER_MAX_BYTES, DOC_CHUNK_BYTES
+from edgaranalyzer.downloader import SEC_RATE_LIMIT
+from edgaranalyzer.text import TEXT_BACKENDS
 
 
 def init_argparse() -> argparse.ArgumentParser:
@@ -49,6 +52,31 @@ def init_argparse() -> argparse.ArgumentParser:
         description="Build database of filings",
         help="Build database",
     )
+    parser_migrate_filings = subparsers.add_parser(
+        CMD.MIGRATE_FILINGS,
+        description="""Rename filings downloaded by earlier versions,
+            named by filing date only, to names with accession number""",
+        help="Migrate filings to names with accession number",
+    )
+    parser_pack_filings = subparsers.add_parser(
+        CMD.PACK_FILINGS,
+        description="""Pack filings of each cik and file type into one archive,
+            "{cik}/{file_type}.zip", read by all commands as the files""",
+        help="Pack filings into an archive per cik",
+    )
+    parser_recompress_filings = subparsers.add_parser(
+        CMD.RECOMPRESS_FILINGS,
+        description="""Recompress filings with zstd and a dictionary trained on
+            filings of the file type, read by all commands as gzipped filings.
+            Requires the zstandard package""",
+        help="Recompress filings with zstd",
+    )
+    parser_build_header_store = subparsers.add_parser(
+        CMD.BUILD_HEADER_STORE,
+        description="""Store all fields of the header of filings in table
+            header_fields, queried by `find_header_fields` and sql alike""",
+        help="Store header fields of filings in database",
+    )
     # find & search
     parser_find_items = subparsers.add_parser(
         CMD.FIND_ITEMS,
@@ -68,6 +96,12 @@ def init_argparse() -> argparse.ArgumentParser:
             from header data""",
         help="Find reported zipcode from filings",
     )
+    parser_find_header = subparsers.add_parser(
+        CMD.FIND_HEADER,
+        description="""Find reported items, event date and business zipcode
+            from filings from header data, reading each filing only once""",
+        help="Find all header data from filings",
+    )
     parser_find_loans = subparsers.add_parser(
         CMD.FIND_LOANS,
         description="""Find loan contracts from filings
@@ -93,6 +127,13 @@ def init_argparse() -> argparse.ArgumentParser:
         default="edgar-idx.sqlite3",
         help="output sqlite database to store results. Defaults to `edgar-idx.sqlite3`",
     )
+    parser_build_db.add_argument(
+        "--rescan",
+        default=False,
+        const=True,
+        action="store_const",
+        help="if set, ingest all index files, including those ingested before",
+    )
     required = parser_build_db.add_argument_group("required named arguments")
     required.add_argument(
         "-i",
@@ -105,9 +146,30 @@ def init_argparse() -> argparse.ArgumentParser:
         "-t",
         "--threads",
         metavar="threads",
-        help="number of processes to use",
+        help="number of requests in flight",
         default=4,
     )
+    parser_download_filings.add_argument(
+        "--rate",
+        metavar="rate",
+        type=float,
+        default=SEC_RATE_LIMIT,
+        help=f"maximum requests per second (default={SEC_RATE_LIMIT})",
+    )
+    parser_download_filings.add_argument(
+        "--retries",
+        metavar="retries",
+        type=int,
+        default=5,
+        help="retries on rate limited or server errors (default=5)",
+    )
+    parser_download_filings.add_argument(
+        "--retry_failed",
+        default=False,
+        const=True,
+        action="store_const",
+        help="if set, retry filings failed to download in previous runs",
+    )
     required = parser_download_filings.add_argument_group("required named arguments")
     required.add_argument(
         "-ua",
@@ -162,12 +224,104 @@ def init_argparse() -> argparse.ArgumentParser:
         type=int,
         help="since year (YYYY)",
     )
+    parser_download.add_argument(
+        "-t",
+        "--threads",
+        metavar="threads",
+        help="number of requests in flight",
+        default=4,
+    )
+    parser_download.add_argument(
+        "--rate",
+        metavar="rate",
+        type=float,
+        default=SEC_RATE_LIMIT,
+        help=f"maximum requests per second (default={SEC_RATE_LIMIT})",
+    )
+    parser_download.add_argument(
+        "--retries",
+        metavar="retries",
+        type=int,
+        default=5,
+        help="retries on rate limited or server errors (default=5)",
+    )
+    parser_download.add_argument(
+        "-db",
+        "--database",
+        metavar="database",
+        help="""sqlite database to populate with the index files downloaded,
+            as by `build_database`""",
+    )
+
+    for p in [parser_migrate_filings, parser_pack_filings, parser_recompress_filings]:
+        required = p.add_argument_group("required named arguments")
+        required.add_argument(
+            "-d",
+            "--data_dir",
+            required=True,
+            metavar="data_directory",
+            help="directory of filings",
+        )
+        required.add_argument(
+            "--file_type",
+            required=True,
+            metavar="file_type",
+            help="type of filing",
+        )
+    parser_pack_filings.add_argument(
+        "--keep_files",
+        default=False,
+        const=True,
+        action="store_const",
+        help="if set, keep the files of filings packed",
+    )
+    parser_recompress_filings.add_argument(
+        "-t",
+        "--threads",
+        metavar="threads",
+        help="number of processes to use",
+        default=os.cpu_count(),
+    )
+    parser_recompress_filings.add_argument(
+        "--level",
+        metavar="level",
+        type=int,
+        default=9,
+        help="""zstd compression level, 1 to 22, higher levels are smaller but
+            slower to compress and as fast to decompress (default=9)""",
+    )
+    parser_recompress_filings.add_argument(
+        "--samples",
+        metavar="samples",
+        type=int,
+        default=2000,
+        help="""filings sampled to train the dictionary, used only if the
+            file type has no dictionary yet (default=2000)""",
+    )
+    parser_recompress_filings.add_argument(
+        "--dict_size",
+        metavar="dict_size",
+        type=int,
+        default=112_640,
+        help="maximum bytes of the dictionary (default=112640)",
+    )
+    parser_recompress_filings.add_argument(
+        "-db",
+        "--database",
+        nargs="+",
+        metavar="database",
+        default=None,
+        help="""sqlite databases of results, whose records of processed filings
+            are updated, so that filings recompressed are not processed again""",
+    )
 
     for p in [
+        parser_build_header_store,
         parser_find_items,
         parser_find_loans,
         parser_find_zipcode,
         parser_find_event_date,
+        parser_find_header,
         parser_find_loan_signature,
         parser_sample_loans,
     ]:
@@ -193,10 +347,12 @@ def init_argparse() -> argparse.ArgumentParser:
         )
 
     for p in [
+        parser_build_header_store,
         parser_find_items,
         parser_find_loans,
         parser_find_zipcode,
         parser_find_event_date,
+        parser_find_header,
         parser_find_loan_signature,
     ]:
         p.add_argument(
@@ -206,7 +362,174 @@ def init_argparse() -> argparse.ArgumentParser:
             help="number of processes to use",
             default=os.cpu_count(),
         )
+        p.add_argument(
+            "--rescan",
+            default=False,
+            const=True,
+            action="store_const",
+            help="if set, process all filings, including those processed before",
+        )
+        p.add_argument(
+            "--chunk_size",
+            metavar="chunk_size",
+            type=int,
+            default=64,
+            help="filings per task sent to a worker process (default=64)",
+        )
+        p.add_argument(
+            "--batch_size",
+            metavar="batch_size",
+            type=int,
+            default=10_000,
+            help="rows to write to database per commit (default=10000)",
+        )
+        p.add_argument(
+            "--flush_interval",
+            metavar="flush_interval",
+            type=float,
+            default=1.0,
+            help="maximum seconds between database commits (default=1)",
+        )
+        p.add_argument(
+            "--start_method",
+            metavar="start_method",
+            choices=["fork", "forkserver", "spawn"],
+            default=None,
+            help="""start method of worker processes, one of fork, forkserver,
+                spawn (default: of the platform)""",
+        )
+        p.add_argument(
+            "--max_tasks_per_child",
+            metavar="max_tasks_per_child",
+            type=int,
+            default=None,
+            help="""if set, workers are replaced once they have run this many
+                tasks, i.e., chunks of filings, each on average, which caps
+                memory leaked by parsing""",
+        )
+        p.add_argument(
+            "--metrics",
+            metavar="metrics",
+            default=None,
+            help="""if set, file to write metrics of the run to, i.e., seconds per
+                stage, bytes read, filings per second per worker, queue depths
+                and the slowest filings, as JSON lines, or in the text format of
+                Prometheus if the file name ends with .prom""",
+        )
+        p.add_argument(
+            "--metrics_interval",
+            metavar="metrics_interval",
+            type=float,
+            default=10.0,
+            help="seconds between writes of metrics (default=10)",
+        )
+        p.add_argument(
+            "--profile",
+            metavar="profile",
+            default=None,
+            help="""if set, file to save the profile of workers to, profiled
+                with cProfile and merged, to view with `python -m pstats`""",
+        )
 
+    for p in [
+        parser_build_header_store,
+        parser_find_items,
+        parser_find_zipcode,
+        parser_find_event_date,
+        parser_find_header,
+    ]:
+        p.add_argument(
+            "--header_bytes",
+            metavar="header_bytes",
+            type=int,
+            default=HEADER_MAX_BYTES,
+            help=f"""maximum bytes to read for the header of a filing
+                (default={HEADER_MAX_BYTES})""",
+        )
+
+    parser_find_header.add_argument(
+        "--extractors",
+        nargs="+",
+        metavar="extractor",
+        choices=[CMD.FIND_ITEMS, CMD.FIND_EVENT_DATE, CMD.FIND_ZIPCODE],
+        default=None,
+        help=f"""header extractors to run (default: all), from
+            {CMD.FIND_ITEMS}, {CMD.FIND_EVENT_DATE}, {CMD.FIND_ZIPCODE}""",
+    )
+    parser_find_header.add_argument(
+        "--header_store",
+        metavar="header_store",
+        default=None,
+        help=f"""if set, read headers from this database built by
+            `{CMD.BUILD_HEADER_STORE}` rather than from filings""",
+    )
+
+    for p in [parser_find_loans, parser_find_loan_signature]:
+        p.add_argument(
+            "--text_backend",
+            metavar="text_backend",
+            choices=list(TEXT_BACKENDS),
+            default="fast",
+            help=f"""backend to convert HTML to text, one of
+                {", ".join(TEXT_BACKENDS)} (default=fast). Earlier versions
+                used requests_html, whose text, and so results, may differ""",
+        )
+        p.add_argument(
+            "--doc_types",
+            nargs="+",
+            metavar="doc_type",
+            default=None,
+            help="""types of documents to search besides the main document, e.g.,
+                EX-10* EX-99*, or * for all documents (default: EX-10*)""",
+        )
+        p.add_argument(
+            "--read_bytes",
+            metavar="read_bytes",
+            type=int,
+            default=DOC_CHUNK_BYTES,
+            help=f"""bytes of a document read and searched at a time, which bound
+                memory per worker (default={DOC_CHUNK_BYTES})""",
+        )
+        p.add_argument(
+            "--text_cache",
+            metavar="text_cache",
+            default=None,
+            help="""if set, directory to cache the text of documents, shared by
+                later runs of commands which convert documents to text""",
+        )
+        p.add_argument(
+            "--text_cache_gb",
+            metavar="text_cache_gb",
+            type=float,
+            default=10.0,
+            help="""size cap of the text cache in GB, least recently used text
+                is removed above it (default=10)""",
+        )
+
+    parser_find_loans.add_argument(
+        "--dictionary",
+        metavar="dictionary",
+        default=None,
+        help="""file of keywords of loan contracts, one per line, matched
+            case-insensitively (default: the 10 keywords of Nini, Smith and
+            Sufi (2009 JFE))""",
+    )
+    parser_find_loans.add_argument(
+        "--term_counts",
+        default=False,
+        const=True,
+        action="store_const",
+        help="""if set, store hits of every keyword of each filing in table
+            loan_term_counts""",
+    )
+    parser_find_loans.add_argument(
+        "--ex10_first",
+        default=False,
+        const=True,
+        action="store_const",
+        help="""if set, search EX-10 exhibits (material contracts) before
+            other documents of a filing""",
+    )
     parser_find_loans.add_argument(
         "--skip_init_table",
         default=False,
@@ -259,10 +582,20 @@ def main():
             from .cmd_download_index import cmd
         case CMD.DOWNLOAD_FILINGS:
             from .cmd_download_filings import cmd
+        case CMD.MIGRATE_FILINGS:
+            from .cmd_migrate_filings import cmd
+        case CMD.PACK_FILINGS:
+            from .cmd_pack_filings import cmd
+        case CMD.RECOMPRESS_FILINGS:
+            from .cmd_recompress_filings import cmd
+        case CMD.BUILD_HEADER_STORE:
+            from .cmd_build_header_store import cmd
         case CMD.FIND_ITEMS:
             from .cmd_find_items import cmd
         case CMD.FIND_ZIPCODE:
             from .cmd_find_zipcode import cmd
+        case CMD.FIND_HEADER:
+            from .cmd_find_header import cmd
         case CMD.FIND_LOANS:
             from .cmd_find_loans import cmd
         case CMD.FIND_EVENT_DATE:
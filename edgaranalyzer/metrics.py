@@ -0,0 +1,454 @@
+import collections
+import contextlib
+import heapq
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import IO, Callable, Iterable, Iterator
+
+# Filings kept in the list of the slowest filings
+SLOWEST = 10
+
+# Stage timers of the worker process, only while filings are measured by
+# `measure_filings`, so that timers cost nothing otherwise
+_clock: "StageClock | None" = None
+
+
+class StageClock:
+    """Exclusive time of nested stages in a process, e.g., time spent
+    decompressing while parsing a document is charged to "decompress" only,
+    not also to "parse" """
+
+    def __init__(self) -> None:
+        self.seconds = collections.defaultdict(float)
+        self.bytes_decompressed = 0
+        self._stack = []
+        self._last = time.perf_counter()
+
+    def push(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._last
+        self._stack.append(name)
+        self._last = now
+
+    def pop(self):
+        now = time.perf_counter()
+        self.seconds[self._stack.pop()] += now - self._last
+        self._last = now
+
+
+def enabled() -> bool:
+    """Whether stage timers of the process are enabled"""
+    return _clock is not None
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Charge the time in the context to a stage, if timers are enabled
+
+    Args:
+        name (str): name of the stage, e.g., "parse", "regex"
+    """
+    clock = _clock
+    if clock is None:
+        yield
+        return
+    clock.push(name)
+    try:
+        yield
+    finally:
+        clock.pop()
+
+
+def timed(name: str, iterable: Iterable) -> Iterable:
+    """Charge the time to produce each item of an iterable to a stage,
+    e.g., converting chunks of HTML to text while they are consumed
+
+    Args:
+        name (str): name of the stage
+        iterable (Iterable): iterable, returned as is if timers are disabled
+
+    Returns:
+        Iterable: iterable of the same items
+    """
+    if _clock is None:
+        return iterable
+    return _timed(name, iter(iterable))
+
+
+def _timed(name: str, iterator: Iterator) -> Iterator:
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class _TimedReader(io.RawIOBase):
+    """Reader of a decompressed file, charging reads to "decompress" """
+
+    def __init__(self, f: IO[bytes], clock: StageClock) -> None:
+        self.f = f
+        self.clock = clock
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        self.clock.push("decompress")
+        try:
+            n = self.f.readinto(b)
+        finally:
+            self.clock.pop()
+        self.clock.bytes_decompressed += n
+        return n
+
+
+def timed_reader(f: IO[bytes]) -> IO[bytes]:
+    """Decompressed file, with reads charged to "decompress" in large
+    blocks, so that reading line by line adds no cost per line
+
+    Args:
+        f (IO[bytes]): decompressed file, returned as is if timers are disabled
+
+    Returns:
+        IO[bytes]: file of the same content
+    """
+    if _clock is None:
+        return f
+    return io.BufferedReader(_TimedReader(f, _clock))
+
+
+def measure_filings(
+    regsearch: Callable, file_type: str, filings: list, timers: bool, profile: bool
+) -> tuple:
+    """Run `regsearch` on the given filings in a worker process, as
+    `cmd_find.search_filings`, with stage timers and cProfile if enabled
+
+    Args:
+        regsearch (Callable): search function on a filing
+        file_type (str): file type, e.g., "8-K", "10-K"
+        filings (list): (cik, filepath) of filings
+        timers (bool): if True, time the stages of each filing
+        profile (bool): if True, profile the search with cProfile
+
+    Returns:
+        tuple: (results of each filing, stats of the worker), where stats
+            are a dict to pass to `RunMetrics.add_worker_stats`
+    """
+    global _clock
+    clock = StageClock() if timers else None
+    profiler = None
+    if profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    results, durations = [], []
+    _clock = clock
+    if profiler is not None:
+        profiler.enable()
+    try:
+        for cik, filepath in filings:
+            start = time.perf_counter()
+            # Time not charged to other stages, e.g., the extractor
+            with stage("other"):
+                results.append(regsearch(filepath, cik, file_type))
+            durations.append((time.perf_counter() - start, filepath))
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _clock = None
+    stats = {
+        "pid": os.getpid(),
+        "filings": len(durations),
+        "seconds": sum(seconds for seconds, _ in durations),
+        "stages": dict(clock.seconds) if clock else {},
+        "bytes_decompressed": clock.bytes_decompressed if clock else 0,
+        "slowest": heapq.nlargest(SLOWEST, durations),
+        "profile": None,
+    }
+    if profiler is not None:
+        import pstats
+
+        stats["profile"] = pstats.Stats(profiler).stats
+    return results, stats
+
+
+class _ProfileStats:
+    """Profile of a worker, in the form `pstats.Stats.add` takes"""
+
+    def __init__(self, stats: dict) -> None:
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class RunMetrics:
+    """Metrics of a run of `cmd_find`, i.e., stage timers, bytes read,
+    throughput per worker, queue depths and the slowest filings, written
+    periodically as JSON lines, or as Prometheus text if the path ends with
+    ".prom", e.g., for the textfile collector of node_exporter
+
+    Seconds of stages are summed over processes: "walk", "db_wait" (blocked
+    on the queue of the database writer) and "wait_workers" in the main
+    process, "db_write" in the writer thread, and "decompress", "parse",
+    "regex" and "other" in workers.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        path: str | None = None,
+        interval: float = 10.0,
+        profile_path: str | None = None,
+    ) -> None:
+        """Create metrics of a run, written only if a path is given
+
+        Args:
+            command (str): name of the command
+            path (str | None, optional): file to write metrics to.
+                Defaults to None.
+            interval (float, optional): minimum seconds between writes.
+                Defaults to 10.
+            profile_path (str | None, optional): file to save the profile of
+                workers merged, if workers are profiled. Defaults to None.
+        """
+        self.command = command
+        self.path = path
+        self.interval = interval
+        self.profile_path = profile_path
+        self.start = self._last_write = time.monotonic()
+        self.filings = 0
+        self.bytes_read = 0
+        self.bytes_decompressed = 0
+        self.stages = collections.defaultdict(float)
+        self.workers = {}
+        self.queues = {}
+        self.slowest = []
+        self.profile = None
+        if profile_path:
+            import pstats
+
+            self.profile = pstats.Stats()
+        self._lock = threading.Lock()
+        if path is not None and not self.prometheus:
+            # A file per run, of snapshots as the run goes
+            open(path, "w").close()
+
+    @property
+    def prometheus(self) -> bool:
+        return self.path is not None and self.path.endswith(".prom")
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Charge the time in the context to a stage of the main process"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] += time.perf_counter() - start
+
+    def sample_queue(self, name: str, depth: int):
+        """Record the depth of a queue
+
+        Args:
+            name (str): name of the queue
+            depth (int): items in the queue
+        """
+        with self._lock:
+            q = self.queues.setdefault(name, {"depth": 0, "max": 0, "sum": 0, "n": 0})
+            q["depth"] = depth
+            q["max"] = max(q["max"], depth)
+            q["sum"] += depth
+            q["n"] += 1
+
+    def add_worker_stats(self, stats: dict, bytes_read: int):
+        """Add stats of filings measured by a worker
+
+        Args:
+            stats (dict): stats returned by `measure_filings`
+            bytes_read (int): bytes of the filings on disk
+        """
+        with self._lock:
+            self.filings += stats["filings"]
+            self.bytes_read += bytes_read
+            self.bytes_decompressed += stats["bytes_decompressed"]
+            for name, seconds in stats["stages"].items():
+                self.stages[name] += seconds
+            worker = self.workers.setdefault(stats["pid"], [0, 0.0, 0.0])
+            worker[0] += stats["filings"]
+            worker[1] += stats["seconds"]
+            # Seconds to initialize the worker, given with its first task
+            worker[2] += stats.get("init_seconds") or 0.0
+            self.slowest = heapq.nlargest(
+                SLOWEST, self.slowest + [tuple(s) for s in stats["slowest"]]
+            )
+            if self.profile is not None and stats["profile"] is not None:
+                self.profile.add(_ProfileStats(stats["profile"]))
+
+    def snapshot(self) -> dict:
+        """Current metrics of the run
+
+        Returns:
+            dict: metrics
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.start
+            return {
+                "time": time.time(),
+                "command": self.command,
+                "elapsed": round(elapsed, 3),
+                "filings": self.filings,
+                "bytes_read": self.bytes_read,
+                "bytes_decompressed": self.bytes_decompressed,
+                "filings_per_s": round(self.filings / max(elapsed, 1e-9), 2),
+                "mb_per_s": round(self.bytes_read / 2**20 / max(elapsed, 1e-9), 3),
+                "stages": {k: round(v, 3) for k, v in sorted(self.stages.items())},
+                "workers": {
+                    str(pid): {
+                        "filings": n,
+                        "seconds": round(seconds, 3),
+                        "filings_per_s": round(n / max(seconds, 1e-9), 2),
+                        "init_seconds": round(init_seconds, 4),
+                    }
+                    for pid, (n, seconds, init_seconds) in self.workers.items()
+                },
+                "queues": {
+                    name: {
+                        "depth": q["depth"],
+                        "max": q["max"],
+                        "mean": round(q["sum"] / max(q["n"], 1), 2),
+                    }
+                    for name, q in self.queues.items()
+                },
+                "slowest": [
+                    {"filepath": filepath, "seconds": round(seconds, 4)}
+                    for seconds, filepath in self.slowest
+                ],
+            }
+
+    def tick(self):
+        """Write metrics, if `interval` seconds passed since last written"""
+        if self.path is None or time.monotonic() - self._last_write < self.interval:
+            return
+        self.write()
+
+    def write(self):
+        """Write metrics now"""
+        if self.path is None:
+            return
+        self._last_write = time.monotonic()
+        snapshot = self.snapshot()
+        if not self.prometheus:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(snapshot) + "\n")
+            return
+        # Replaced as a whole, so that a collector never reads it partially
+        dirname, basename = os.path.split(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+        with os.fdopen(fd, "w") as f:
+            f.write(prometheus_text(snapshot))
+        os.replace(tmp, self.path)
+
+    def close(self):
+        """Write final metrics and save the profile of workers"""
+        self.write()
+        if self.profile is not None and self.profile.stats:
+            self.profile.dump_stats(self.profile_path)
+
+
+def prometheus_text(snapshot: dict) -> str:
+    """Metrics in the text format of Prometheus
+
+    Args:
+        snapshot (dict): metrics, see `RunMetrics.snapshot`
+
+    Returns:
+        str: metrics text
+    """
+    command = snapshot["command"]
+    lines = []
+
+    def metric(name: str, kind: str, help: str, samples: list):
+        lines.append(f"# HELP edgar_{name} {help}")
+        lines.append(f"# TYPE edgar_{name} {kind}")
+        for labels, value in samples:
+            labels = {"command": command, **labels}
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"edgar_{name}{{{label_text}}} {value}")
+
+    metric(
+        "elapsed_seconds", "gauge", "Seconds since start", [({}, snapshot["elapsed"])]
+    )
+    metric("filings_total", "counter", "Filings processed", [({}, snapshot["filings"])])
+    metric(
+        "read_bytes_total",
+        "counter",
+        "Bytes of filings read, compressed",
+        [({}, snapshot["bytes_read"])],
+    )
+    metric(
+        "decompressed_bytes_total",
+        "counter",
+        "Bytes of filings decompressed",
+        [({}, snapshot["bytes_decompressed"])],
+    )
+    metric(
+        "stage_seconds_total",
+        "counter",
+        "Seconds spent in each stage, summed over processes",
+        [({"stage": k}, v) for k, v in snapshot["stages"].items()],
+    )
+    workers = snapshot["workers"].items()
+    metric(
+        "worker_filings_total",
+        "counter",
+        "Filings processed by each worker",
+        [({"worker": pid}, w["filings"]) for pid, w in workers],
+    )
+    metric(
+        "worker_seconds_total",
+        "counter",
+        "Seconds each worker spent on filings",
+        [({"worker": pid}, w["seconds"]) for pid, w in workers],
+    )
+    metric(
+        "worker_init_seconds",
+        "gauge",
+        "Seconds each worker spent to initialize, e.g., to load the text backend",
+        [({"worker": pid}, w["init_seconds"]) for pid, w in workers],
+    )
+    queues = snapshot["queues"].items()
+    metric(
+        "queue_depth",
+        "gauge",
+        "Items in each queue",
+        [({"queue": name}, q["depth"]) for name, q in queues],
+    )
+    metric(
+        "queue_depth_max",
+        "gauge",
+        "Maximum items in each queue",
+        [({"queue": name}, q["max"]) for name, q in queues],
+    )
+    metric(
+        "slowest_filing_seconds",
+        "gauge",
+        "Seconds spent on the slowest filings",
+        [({"filing": s["filepath"]}, s["seconds"]) for s in snapshot["slowest"]],
+    )
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    """Label value escaped as in the text format of Prometheus"""
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return value.replace("\n", "\\n")
@@ -0,0 +1,168 @@
+import html
+import re
+import sys
+from typing import Iterable, Iterator
+
+# Backends to convert HTML documents to plain text, and their versions.
+# Bump the version when the text produced by a backend changes.
+TEXT_BACKENDS = {"fast": 2, "requests_html": 1}
+
+_SKIP = re.compile(r"<!--.*?-->|<(script|style)\b.*?</\1\s*>", re.S | re.I)
+# Tags which start a new line in text, others (e.g., <b>, <font>) are inline
+_BLOCK_TAG = re.compile(
+    r"</?(?:p|div|br|hr|tr|td|th|li|ul|ol|dl|dt|dd|table|caption|h[1-6]|title"
+    r"|center|blockquote|pre|page|document|type|sequence|filename|description"
+    r"|text)\b[^>]*>",
+    re.I,
+)
+_TAG = re.compile(r"<[^>]*>")
+# Maximum characters held back waiting for the end of a tag, script, etc.,
+# so that memory is bounded for malformed HTML, e.g., a lone "<" in text
+_MAX_HOLD = 1 << 16
+
+
+class TagStripper:
+    """Streaming HTML to text converter
+
+    Text is fed in chunks of any size and converted as it comes.
+    Tags, comments, scripts and styles are removed, and entities decoded.
+    Whitespace is normalized like `requests_html.HTML.text`: runs of
+    whitespace become a single space, block-level tags start a new line.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._started = False
+        self._pending = ""  # whitespace held back at the end of last output
+
+    def feed(self, data: str) -> str:
+        """Convert a chunk of HTML
+
+        Args:
+            data (str): chunk of HTML
+
+        Returns:
+            str: text converted so far, an incomplete tag, comment, script
+                or entity at the end is kept until the next chunk
+        """
+        data = self._buffer + data
+        end = _complete_end(data)
+        data, self._buffer = data[:end], data[end:]
+        return self._convert(data)
+
+    def close(self) -> str:
+        """Convert the rest of the HTML
+
+        Returns:
+            str: rest of the text
+        """
+        data, self._buffer = self._buffer, ""
+        return self._convert(data)
+
+    def _convert(self, data: str) -> str:
+        data = _SKIP.sub(" ", data)
+        # Block-level tags start new lines, marked by "\0" until whitespace
+        # is collapsed, so that they are not confused with newlines in HTML
+        data = _BLOCK_TAG.sub("\0", data.replace("\0", ""))
+        data = _TAG.sub("", data)
+        if "&" in data:
+            data = html.unescape(data)
+        segments = data.split("\0")
+        lines = [" ".join(segment.split()) for segment in segments]
+        body = "\n".join(line for line in lines if line)
+        # Merge whitespace across chunks
+        if not body:
+            space = "\n" if len(segments) > 1 else " " if data else ""
+            self._pending = _merge_space(self._pending + space)
+            return ""
+        first = next(i for i, line in enumerate(lines) if line)
+        last = max(i for i, line in enumerate(lines) if line)
+        lead = "\n" if first > 0 else " " if data[:1].isspace() else ""
+        trail = "\n" if last < len(lines) - 1 else " " if data[-1:].isspace() else ""
+        sep = _merge_space(self._pending + lead) if self._started else ""
+        self._started, self._pending = True, _merge_space(trail)
+        return sep + body
+
+
+def _merge_space(space: str) -> str:
+    return "\n" if "\n" in space else " " if space else ""
+
+
+def _complete_end(data: str) -> int:
+    """End of the part of HTML that can be converted without the next chunk"""
+    end = len(data)
+    lt = data.rfind("<")
+    if lt != -1 and data.find(">", lt) == -1:
+        end = lt
+    comment = data.rfind("<!--", 0, end)
+    if comment != -1 and data.find("-->", comment, end) == -1:
+        end = comment
+    if "<" in data:
+        lower = data.lower()
+        for tag in ("script", "style"):
+            start = lower.rfind(f"<{tag}", 0, end)
+            if start != -1 and lower.find(f"</{tag}", start, end) == -1:
+                end = start
+    amp = data.rfind("&", max(0, end - 32), end)
+    if amp != -1 and ";" not in data[amp:end]:
+        end = amp
+    return end if len(data) - end <= _MAX_HOLD else len(data)
+
+
+def backend_id(backend: str) -> str:
+    """Identifier of a backend and its version, e.g., "fast-1"
+
+    Args:
+        backend (str): one of TEXT_BACKENDS
+
+    Returns:
+        str: identifier
+    """
+    return f"{backend}-{TEXT_BACKENDS[backend]}"
+
+
+def html_to_text(text: str, backend: str = "fast") -> str:
+    """Convert an HTML document to plain text
+
+    Args:
+        text (str): HTML document
+        backend (str, optional): one of TEXT_BACKENDS. Defaults to "fast".
+
+    Returns:
+        str: plain text
+    """
+    match backend:
+        case "fast":
+            stripper = TagStripper()
+            return stripper.feed(text) + stripper.close()
+        case "requests_html":
+            import requests_html
+
+            # Increase recursion limit for parsing large HTML
+            sys.setrecursionlimit(1_000_000_000)
+            return requests_html.HTML(html=text).text
+        case _:
+            raise ValueError(f"unknown text backend: {backend}")
+
+
+def iter_text(chunks: Iterable[str], backend: str = "fast") -> Iterator[str]:
+    """Convert an HTML document given in chunks to plain text, chunk by chunk
+
+    Only the "fast" backend converts chunks as they come, other backends
+    convert the whole document at once.
+
+    Args:
+        chunks (Iterable[str]): chunks of HTML document
+        backend (str, optional): one of TEXT_BACKENDS. Defaults to "fast".
+
+    Yields:
+        str: chunks of plain text
+    """
+    if backend != "fast":
+        yield html_to_text("".join(chunks), backend)
+        return
+    stripper = TagStripper()
+    for chunk in chunks:
+        if text := stripper.feed(chunk):
+            yield text
+    yield stripper.close()
@@ -0,0 +1,190 @@
+import contextlib
+import gzip
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable, Iterator
+
+from .text import iter_text, backend_id
+
+# Cached text is evicted down to this fraction of the size cap, so that
+# eviction is not run again as soon as the next document is cached
+_LOW_WATERMARK = 0.9
+# Temporary files older than this, left by interrupted workers, are removed
+_STALE_SECONDS = 3600
+
+
+class TextCache:
+    """On-disk cache of the plain text of documents, shared by commands
+    which convert documents of filings to text
+
+    The text of a document is stored gzipped as
+    "{backend_id}/{cik}/{file_type}/{date}_{accession}-{ith_doc}.txt.gz",
+    so that text converted by another backend, or another version of it,
+    is never read. A document is cached only when its text is read to the
+    end, written to a temporary file first and renamed, so that workers
+    never read partial text. Documents read from the cache are touched, and
+    least recently used documents are evicted when the cache exceeds its
+    size cap, see `evict`.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int) -> None:
+        """Create a cache, the directory is created if it does not exist
+
+        Args:
+            cache_dir (str): cache directory
+            max_bytes (int): size cap of the cache
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(
+        self,
+        backend: str,
+        cik: str,
+        file_type: str,
+        date: str,
+        accession: str,
+        ith_doc: int,
+    ) -> str:
+        """Path to the cached text of a document
+
+        Args:
+            backend (str): backend to convert HTML to text
+            cik (str): cik of company
+            file_type (str): file type, e.g., "8-K", "10-K"
+            date (str): filing date
+            accession (str): accession number
+            ith_doc (int): index of the document in the filing, from 1
+
+        Returns:
+            str: path
+        """
+        filename = f"{date}_{accession}-{ith_doc}.txt.gz"
+        return os.path.join(
+            self.cache_dir, backend_id(backend), cik, file_type, filename
+        )
+
+    def text(
+        self,
+        chunks: Iterable[str],
+        backend: str,
+        cik: str,
+        file_type: str,
+        date: str,
+        accession: str,
+        ith_doc: int,
+        chunk_size: int = 1 << 20,
+    ) -> Iterator[str]:
+        """Plain text of a document, read from the cache if cached, or else
+        converted from its HTML and cached
+
+        Args:
+            chunks (Iterable[str]): chunks of HTML document, not consumed
+                if the document is cached
+            backend (str): backend to convert HTML to text
+            cik (str): cik of company
+            file_type (str): file type, e.g., "8-K", "10-K"
+            date (str): filing date
+            accession (str): accession number
+            ith_doc (int): index of the document in the filing, from 1
+            chunk_size (int, optional): characters of cached text read at
+                a time. Defaults to 1 << 20.
+
+        Yields:
+            str: chunks of plain text
+        """
+        path = self.path(backend, cik, file_type, date, accession, ith_doc)
+        try:
+            f = gzip.open(path, "rt", encoding="utf-8")
+        except FileNotFoundError:
+            yield from self._store(path, iter_text(chunks, backend))
+            return
+        with f:
+            # Most recently used, the last to evict
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(path)
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def _store(self, path: str, text: Iterable[str]) -> Iterator[str]:
+        """Yield chunks of text and cache them, if all are consumed"""
+        dirname, basename = os.path.split(path)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{basename}.", suffix=".part", dir=dirname)
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(
+                raw, "wt", encoding="utf-8", compresslevel=1
+            ) as f:
+                for chunk in text:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp, path)
+        except BaseException:
+            # Including GeneratorExit, if not read to the end
+            os.remove(tmp)
+            raise
+
+    def evict(self) -> int:
+        """Remove least recently used documents, if the cache exceeds its
+        size cap, until it is below the low watermark of the cap
+
+        Returns:
+            int: bytes removed
+        """
+        entries, total, now = [], 0, time.time()
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with contextlib.suppress(FileNotFoundError):
+                    stat = os.stat(path)
+                    if filename.endswith(".part"):
+                        if now - stat.st_mtime > _STALE_SECONDS:
+                            os.remove(path)
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+        removed, target = 0, total - int(self.max_bytes * _LOW_WATERMARK)
+        for _, size, path in sorted(entries):
+            if removed >= target:
+                break
+            # Evicted by another run, or being read, which is not affected
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            removed += size
+        return removed
+
+    @contextlib.contextmanager
+    def evicting(self, interval: float = 60.0) -> Iterator["TextCache"]:
+        """Evict documents in a background thread while in the context,
+        at least every `interval` seconds, and once more on exit
+
+        Args:
+            interval (float, optional): minimum seconds between evictions,
+                longer if scanning the cache takes long. Defaults to 60.
+
+        Yields:
+            TextCache: the cache
+        """
+        stop = threading.Event()
+
+        def run():
+            while True:
+                start = time.monotonic()
+                self.evict()
+                elapsed = time.monotonic() - start
+                if stop.wait(max(interval, 10 * elapsed)):
+                    break
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+            self.evict()
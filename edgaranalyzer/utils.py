@@ -1,8 +1,45 @@
+import codecs
+import contextlib
+import fnmatch
+import functools
 import logging
+import re
 import pathlib
 import os
 import gzip
-from typing import Mapping, List
+import io
+import time
+import types
+import zipfile
+from typing import IO, Callable, Dict, Iterable, Iterator, Mapping, List
+
+from . import metrics
+
+# Parsed SEC header, mapping of field to values
+SECHeader = Dict[str, List[str]]
+
+# Maximum bytes to read for the SEC header of a filing
+HEADER_MAX_BYTES = 64 * 1024
+
+# Bytes of a document read at a time, so that memory is bounded
+# regardless of the size of documents
+DOC_CHUNK_BYTES = 1 << 20
+
+# Filings of a cik and file type can be packed into one archive,
+# "{cik}/{file_type}.zip", of the compressed filings stored as is, so that
+# millions of small files become a few thousand archives. The archive's
+# central directory is the index of filings in it.
+PACK_SUFFIX = ".zip"
+
+# Filings are stored as downloaded, gzipped, or recompressed by
+# `recompress_filings` with zstd and a dictionary trained on filings of the
+# file type, "{file_type}.zdict" in the data directory
+GZIP_SUFFIX = ".txt.gz"
+ZSTD_SUFFIX = ".txt.zst"
+ZSTD_DICT_SUFFIX = ".zdict"
+
+# Extensions of documents which contain text, unlike JPG, PNG, XML, etc.
+TEXT_EXTENSIONS = ("htm", "html", "txt")
 
 
 class prefix_logger(logging.LoggerAdapter):
@@ -18,8 +55,8 @@ class prefix_logger(logging.LoggerAdapter):
         return f"[{self.prefix}] - {msg}", kwargs
 
 
-def walk_dirpath(dir_path: str, cik: str, file_type: str) -> str:
-    """Yield filing paths in the given directory
+def walk_dirpath(dir_path: str, cik: str, file_type: str) -> Iterator[tuple]:
+    """Yield filings in the given directory, and in the packed archive
 
     Args:
         dir_path (str): data directory of all filings
@@ -27,76 +64,567 @@ def walk_dirpath(dir_path: str, cik: str, file_type: str) -> str:
         file_type (str): filing type, e.g., "8-K", "10-K"
 
     Yields:
-        str: filing path
+        tuple: (filing path, date, accession number), filings in the packed
+            archive have paths of "{cik}/{file_type}.zip/{filename}"
     """
     path = pathlib.Path(dir_path).joinpath(cik, file_type)
     path = path.expanduser().resolve()
 
+    packed = set()
+    archive = f"{path}{PACK_SUFFIX}"
+    if os.path.isfile(archive):
+        for stem, filename in _filing_names(open_pack(archive).namelist()).items():
+            packed.add(stem)
+            yield os.path.join(archive, filename), *parse_filing_name(filename)
+
     for dirpath, _, filenames in os.walk(path):
-        for filename in [f for f in filenames if f.endswith(".txt.gz")]:
-            yield os.path.join(dirpath, filename)
+        for stem, filename in _filing_names(filenames).items():
+            if stem not in packed:
+                yield os.path.join(dirpath, filename), *parse_filing_name(filename)
+
+
+def _filing_names(filenames: Iterable[str]) -> Dict[str, str]:
+    """Filenames of filings by name without suffix, of the recompressed
+    filing if a filing is stored both gzipped and recompressed"""
+    names = {}
+    for filename in filenames:
+        if filename.endswith(ZSTD_SUFFIX):
+            names[filename.removesuffix(ZSTD_SUFFIX)] = filename
+        elif filename.endswith(GZIP_SUFFIX):
+            names.setdefault(filename.removesuffix(GZIP_SUFFIX), filename)
+    return names
+
+
+def filing_path(
+    dir_path: str,
+    cik: str,
+    file_type: str,
+    date: str,
+    accession: str,
+    suffix: str = GZIP_SUFFIX,
+) -> str:
+    """Path to a filing in the data directory
+
+    Filings are stored as "{cik}/{file_type}/{date}_{accession}.txt.gz".
+    Filings downloaded by earlier versions are stored as "{date}.txt.gz",
+    which is used if `accession` is empty.
+
+    Args:
+        dir_path (str): data directory of all filings
+        cik (str): cik of company
+        file_type (str): filing type, e.g., "8-K", "10-K"
+        date (str): filing date
+        accession (str): accession number, e.g., "0000099780-20-000008"
+        suffix (str, optional): suffix of the compression of the filing.
+            Defaults to GZIP_SUFFIX.
+
+    Returns:
+        str: filing path
+    """
+    filename = f"{date}_{accession}{suffix}" if accession else f"{date}{suffix}"
+    return os.path.join(dir_path, cik, file_type, filename)
+
+
+def pack_path(dir_path: str, cik: str, file_type: str) -> str:
+    """Path to the packed archive of filings of a cik and file type
+
+    Args:
+        dir_path (str): data directory of all filings
+        cik (str): cik of company
+        file_type (str): filing type, e.g., "8-K", "10-K"
+
+    Returns:
+        str: archive path
+    """
+    return os.path.join(dir_path, cik, f"{file_type}{PACK_SUFFIX}")
+
+
+def locate_filing(
+    dir_path: str, cik: str, file_type: str, date: str, accession: str
+) -> str | None:
+    """Path to a filing stored as a file or in the packed archive,
+    gzipped or recompressed
+
+    Args:
+        dir_path (str): data directory of all filings
+        cik (str): cik of company
+        file_type (str): filing type, e.g., "8-K", "10-K"
+        date (str): filing date
+        accession (str): accession number, e.g., "0000099780-20-000008"
+
+    Returns:
+        str | None: filing path, or None if the filing is not stored
+    """
+    archive = pack_path(dir_path, cik, file_type)
+    for suffix in (ZSTD_SUFFIX, GZIP_SUFFIX):
+        path = filing_path(dir_path, cik, file_type, date, accession, suffix)
+        if os.path.exists(path):
+            return path
+        filename = os.path.basename(path)
+        if os.path.isfile(archive) and filename in open_pack(archive).NameToInfo:
+            return os.path.join(archive, filename)
+    return None
+
+
+def split_filing_path(file_path: str) -> tuple:
+    """Split the path to a filing, stored as a file or in a packed archive
+
+    Args:
+        file_path (str): path to the filing
+
+    Returns:
+        tuple: (data directory, cik, file type, filename)
+    """
+    archive, packed = split_packed(file_path)
+    type_dir = archive.removesuffix(PACK_SUFFIX) if packed else os.path.dirname(archive)
+    cik_dir, file_type = os.path.split(type_dir)
+    dir_path, cik = os.path.split(cik_dir)
+    return dir_path, cik, file_type, os.path.basename(file_path)
+
+
+def split_packed(file_path: str) -> tuple:
+    """Split the path to a filing in a packed archive
+
+    Args:
+        file_path (str): path to the filing
+
+    Returns:
+        tuple: (archive path, filename in archive), or (file_path, None)
+            for a filing stored as a file
+    """
+    archive, filename = os.path.split(file_path)
+    if archive.endswith(PACK_SUFFIX):
+        return archive, filename
+    return file_path, None
+
+
+def open_pack(archive: str) -> zipfile.ZipFile:
+    """Open a packed archive, cached per process so that its
+    central directory is read once rather than for every filing
+
+    Args:
+        archive (str): archive path
+
+    Returns:
+        zipfile.ZipFile: archive opened for reading
+    """
+    stat = os.stat(archive)
+    return _open_pack(archive, stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _open_pack(archive: str, size: int, mtime_ns: int) -> zipfile.ZipFile:
+    # Size and modification time in the key, so that a changed archive
+    # is opened again
+    return zipfile.ZipFile(archive)
+
+
+# A forked worker would share the file offset of archives opened by its
+# parent, and reads of workers would race, so it opens them again
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_open_pack.cache_clear)
+
+
+@contextlib.contextmanager
+def open_filing(file_path: str) -> Iterator[IO[bytes]]:
+    """Open a filing, gzipped or recompressed, stored as a file or
+    in a packed archive, to read it decompressed
+
+    Args:
+        file_path (str): path to the filing
+
+    Yields:
+        IO[bytes]: decompressed filing
+    """
+    archive, filename = split_packed(file_path)
+    with contextlib.ExitStack() as stack:
+        if filename is None:
+            raw = stack.enter_context(open(file_path, "rb"))
+        else:
+            raw = stack.enter_context(open_pack(archive).open(filename))
+        if file_path.endswith(ZSTD_SUFFIX):
+            dir_path, _, file_type, _ = split_filing_path(file_path)
+            dctx = zstd_decompressor(zstd_dictionary_path(dir_path, file_type))
+            f = io.BufferedReader(ZstdReader(raw, dctx))
+        else:
+            f = stack.enter_context(gzip.open(raw, "rb"))
+        yield metrics.timed_reader(f)
+
+
+class ZstdReader(io.RawIOBase):
+    """Decompressed stream of a filing recompressed with zstd
+
+    Lighter to open than zstandard's `stream_reader`, which matters when
+    only the header is read. Compressed data is read in pieces growing from
+    a few KB, so that the header, compressed in a block of its own by
+    `recompress_filings`, is decompressed without the documents that follow.
+    """
+
+    def __init__(self, raw: IO[bytes], dctx, read_size: int = 1 << 12) -> None:
+        """Create a reader
+
+        Args:
+            raw (IO[bytes]): compressed filing
+            dctx (zstandard.ZstdDecompressor): decompressor, see
+                `zstd_decompressor`
+            read_size (int, optional): bytes of compressed data read first,
+                doubled for every read up to 256KB. Defaults to 4KB.
+        """
+        super().__init__()
+        self._raw = raw
+        self._dobj = dctx.decompressobj()
+        self._read_size = read_size
+        self._buffer, self._pos = memoryview(b""), 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while self._pos >= len(self._buffer):
+            if self._dobj.eof:
+                return 0
+            data = self._raw.read(self._read_size)
+            if not data:
+                raise EOFError("zstd compressed filing ended before the end of frame")
+            self._read_size = min(self._read_size * 2, 1 << 18)
+            self._buffer, self._pos = memoryview(self._dobj.decompress(data)), 0
+        n = min(len(b), len(self._buffer) - self._pos)
+        b[:n] = self._buffer[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+
+def import_zstandard() -> types.ModuleType:
+    """Import zstandard, an optional dependency for recompressed filings
+
+    Returns:
+        types.ModuleType: zstandard module
+
+    Raises:
+        ImportError: if zstandard is not installed
+    """
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "filings recompressed with zstd require the zstandard package, "
+            "install it with `pip install edgar-analyzer[zstd]`"
+        ) from e
+    return zstandard
+
+
+def zstd_dictionary_path(dir_path: str, file_type: str) -> str:
+    """Path to the zstd dictionary of filings of a file type
+
+    Args:
+        dir_path (str): data directory of all filings
+        file_type (str): filing type, e.g., "8-K", "10-K"
+
+    Returns:
+        str: dictionary path
+    """
+    return os.path.join(dir_path, f"{file_type}{ZSTD_DICT_SUFFIX}")
+
+
+def zstd_decompressor(dict_path: str):
+    """Decompressor of filings recompressed with the dictionary, cached
+    per process so that the dictionary is loaded once rather than
+    for every filing
+
+    Args:
+        dict_path (str): dictionary path
+
+    Returns:
+        zstandard.ZstdDecompressor: decompressor
+
+    Raises:
+        FileNotFoundError: if the dictionary does not exist
+    """
+    if not os.path.isfile(dict_path):
+        raise FileNotFoundError(f"zstd dictionary of filings not found: {dict_path}")
+    stat = os.stat(dict_path)
+    return _zstd_decompressor(dict_path, stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _zstd_decompressor(dict_path: str, size: int, mtime_ns: int):
+    zstandard = import_zstandard()
+    with open(dict_path, "rb") as f:
+        dict_data = zstandard.ZstdCompressionDict(f.read())
+    return zstandard.ZstdDecompressor(dict_data=dict_data)
+
+
+def filing_stat(file_path: str) -> tuple:
+    """Size and modification time of a filing, stored as a file
+    or in a packed archive
+
+    Args:
+        file_path (str): path to the filing
+
+    Returns:
+        tuple: (size, mtime) of the compressed filing
+    """
+    archive, filename = split_packed(file_path)
+    if filename is None:
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+    info = open_pack(archive).getinfo(filename)
+    # Modification time of the file packed, kept in the comment, as
+    # `date_time` of zip has a resolution of 2 seconds only
+    if info.comment:
+        return info.file_size, float(info.comment)
+    return info.file_size, time.mktime(info.date_time + (0, 0, -1))
+
+
+def parse_filing_name(file_path: str) -> tuple:
+    """Parse date and accession number from the path to a filing
+
+    Args:
+        file_path (str): path to the filing
+
+    Returns:
+        tuple: (date, accession number), accession number is empty
+            for filings stored as "{date}.txt.gz"
+    """
+    name = os.path.basename(file_path)
+    name = name.removesuffix(GZIP_SUFFIX).removesuffix(ZSTD_SUFFIX)
+    date, _, accession = name.partition("_")
+    return date, accession
+
+
+def accession_from_url(url: str) -> str:
+    """Accession number of a filing from its url in the index
+
+    Args:
+        url (str): url to the filing, e.g., "https://www.sec.gov/Archives/
+            edgar/data/99780/0000099780-20-000008.txt"
+
+    Returns:
+        str: accession number, e.g., "0000099780-20-000008"
+    """
+    return url.rsplit("/", 1)[-1].removesuffix(".txt")
 
 
-def extract_files(file_path: str, out_dir: str) -> List[str]:
-    """Extract docs in a gzipped filing into the out directory
+def read_header(file_path: str, max_bytes: int = HEADER_MAX_BYTES) -> SECHeader:
+    """Read and parse the SEC header of a filing
+
+    Decompression stops at the end of the header, or after `max_bytes`
+    if the end of header is not found, so that the documents (exhibits,
+    etc.) in the filing are never read.
+
+    Args:
+        file_path (str): path to the filing
+        max_bytes (int, optional): maximum bytes to read.
+            Defaults to HEADER_MAX_BYTES.
+
+    Returns:
+        SECHeader: parsed header, see `parse_header`
+    """
+    lines = []
+    with metrics.stage("parse"):
+        with open_filing(file_path) as f:
+            while max_bytes > 0 and (line := f.readline(max_bytes)):
+                if line.startswith((b"</SEC-HEADER>", b"<DOCUMENT>")):
+                    break
+                if len(line) == max_bytes and not line.endswith(b"\n"):
+                    break  # incomplete line cut by the budget
+                max_bytes -= len(line)
+                lines.append(line.decode(errors="ignore").rstrip("\r\n"))
+        return parse_header(lines)
+
+
+def parse_header(lines: List[str]) -> SECHeader:
+    """Parse lines of the SEC header into a mapping of field to values
+
+    Fields in (nested) sections are keyed by the path of section names,
+    e.g., "FILER/BUSINESS ADDRESS/ZIP". Values of fields appearing more
+    than once, e.g., "ITEM INFORMATION" or fields of multiple filers,
+    are kept in the order they appear.
 
     Args:
-        file_path (str): path to the gzipped filing
+        lines (List[str]): lines of the SEC header
+
+    Returns:
+        SECHeader: mapping of field to list of values
+    """
+    header: SECHeader = {}
+    sections: List[tuple] = []  # stack of (indent, section name)
+    for line in lines:
+        if not line.strip():
+            continue
+        indent = len(line) - len(line.lstrip())
+        while sections and sections[-1][0] >= indent:
+            sections.pop()
+        line = line.strip()
+        if line.startswith("<"):
+            # e.g., "<ACCEPTANCE-DATETIME>20200102160512"
+            key, _, value = line[1:].partition(">")
+        else:
+            key, _, value = line.partition(":")
+        key, value = key.strip(), value.strip()
+        if not value and line.endswith(":"):
+            sections.append((indent, key))
+            continue
+        key = "/".join([name for _, name in sections] + [key])
+        header.setdefault(key, []).append(value)
+    return header
+
+
+def iter_documents(file_path: str) -> Iterator[tuple]:
+    """Yield documents in a filing, without writing to disk
+
+    Args:
+        file_path (str): path to the filing
+
+    Yields:
+        tuple: (index starting from 1, lowercased filename, type, text),
+            where text is the whole document from <DOCUMENT> to </DOCUMENT>
+    """
+    for ith_doc, doc_name, doc_type, chunks in iter_document_chunks(file_path):
+        yield ith_doc, doc_name, doc_type, "".join(chunks)
+
+
+def iter_document_chunks(
+    file_path: str,
+    select: Callable[[str, str], bool] | None = None,
+    chunk_bytes: int = DOC_CHUNK_BYTES,
+) -> Iterator[tuple]:
+    """Yield documents in a filing, each as an iterator of chunks
+    of its text, so that a document is never held in memory as a whole
+
+    The chunks of a document must be consumed, if at all, before
+    the next document. Unconsumed chunks are skipped.
+
+    Args:
+        file_path (str): path to the filing
+        select (Callable[[str, str], bool] | None, optional): function of
+            (lowercased filename, type) that returns False for documents
+            to skip, which are not decoded. Defaults to None, all documents.
+        chunk_bytes (int, optional): approximate bytes per chunk.
+            Defaults to DOC_CHUNK_BYTES.
+
+    Yields:
+        tuple: (index starting from 1, lowercased filename, type, chunks),
+            where chunks are the text from <DOCUMENT> to </DOCUMENT>
+    """
+    with open_filing(file_path) as f:
+        # Pieces of long lines are long enough to hold a tag, e.g., <TYPE>
+        lines = _iter_lines(f, max(chunk_bytes, 1024))
+        ith_doc = 0
+        for line, whole in lines:
+            if not (whole and line.startswith(b"<DOCUMENT>")):
+                continue  # not in a document, e.g., header
+            ith_doc += 1
+            doc_name, doc_type, head, end = "", "", [line], False
+            # Tags of the document precede its <TEXT>
+            for line, whole in lines:
+                head.append(line)
+                if not whole:
+                    continue
+                if line.startswith(b"<TYPE>"):
+                    doc_type = line[6:].decode(errors="ignore").strip().upper()
+                elif line.startswith(b"<FILENAME>"):
+                    doc_name = line[10:].decode(errors="ignore").strip().lower()
+                elif line.startswith(b"</DOCUMENT>"):
+                    end = True
+                    break
+                elif line.startswith(b"<TEXT>") or len(head) > 64:
+                    break
+            if select is not None and not select(doc_name, doc_type):
+                continue
+            chunks = _doc_chunks(head, lines, end, chunk_bytes)
+            yield ith_doc, doc_name, doc_type, chunks
+
+
+def select_documents(
+    doc_types: Iterable[str] | None = None, text_only: bool = True
+) -> Callable[[str, str], bool]:
+    """Function to select documents by type, for `iter_document_chunks`
+
+    Args:
+        doc_types (Iterable[str] | None, optional): patterns of document
+            types in <TYPE>, e.g., "EX-10*", "8-K", matched as `fnmatch`
+            and case-insensitively. Defaults to None, all types.
+        text_only (bool, optional): if True, select only documents which
+            contain text, by TEXT_EXTENSIONS, or without <FILENAME>, e.g.,
+            of filings before 2001, which are text. Defaults to True.
+
+    Returns:
+        Callable[[str, str], bool]: function of (lowercased filename, type)
+            that returns True for documents selected
+    """
+    pattern = None
+    if doc_types is not None:
+        regex = "|".join(fnmatch.translate(t.upper()) for t in doc_types)
+        pattern = re.compile(regex or "(?!)")
+
+    def select(doc_name: str, doc_type: str) -> bool:
+        if text_only and doc_name and not doc_name.endswith(TEXT_EXTENSIONS):
+            return False
+        return pattern is None or pattern.match(doc_type) is not None
+
+    return select
+
+
+def _iter_lines(f, max_bytes: int) -> Iterator[tuple]:
+    """Lines of a binary file, long lines split into pieces of `max_bytes`
+
+    Yields:
+        tuple: (line or piece, whether it starts at the beginning of a line)
+    """
+    whole = True
+    while line := f.readline(max_bytes):
+        yield line, whole
+        whole = line.endswith(b"\n")
+
+
+def _doc_chunks(head: list, lines: Iterator, end: bool, chunk_bytes: int):
+    """Decoded chunks of a document, starting with its tags in `head`,
+    and the rest of its lines until </DOCUMENT> unless `end`"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    buffer, size = head, sum(map(len, head))
+    for line, whole in lines if not end else ():
+        if size >= chunk_bytes:
+            yield decoder.decode(b"".join(buffer))
+            buffer, size = [], 0
+        buffer.append(line)
+        size += len(line)
+        if whole and line.startswith(b"</DOCUMENT>"):
+            break
+    yield decoder.decode(b"".join(buffer), final=True)
+
+
+def extract_files(
+    file_path: str, out_dir: str, doc_types: Iterable[str] | None = None
+) -> List[str]:
+    """Extract docs in a filing into the out directory
+
+    Args:
+        file_path (str): path to the filing
         out_dir (str): output directory path
+        doc_types (Iterable[str] | None, optional): patterns of document
+            types to extract, see `select_documents`. Defaults to None,
+            all types.
 
     Returns:
         List[str]: list of the extracted document paths
     """
     path = pathlib.Path(file_path).expanduser().resolve().as_posix()
     outpath = pathlib.Path(out_dir).expanduser().resolve().as_posix()
-    if ".gz" not in path:
+    if not path.endswith((GZIP_SUFFIX, ZSTD_SUFFIX)):
         return []
-    f = gzip.open(file_path, "rt")
-    # logger.info(f"extracting files from {file_path}")
-    # Find number of documents in this filing
-    while not (line := f.readline()).startswith("PUBLIC DOCUMENT COUNT"):
-        if not line:
-            break
-    n_docs = int(line.replace(" ", "").split(":")[-1]) if line else 1
-    # logger.info(f"{n_docs} documents from {file_path}")
-    # Split into documents
-    _, file_type = os.path.split(os.path.dirname(path))
-    _, cik = os.path.split(os.path.dirname(os.path.dirname(path)))
+    _, cik, file_type, filename = split_filing_path(path)
+    filename = filename.removesuffix(GZIP_SUFFIX).removesuffix(ZSTD_SUFFIX)
     docs = []
-    for ith_doc in range(1, n_docs + 1):
-        doc_started = False
-        ith_doc_file_name = os.path.split(file_path)[-1].replace(
-            ".txt.gz", f".doc-{ith_doc}.txt"
-        )
-        ith_doc_file_name = f"{cik}.{file_type}.{ith_doc_file_name}"
-        # split into documents
-        ith_doc_file = os.path.join(outpath, ith_doc_file_name)
-        with open(ith_doc_file, "w") as ftmp:
-            while line := f.readline():
-                if line.startswith("<DOCUMENT>"):
-                    doc_started = True
-                if line.startswith("<FILENAME>"):
-                    doc_name = line.strip("<FILENAME>").strip().lower()
-                if doc_started:
-                    ftmp.write(line)
-                if line.startswith("</DOCUMENT>"):
-                    doc_started = False
-                    break
-        if os.path.getsize(ith_doc_file) == 0:
-            os.remove(ith_doc_file)
-            continue
-        # rename splited documents based on its name in the filing
+    select = select_documents(doc_types)
+    for ith_doc, doc_name, _, chunks in iter_document_chunks(path, select):
+        # name extracted documents based on its name in the filing
         if doc_name.endswith("htm") or doc_name.endswith("html"):
-            newname = ith_doc_file.replace("txt", doc_name)
-            os.rename(ith_doc_file, newname)
-            # logger.debug(f"document {ith_doc}: {newname}")
-            docs.append(newname)
-        elif doc_name.endswith("txt"):
-            # logger.debug(f"document {ith_doc}: {doc_name}")
-            docs.append(ith_doc_file)
+            ith_doc_file_name = f"{cik}.{file_type}.{filename}.doc-{ith_doc}.{doc_name}"
         else:
-            # JPG, PNG, XML, etc., other types of filings
-            # logger.debug(f"document {ith_doc} skipped (jpg, png, xml, etc.)")
-            os.remove(ith_doc_file)
-    f.close()
+            ith_doc_file_name = f"{cik}.{file_type}.{filename}.doc-{ith_doc}.txt"
+        ith_doc_file = os.path.join(outpath, ith_doc_file_name)
+        with open(ith_doc_file, "w") as f:
+            f.writelines(chunks)
+        docs.append(ith_doc_file)
     return docs
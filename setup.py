@@ -8,7 +8,7 @@ from edgaranalyzer import (
     __url__,
 )
 
-requires = ["python-edgar", "tqdm", "requests_html", "pandas"]
+requires = ["tqdm", "requests_html"]
 
 setup(
     name="edgar-analyzer",
@@ -21,6 +21,7 @@ setup(
     url=__url__,
     packages=find_packages(),
     install_requires=requires,
+    extras_require={"zstd": ["zstandard"]},
     entry_points={
         "console_scripts": ["edgar-analyzer=edgaranalyzer.main:main"],
     },
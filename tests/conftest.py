@@ -0,0 +1,46 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Replies to each path with its scripted responses, in order, the last
+    one repeated, and records the requests"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((time.monotonic(), self.path, dict(self.headers)))
+        responses = self.server.routes.get(self.path, [(404, {}, b"")])
+        if len(responses) > 1:
+            status, headers, body = responses.pop(0)
+        else:
+            status, headers, body = responses[0]
+        if callable(body):
+            status, headers, body = body(self.headers)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """Local stand-in of EDGAR, with `routes` mapping a path to a list of
+    (status, headers, body), and `url(path)` of the server"""
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    srv.daemon_threads = True
+    srv.routes, srv.requests = {}, []
+    srv.url = lambda path: f"http://127.0.0.1:{srv.server_address[1]}{path}"
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
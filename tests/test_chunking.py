@@ -0,0 +1,102 @@
+"""Text, keyword hits and signature blocks are the same however a document
+is split into chunks"""
+import pytest
+
+from edgaranalyzer.cmd_find_loan_signature import find_signature
+from edgaranalyzer.keywords import KeywordMatcher
+from edgaranalyzer.text import html_to_text, iter_text
+
+KEYWORDS = [
+    "credit agreement",
+    "credit",
+    "loan agreement",
+    "revolving credit facility",
+    "term loan",
+    "administrative agent",
+]
+
+DOCUMENT = (
+    "<html><head><style>p { margin: 0 }</style></head><body>\n"
+    '<p align="center"><b>CREDIT&nbsp;AGREEMENT</b></p>\n'
+    "<!-- a comment with <p> and By: inside -->\n"
+    "<p>dated as of March&#160;1, 2020, among ACME&nbsp;CORP. &amp; "
+    "its Subsidiaries, the Lenders party hereto and FIRST NATIONAL BANK, "
+    "N.A., as Administrative\n   Agent.</p>\n"
+    "<p>The <i>Revolving</i> Credit   Facility and the Term&#x20;Loan "
+    "are governed by this Credit\tAgreement &lt;not a tag&gt;.</p>\n"
+    + "<p>The Borrower shall pay interest on each term loan.</p>\n" * 20
+    + "<p>IN WITNESS WHEREOF, the parties hereto have caused this Credit "
+    "Agreement to be duly executed as of the date first above written.</p>\n"
+    "<table><tr><td>ACME CORP., as Borrower</td></tr>"
+    "<tr><td>By:</td><td>/s/ Jane Doe</td></tr>"
+    "<tr><td>Name: Jane Doe</td></tr><tr><td>Title: CFO</td></tr>"
+    "<tr><td>FIRST NATIONAL BANK, N.A.,</td></tr>"
+    "<tr><td>as Administrative Agent and a Lender</td></tr>"
+    "<tr><td>By:</td><td>/s/ John Smith</td></tr>"
+    "<tr><td>Name: John Smith</td></tr><tr><td>Title: Vice President</td></tr>"
+    "</table></body></html>\n"
+)
+
+SIZES = [1, 2, 3, 5, 7, 11, 13, 17, 31, 64, 97, 257, 1021, len(DOCUMENT)]
+HTML_NEEDLES = ["<b>", "<!--", "&nbsp;", "&#160;", "&amp;", "Credit\tAgreement", "By:"]
+TEXT_NEEDLES = ["CREDIT AGREEMENT", "Revolving Credit Facility", "Term Loan", "By:"]
+
+
+def chunked(text: str, size: int) -> list:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def splits(text: str, needles: list) -> list:
+    """Chunks of text at fixed sizes, and split in two at every offset
+    inside each of `needles`, e.g., tags, entities, keywords and "By:" """
+    chunkings = [chunked(text, size) for size in SIZES]
+    for needle in needles:
+        i = text.index(needle)
+        for cut in range(i, i + len(needle) + 1):
+            chunkings.append([text[:cut], text[cut:]])
+    return chunkings
+
+
+@pytest.fixture(scope="module")
+def text():
+    return html_to_text(DOCUMENT)
+
+
+def test_whole_document(text):
+    assert "CREDIT AGREEMENT" in text
+    assert "ACME CORP. & its Subsidiaries" in text
+    assert "<not a tag>" in text
+    assert "By: inside" not in text
+
+
+def test_text_same_across_chunks(text):
+    for chunks in splits(DOCUMENT, HTML_NEEDLES):
+        assert "".join(iter_text(chunks)) == text, [len(c) for c in chunks]
+
+
+def test_keyword_hits_same_across_chunks(text):
+    matcher = KeywordMatcher(KEYWORDS)
+    counts = matcher.count(text)
+    assert counts["credit agreement"][0] == 3
+    assert counts["revolving credit facility"][0] == 1
+    assert counts["term loan"][0] == 21
+    first = matcher.search(text)
+    for chunks in splits(DOCUMENT, HTML_NEEDLES):
+        assert matcher.count(iter_text(chunks)) == counts
+        assert matcher.search(iter_text(chunks)) == first
+    # Text split at any offset, e.g., inside a keyword
+    for chunks in splits(text, TEXT_NEEDLES):
+        assert matcher.count(chunks) == counts
+        assert matcher.search(iter(chunks)) == first
+
+
+def test_signature_same_across_chunks(text):
+    found = find_signature([text])
+    assert found is not None
+    offset, lender = found
+    assert text[offset:].startswith("By:\n/s/ John Smith")
+    assert lender == "FIRST NATIONAL BANK, N.A., as Administrative Agent and a Lender"
+    for chunks in splits(DOCUMENT, HTML_NEEDLES):
+        assert find_signature(iter_text(chunks)) == found
+    for chunks in splits(text, TEXT_NEEDLES):
+        assert find_signature(chunks) == found
@@ -0,0 +1,67 @@
+"""Documents of filings selected by type, including SGML filings before 2001,
+whose documents have no <FILENAME>"""
+import gzip
+import os
+
+from edgaranalyzer import cmd_find_loans
+from edgaranalyzer.utils import extract_files, iter_document_chunks, select_documents
+
+FILING = """<SEC-DOCUMENT>0000001000-99-000001.txt : 19990105
+<SEC-HEADER>0000001000-99-000001.hdr.sgml : 19990105
+ACCESSION NUMBER:		0000001000-99-000001
+CONFORMED SUBMISSION TYPE:	8-K
+</SEC-HEADER>
+<DOCUMENT>
+<TYPE>8-K
+<SEQUENCE>1
+<TEXT>
+ACME CORP. entered into a Credit Agreement with FIRST NATIONAL BANK.
+</TEXT>
+</DOCUMENT>
+<DOCUMENT>
+<TYPE>EX-99
+<SEQUENCE>2
+<TEXT>
+Press release.
+</TEXT>
+</DOCUMENT>
+</SEC-DOCUMENT>
+"""
+
+
+def write_filing(tmp_path) -> str:
+    path = tmp_path / "data" / "1000" / "8-K" / "1999-01-05_0000001000-99-000001.txt.gz"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(gzip.compress(FILING.encode()))
+    return str(path)
+
+
+def test_select_documents_without_filename(tmp_path):
+    path = write_filing(tmp_path)
+    select = select_documents(("8-K",))
+    assert select("", "8-K")
+    assert not select("", "EX-99")
+    assert not select("image.jpg", "8-K")
+    docs = [(i, name, t) for i, name, t, _ in iter_document_chunks(path, select)]
+    assert docs == [(1, "", "8-K")]
+    docs = [(i, t) for i, _, t, _ in iter_document_chunks(path, select_documents())]
+    assert docs == [(1, "8-K"), (2, "EX-99")]
+
+
+def test_find_loans_without_filename(tmp_path):
+    path = write_filing(tmp_path)
+    for doc_types in [cmd_find_loans.doc_types, ("*",)]:
+        found = cmd_find_loans.regsearch(path, "1000", "8-K", doc_types=doc_types)
+        assert found == [("1000", "8-K", "1999-01-05", "0000001000-99-000001", "TRUE")]
+
+
+def test_extract_files_without_filename(tmp_path):
+    path = write_filing(tmp_path)
+    out = tmp_path / "out"
+    out.mkdir()
+    docs = extract_files(path, str(out), ["8-K"])
+    assert [os.path.basename(d) for d in docs] == [
+        "1000.8-K.1999-01-05_0000001000-99-000001.doc-1.txt"
+    ]
+    with open(docs[0]) as f:
+        assert "Credit Agreement" in f.read()
@@ -0,0 +1,170 @@
+import gzip
+import io
+import os
+import sqlite3
+import time
+import zipfile
+
+import pytest
+
+from edgaranalyzer import CMD, cmd_build_database, cmd_download_filings
+from edgaranalyzer import cmd_download_index
+from edgaranalyzer.cmd_download_filings import backoff, download
+from edgaranalyzer.downloader import Downloader, TokenBucket
+from edgaranalyzer.main import init_argparse
+
+USER_AGENT = "edgar-analyzer test test@example.com"
+FILING = b"<SEC-DOCUMENT>\n<SEC-HEADER>\n</SEC-HEADER>\n</SEC-DOCUMENT>\n"
+FILING_PATH = "/Archives/edgar/data/1000/0000001000-20-000001.txt"
+
+
+def master_zip() -> bytes:
+    """Zipped master index of one filing"""
+    idx = (
+        "Description: Master Index of EDGAR Dissemination Feed\n\n"
+        "CIK|Company Name|Form Type|Date Filed|Filename\n"
+        "--------------------------------------------------------------------\n"
+        "1000|ACME CORP|8-K|2020-01-02|edgar/data/1000/0000001000-20-000001.txt\n"
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("master.idx", idx)
+    return buf.getvalue()
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=20)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    # The first token is available at once, the other 10 at 20 per second
+    assert time.monotonic() - start >= 0.45
+
+
+def test_downloader_rate_limit(server):
+    server.routes[FILING_PATH] = [(200, {}, FILING)]
+    downloader = Downloader(USER_AGENT, rate=20)
+    for _ in range(6):
+        assert downloader.get(server.url(FILING_PATH)).status == 200
+    downloader.close()
+    times = [t for t, _, _ in server.requests]
+    assert len(times) == 6
+    assert times[-1] - times[0] >= 0.2
+    assert all(h["User-Agent"] == USER_AGENT for _, _, h in server.requests)
+
+
+def test_download_retries_on_503(server, tmp_path):
+    server.routes[FILING_PATH] = [
+        (503, {"Retry-After": "0"}, b""),
+        (429, {"Retry-After": "0"}, b""),
+        (200, {}, FILING),
+    ]
+    downloader = Downloader(USER_AGENT, rate=1000)
+    job = (str(tmp_path), "1000", "8-K", "2020-01-02", server.url(FILING_PATH))
+    url, state, attempts, error = download(downloader, job, retries=3)
+    downloader.close()
+    assert (state, attempts, error) == ("done", 3, None)
+    assert len(server.requests) == 3
+    path = tmp_path / "1000" / "8-K" / "2020-01-02_0000001000-20-000001.txt.gz"
+    assert gzip.decompress(path.read_bytes()) == FILING
+
+
+def test_download_honors_retry_after(server, tmp_path):
+    server.routes[FILING_PATH] = [(429, {"Retry-After": "1"}, b""), (200, {}, FILING)]
+    downloader = Downloader(USER_AGENT, rate=1000)
+    job = (str(tmp_path), "1000", "8-K", "2020-01-02", server.url(FILING_PATH))
+    assert download(downloader, job, retries=1)[1] == "done"
+    downloader.close()
+    (first, *_), (second, *_) = server.requests
+    assert second - first >= 1
+
+
+def test_download_gives_up_after_retries(server, tmp_path):
+    server.routes[FILING_PATH] = [(503, {"Retry-After": "0"}, b"")]
+    downloader = Downloader(USER_AGENT, rate=1000)
+    job = (str(tmp_path), "1000", "8-K", "2020-01-02", server.url(FILING_PATH))
+    _, state, attempts, error = download(downloader, job, retries=2)
+    downloader.close()
+    assert (state, attempts, error) == ("failed", 3, "HTTP 503")
+    assert len(server.requests) == 3
+
+
+def test_download_404_not_retried(server, tmp_path):
+    downloader = Downloader(USER_AGENT, rate=1000)
+    job = (str(tmp_path), "1000", "8-K", "2020-01-02", server.url(FILING_PATH))
+    _, state, attempts, error = download(downloader, job, retries=3)
+    downloader.close()
+    assert (state, attempts, error) == ("failed", 1, "HTTP 404")
+    assert len(server.requests) == 1
+    assert not list((tmp_path / "1000" / "8-K").iterdir())
+
+
+def test_download_refuses_unmigrated(server, tmp_path):
+    db = str(tmp_path / "edgar-idx.sqlite3")
+    with sqlite3.connect(db) as conn:
+        conn.execute(cmd_build_database.sql.create_table)
+        conn.execute(
+            cmd_build_database.sql.insert,
+            ("1000", "ACME CORP", "8-K", "2020-01-02", server.url(FILING_PATH)),
+        )
+    legacy = tmp_path / "data" / "1000" / "8-K" / "2020-01-02.txt.gz"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(gzip.compress(FILING))
+    argv = [CMD.DOWNLOAD_FILINGS, "-ua", USER_AGENT, "--file_type", "8-K"]
+    args = init_argparse().parse_args([*argv, "-o", str(tmp_path / "data"), "-db", db])
+    with pytest.raises(SystemExit, match="migrate_filings"):
+        cmd_download_filings.cmd(args)
+    assert not server.requests
+    assert os.listdir(legacy.parent) == [legacy.name]
+
+
+def test_backoff():
+    assert backoff(1, "7") == 7
+    assert 2 <= backoff(1) < 3
+    assert 60 <= backoff(10) < 61
+
+
+def test_index_conditional_request(server, tmp_path, monkeypatch):
+    path = "/Archives/edgar/full-index/2020/QTR1/master.zip"
+    etag, modified = '"v1"', "Wed, 01 Apr 2020 00:00:00 GMT"
+
+    def reply(headers):
+        if headers.get("If-None-Match") == etag:
+            return 304, {}, b""
+        return 200, {"ETag": etag, "Last-Modified": modified}, master_zip()
+
+    server.routes[path] = [(200, {}, reply)]
+    monkeypatch.setattr(
+        cmd_download_index,
+        "INDEX_URL",
+        server.url("/Archives/edgar/full-index/{year}/QTR{quarter}/master.zip"),
+    )
+    downloader = Downloader(USER_AGENT, rate=1000)
+    out = str(tmp_path)
+
+    filename, state, validators, error = cmd_download_index.download_quarter(
+        downloader, out, 2020, 1, None, 0
+    )
+    assert (filename, state, error) == ("2020-QTR1.tsv", "downloaded", None)
+    assert validators["etag"] == etag and validators["last_modified"] == modified
+    with open(os.path.join(out, filename)) as f:
+        assert f.read().startswith("1000|ACME CORP|8-K|2020-01-02|")
+
+    # Not modified since, without a body
+    state = cmd_download_index.download_quarter(
+        downloader, out, 2020, 1, validators, 0
+    )[1]
+    assert state == "not modified"
+    headers = server.requests[-1][2]
+    assert headers["If-None-Match"] == etag
+    assert headers["If-Modified-Since"] == modified
+
+    # Downloaded again, unconditionally, if the file changed locally
+    with open(os.path.join(out, filename), "a") as f:
+        f.write("edited\n")
+    state = cmd_download_index.download_quarter(
+        downloader, out, 2020, 1, validators, 0
+    )[1]
+    assert state == "downloaded"
+    assert "If-None-Match" not in server.requests[-1][2]
+    downloader.close()
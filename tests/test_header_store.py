@@ -0,0 +1,86 @@
+import gzip
+import sqlite3
+
+from edgaranalyzer import CMD, cmd_build_header_store, cmd_find_header
+from edgaranalyzer.main import init_argparse
+
+HEADER = """<SEC-DOCUMENT>{acc}.txt : 20201212
+<SEC-HEADER>{acc}.hdr.sgml : 20201212
+ACCESSION NUMBER:		{acc}
+CONFORMED SUBMISSION TYPE:	8-K
+CONFORMED PERIOD OF REPORT:	20201211
+ITEM INFORMATION:		Entry into a Material Definitive Agreement
+ITEM INFORMATION:		Other Events
+FILED AS OF DATE:		20201212
+
+FILER:
+
+	BUSINESS ADDRESS:
+		CITY:			SPRINGFIELD
+		ZIP:			28545
+</SEC-HEADER>
+</SEC-DOCUMENT>
+"""
+ACCESSIONS = ["0000001000-20-000001", "0000001000-20-000002"]
+
+
+def run(module, argv: list):
+    module.cmd(init_argparse().parse_args(argv))
+
+
+def test_find_header_from_store_rescan(tmp_path):
+    data = tmp_path / "data"
+    (data / "1000" / "8-K").mkdir(parents=True)
+    for acc in ACCESSIONS:
+        path = data / "1000" / "8-K" / f"2020-12-12_{acc}.txt.gz"
+        path.write_bytes(gzip.compress(HEADER.format(acc=acc).encode()))
+    store, db = str(tmp_path / "headers.sqlite3"), str(tmp_path / "results.sqlite3")
+    common = ["-d", str(data), "--file_type", "8-K", "-t", "1"]
+    run(cmd_build_header_store, [CMD.BUILD_HEADER_STORE, *common, "-db", store])
+    find = [CMD.FIND_HEADER, *common, "-db", db, "--header_store", store]
+
+    def items() -> int:
+        with sqlite3.connect(db) as conn:
+            return conn.execute("SELECT COUNT(*) FROM files_all_items").fetchone()[0]
+
+    run(cmd_find_header, find)
+    assert items() == 2 * len(ACCESSIONS)
+
+    with sqlite3.connect(db) as conn:
+        conn.execute("DELETE FROM files_all_items")
+    # Processed before, so skipped
+    run(cmd_find_header, find)
+    assert items() == 0
+    # Processed again, all of them
+    run(cmd_find_header, [*find, "--rescan"])
+    assert items() == 2 * len(ACCESSIONS)
+
+
+def test_rebuilt_table_resets_its_extractor(tmp_path):
+    data = tmp_path / "data"
+    (data / "1000" / "8-K").mkdir(parents=True)
+    paths = [data / "1000" / "8-K" / f"2020-12-12_{acc}.txt.gz" for acc in ACCESSIONS]
+    for path, acc in zip(paths, ACCESSIONS):
+        path.write_bytes(gzip.compress(HEADER.format(acc=acc).encode()))
+    db = str(tmp_path / "results.sqlite3")
+    find = [CMD.FIND_HEADER, "-d", str(data), "--file_type", "8-K", "-t", "1"]
+    run(cmd_find_header, [*find, "-db", db])
+
+    # Table of an earlier version, keyed without accession
+    with sqlite3.connect(db) as conn:
+        conn.execute("DROP TABLE files_zipcode")
+        conn.execute(
+            """CREATE TABLE files_zipcode (cik TEXT, file_type TEXT, date DATE,
+            state TEXT, zipcode TEXT, PRIMARY KEY(cik, file_type, date));"""
+        )
+    # Rebuilt, without filings to process again
+    for path in paths:
+        path.unlink()
+    run(cmd_find_header, [*find, "-db", db])
+    with sqlite3.connect(db) as conn:
+        ledger = dict(
+            conn.execute(
+                "SELECT extractor, COUNT(*) FROM files_processed GROUP BY extractor"
+            )
+        )
+    assert ledger == {CMD.FIND_ITEMS: 2, CMD.FIND_EVENT_DATE: 2}